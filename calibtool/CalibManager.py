@@ -7,6 +7,8 @@ from datetime import datetime
 import pandas as pd
 
 from calibtool.IterationState import IterationState
+from calibtool.plotters.PlottingQueue import PlottingQueue
+from calibtool.ResultsStore import ResultsStore
 from calibtool.utils import StatusPoint
 from simtools.DataAccess.DataStore import DataStore
 from simtools.ExperimentManager.ExperimentManagerFactory import ExperimentManagerFactory
@@ -42,10 +44,24 @@ class CalibManager(object):
     Manages the creation, execution, and resumption of multi-iteration a calibration suite.
     Each iteration spawns a new ExperimentManager to configure and commission either local
     or HPC simulations for a set of random seeds, sample points, and site configurations.
+
+    In asynchronous mode, the simulations of each sample are analyzed as soon as they complete. If the next-point
+    algorithm supports partial results and cancel_last_samples > 0, the iteration ends as soon as at most
+    cancel_last_samples samples are still running: these stragglers are cancelled (the time they already ran is
+    lost) and the next samples are chosen from the completed ones. The iterations do not overlap.
+
+    plot_mode selects when the plotters run:
+    - 'inline' (default): in the calibration process, between the iteration steps
+    - 'background': in a process forked from the calibration, which does not wait for the plots. The fork copies
+      the state of the calibration process (thread pools, database and COMPS connections...): only use it when
+      the plotters do not rely on these
+    - 'deferred': once for all the iterations at the end of the calibration
+    - 'off': never, the plots can still be rendered later with replot_calibration
     """
 
     def __init__(self,  config_builder, map_sample_to_model_input_fn,
-                 sites, next_point, name='calib_test',  sim_runs_per_param_set=1, max_iterations=5, plotters=None):
+                 sites, next_point, name='calib_test',  sim_runs_per_param_set=1, max_iterations=5, plotters=None,
+                 asynchronous=False, cancel_last_samples=0, plot_mode='inline'):
 
         self.name = name
         self.config_builder = config_builder
@@ -55,6 +71,10 @@ class CalibManager(object):
         self.sim_runs_per_param_set = sim_runs_per_param_set
         self.max_iterations = max_iterations
         self.plotters = plotters or []
+        self.asynchronous = asynchronous
+        self.cancel_last_samples = cancel_last_samples
+        self.plot_mode = plot_mode
+        self.plot_queue = PlottingQueue()
         self.suites = []
         self.all_results = None
         self.summary_table = None
@@ -87,6 +107,10 @@ class CalibManager(object):
     def iteration(self):
         return self.current_iteration.iteration if self.current_iteration else 0
 
+    @property
+    def results_store(self):
+        return ResultsStore(self.name)
+
     def run_calibration(self):
         """
         Create and run a complete multi-iteration calibration suite.
@@ -123,6 +147,8 @@ class CalibManager(object):
     def post_iteration(self):
         self.all_results = self.current_iteration.all_results
         self.summary_table = self.current_iteration.summary_table
+        if isinstance(self.all_results, pd.DataFrame):
+            self.results_store.append(self.all_results[self.all_results.iteration == self.iteration])
         self.cache_calibration(iteration=self.iteration+1)
 
     def exp_builder_func(self, next_params, n_replicates=None):
@@ -152,6 +178,10 @@ class CalibManager(object):
                               config_builder=self.config_builder,
                               plotters=self.plotters,
                               all_results=self.all_results,
+                              asynchronous=self.asynchronous,
+                              cancel_last_samples=self.cancel_last_samples,
+                              plot_mode=self.plot_mode,
+                              plot_queue=self.plot_queue,
                               calibration_start=self.calibration_start)
 
     def create_calibration(self, location):
@@ -199,6 +229,42 @@ class CalibManager(object):
         # remove any leftover experiments
         self.cleanup_orphan_experiments()
 
+        # Let the plots rendered in the background finish
+        self.plot_queue.wait()
+        if self.plot_mode == 'deferred':
+            self.replot_calibration()
+
+    def replot_calibration(self, iteration=None):
+        """
+        Render the plots of an iteration (all the analyzed iterations if None) from its saved state.
+        """
+        latest_iteration = int(self.read_calib_data().get('iteration', 0))
+        iterations = range(latest_iteration + 1) if iteration is None else [iteration]
+
+        for i in iterations:
+            if not os.path.exists(os.path.join(self.name, 'iter%d' % i, 'IterationState.json')):
+                continue
+
+            it = IterationState.restore_state(self.name, i)
+            if StatusPoint[it.status].value < StatusPoint.plot.value:
+                continue  # Not analyzed yet
+
+            results = self.load_results(i)
+            it.update(**self.required_components)
+            it.all_results = results
+            it.restore_results(i)
+            it.next_point_algo.set_state(it.next_point, i)
+            it.plot_mode = 'inline'
+
+            try:
+                it.exp_manager = ExperimentManagerFactory.from_experiment(retrieve_experiment(it.experiment_id))
+            except Exception:
+                logger.info("Experiment of iteration %d not found, plotting without it." % i)
+
+            logger.info('Plotting iteration %d' % i)
+            it._status = StatusPoint.plot
+            it.plot_iteration()
+
     def cache_calibration(self, **kwargs):
         """
         Cache information about the CalibManager that is needed to resume after an interruption.
@@ -211,7 +277,6 @@ class CalibManager(object):
                  'iteration': self.iteration,
                  'param_names': self.param_names(),
                  'sites': self.site_analyzer_names(),
-                 'results': self.serialize_results(),
                  'setup_overlay_file': SetupParser.setup_file,
                  'selected_block': SetupParser.selected_block,
                  'calibration_start': self.calibration_start}
@@ -227,20 +292,26 @@ class CalibManager(object):
             backup_id = 'backup_' + re.sub('[ :.-]', '_', str(datetime.now().replace(microsecond=0)))
             shutil.copy(calibration_path, os.path.join(self.name, 'CalibManager_%s.json' % backup_id))
 
-    def serialize_results(self):
-        if self.all_results is None:
-            return []
-
-        if not isinstance(self.all_results, pd.DataFrame):
-            return self.all_results
-
-        self.all_results.index.name = 'sample'
-        data = self.all_results.reset_index()
+    def load_results(self, max_iteration=None, calib_data=None):
+        """
+        Load the results of the iterations up to max_iteration from the results store (or from the CalibManager.json
+        of the calibrations started before the results store).
+        :return: DataFrame of the results or an empty list if no iteration was analyzed yet
+        """
+        stored = self.results_store.read(max_iteration=max_iteration)
+        if stored is not None:
+            return stored
 
-        data.iteration = data.iteration.astype(int)
-        data['sample'] = data['sample'].astype(int)
+        results = (calib_data or self.read_calib_data()).get('results')
+        if isinstance(results, dict):
+            all_results = pd.DataFrame.from_dict(results, orient='columns')
+            # Calibration from before the results store: move its results to the store
+            self.results_store.append(all_results.set_index('sample'))
+            return all_results
+        elif isinstance(results, list):
+            return results
 
-        return data.to_dict(orient='list')
+        return []
 
     def resume_calibration(self, iteration=None, iter_step=None):
         self.resume = True
@@ -269,11 +340,7 @@ class CalibManager(object):
         self.current_iteration, resume_point = self.retrieve_iteration(iteration, iter_step)
 
         # step 4: load all_results
-        results = calib_data.get('results')
-        if isinstance(results, dict):
-            self.all_results = pd.DataFrame.from_dict(results, orient='columns')
-        elif isinstance(results, list):
-            self.all_results = results
+        self.all_results = self.load_results(self.current_iteration.iteration, calib_data)
 
         # step 5: update required objects for resume
         self.current_iteration.update(**self.required_components)
@@ -563,6 +630,10 @@ class CalibManager(object):
                     'analyzer_list': self.analyzer_list,
                     'plotters': self.plotters,
                     'all_results': self.all_results,
+                    'asynchronous': self.asynchronous,
+                    'cancel_last_samples': self.cancel_last_samples,
+                    'plot_mode': self.plot_mode,
+                    'plot_queue': self.plot_queue,
                     'calibration_start': self.calibration_start,
                     'site_analyzer_names': self.site_analyzer_names()
                 }
@@ -3,6 +3,7 @@ import os
 import time
 from datetime import datetime
 import pandas as pd
+from COMPS.Data.Simulation import SimulationState
 from calibtool.utils import StatusPoint
 from simtools.AnalyzeManager.AnalyzeManager import AnalyzeManager
 from simtools.DataAccess.DataStore import DataStore
@@ -31,7 +32,7 @@ class IterationState:
         self.samples_for_this_iteration = {}
         self.next_point = {}
         self.simulations = {}
-        self.analyzers = {}
+        self._analyzers = None
         self.results = {}
         self.experiment_id = None
         self.exp_manager = None
@@ -45,6 +46,11 @@ class IterationState:
         self.summary_table = None
         self.iteration_start = None
         self.calibration_start = None
+        self.asynchronous = False
+        self.cancel_last_samples = 0
+        self.analyze_manager = None
+        self.plot_mode = 'inline'
+        self.plot_queue = None
 
         if 'calibration_start' in kwargs:
             cs = kwargs.pop('calibration_start')
@@ -66,6 +72,23 @@ class IterationState:
     def status(self):
         return self._status
 
+    @property
+    def analyzers(self):
+        """
+        Analyzers caches of the iteration, kept in their own file written once after the analysis
+        and only loaded when needed (plotting).
+        """
+        if self._analyzers is None:
+            self._analyzers = {}
+            if self.calibration_name and os.path.exists(self.analyzers_file):
+                with open(self.analyzers_file, 'r', encoding='utf-8') as f:
+                    self._analyzers = json.load(f, object_hook=json_numpy_obj_hook)
+        return self._analyzers
+
+    @analyzers.setter
+    def analyzers(self, analyzers):
+        self._analyzers = analyzers
+
     @status.setter
     def status(self, status):
         self._status = status
@@ -81,7 +104,7 @@ class IterationState:
         """
         # Depending on the type of results (lists or dicts), handle differently how we treat the results
         # This should be refactor to take care of both cases at once
-        if len(self.all_results) == 0:
+        if self.all_results is None or len(self.all_results) == 0:
             self.all_results = None
         elif isinstance(self.all_results, pd.DataFrame):
             self.all_results.set_index('sample', inplace=True)
@@ -139,7 +162,10 @@ class IterationState:
         # RUNNING
         if self.status == StatusPoint.commission:
             self.status = StatusPoint.running
-            self.wait_for_finished()
+            if self.asynchronous:
+                self.wait_for_samples()
+            else:
+                self.wait_for_finished()
 
         # ANALYZE STEP
         if self.status == StatusPoint.running:
@@ -227,6 +253,15 @@ class IterationState:
             self.save()
 
     def plot_iteration(self):
+        # Plots deferred to the end of the calibration or disabled
+        if self.plot_mode in ('deferred', 'off'):
+            return
+
+        # Render in a worker process from a snapshot of the current state
+        if self.plot_mode == 'background' and self.plot_queue:
+            self.plot_queue.submit(self.plotters, self)
+            return
+
         # Run all the plotters
         for plotter in self.plotters:
             plotter.visualize(self)
@@ -243,10 +278,20 @@ class IterationState:
         if not self.exp_manager:
             self.exp_manager = ExperimentManagerFactory.from_experiment(self.experiment_id)
 
-        analyzerManager = AnalyzeManager(exp_list=self.exp_manager.experiment,
-                                         analyzers=self.analyzer_list,
-                                         working_dir=self.iteration_directory)
+        if self.asynchronous:
+            # Only the samples with all their simulations succeeded are analyzed,
+            # most of them were already parsed while waiting for the others
+            self.exp_manager.refresh_experiment()
+            samples = self.simulations_by_sample()
+            analyzerManager = self.analyze_manager or AnalyzeManager(analyzers=self.analyzer_list,
+                                                                     working_dir=self.iteration_directory)
+            analyzerManager.parse_simulations(self.completed_simulations(samples))
+        else:
+            analyzerManager = AnalyzeManager(exp_list=self.exp_manager.experiment,
+                                             analyzers=self.analyzer_list,
+                                             working_dir=self.iteration_directory)
         analyzerManager.analyze()
+        self.analyze_manager = None
 
         # Ask the analyzers to cache themselves
         cached_analyses = {a.uid if not callable(a.uid) else a.uid(): a.cache() for a in analyzerManager.analyzers}
@@ -254,11 +299,15 @@ class IterationState:
 
         # Get the results from the analyzers and ask the next point how it wants to cache them
         results = pd.DataFrame({a.uid if not callable(a.uid) else a.uid(): a.result for a in analyzerManager.analyzers})
+        if self.asynchronous:
+            # The last samples cancelled (cancel_last_samples) have no results
+            results = results.reindex(sorted(samples))
         cached_results = self.next_point_algo.get_results_to_cache(results)
 
         # Store the analyzers and results in the iteration state
         self.analyzers = cached_analyses
         self.results = cached_results
+        self.save_analyzers()
 
         # Set those results in the next point algorithm
         self.next_point_algo.set_results_for_iteration(self.iteration, results)
@@ -273,27 +322,14 @@ class IterationState:
             self.exp_manager.refresh_experiment()
 
             # Output time info
-            current_time = datetime.now()
-            iteration_time_elapsed = current_time - self.iteration_start
-            calibration_time_elapsed = current_time - self.calibration_start
-
-            logger.info('\n\nCalibration: %s' % self.calibration_name)
-            logger.info('Calibration started: %s' % self.calibration_start)
-            logger.info('Current iteration: Iteration %s' % self.iteration)
-            logger.info('Current Iteration Started: %s' % self.iteration_start)
-            logger.info('Time since iteration started: %s' % verbose_timedelta(iteration_time_elapsed))
-            logger.info('Time since calibration started: %s\n' % verbose_timedelta(calibration_time_elapsed))
+            self.log_progress()
 
             # Display the statuses
             if verbose:
                 self.exp_manager.print_status()
 
             # If Calibration has been canceled -> exit
-            if self.exp_manager.any_failed_or_cancelled():
-                # Kill the remaining simulations
-                print("\nOne or more simulations failed/cancelled. Calibration cannot continue. Exiting...")
-                self.kill()
-                exit()
+            self.exit_if_failed()
 
             # Test if we are all done
             if self.exp_manager.experiment.is_done():
@@ -302,9 +338,86 @@ class IterationState:
             time.sleep(sleep_time)
 
         # Print the status one more time
-        iteration_time_elapsed = current_time - self.iteration_start
+        iteration_time_elapsed = datetime.now() - self.iteration_start
         logger.info("Iteration %s done (took %s)" % (self.iteration, verbose_timedelta(iteration_time_elapsed)))
 
+    def wait_for_samples(self, verbose=True, init_sleep=1.0, sleep_time=10):
+        """
+        Asynchronous version of wait_for_finished.
+        The simulations of a sample are parsed as soon as they all succeeded, while the other samples are running.
+        If the next-point algorithm supports partial results, stop waiting when at most cancel_last_samples samples
+        are still running: their simulations are cancelled (their results are lost, they are not carried over to the
+        next iteration) and the next point is chosen from the completed samples.
+        """
+        self.analyze_manager = AnalyzeManager(analyzers=self.analyzer_list, working_dir=self.iteration_directory)
+        partial = self.cancel_last_samples > 0 and self.next_point_algo.supports_partial_results
+
+        time.sleep(init_sleep)
+        while True:
+            self.exp_manager.refresh_experiment()
+            self.log_progress()
+
+            if verbose:
+                self.exp_manager.print_status()
+
+            self.exit_if_failed()
+
+            # Parse the newly completed samples
+            samples = self.simulations_by_sample()
+            completed = self.completed_simulations(samples)
+            self.analyze_manager.parse_simulations(completed)
+
+            running = [sample for sample, simulations in samples.items()
+                       if any(s.status != SimulationState.Succeeded for s in simulations)]
+            if not running:
+                break
+
+            if partial and len(running) <= self.cancel_last_samples:
+                logger.info("%d sample(s) still running, cancelling them and continuing with the %d completed"
+                            % (len(running), len(samples) - len(running)))
+                self.exp_manager.cancel_simulations([s for sample in running for s in samples[sample]])
+                break
+
+            time.sleep(sleep_time)
+
+        iteration_time_elapsed = datetime.now() - self.iteration_start
+        logger.info("Iteration %s done (took %s)" % (self.iteration, verbose_timedelta(iteration_time_elapsed)))
+
+    def log_progress(self):
+        current_time = datetime.now()
+        iteration_time_elapsed = current_time - self.iteration_start
+        calibration_time_elapsed = current_time - self.calibration_start
+
+        logger.info('\n\nCalibration: %s' % self.calibration_name)
+        logger.info('Calibration started: %s' % self.calibration_start)
+        logger.info('Current iteration: Iteration %s' % self.iteration)
+        logger.info('Current Iteration Started: %s' % self.iteration_start)
+        logger.info('Time since iteration started: %s' % verbose_timedelta(iteration_time_elapsed))
+        logger.info('Time since calibration started: %s\n' % verbose_timedelta(calibration_time_elapsed))
+
+    def exit_if_failed(self):
+        if self.exp_manager.any_failed_or_cancelled():
+            # Kill the remaining simulations
+            print("\nOne or more simulations failed/cancelled. Calibration cannot continue. Exiting...")
+            self.kill()
+            exit()
+
+    def simulations_by_sample(self):
+        """
+        The simulations of the iteration (all the replicates and sites) grouped by sample index.
+        """
+        samples = {}
+        for simulation in self.exp_manager.experiment.simulations:
+            samples.setdefault(int(simulation.tags['__sample_index__']), []).append(simulation)
+        return samples
+
+    @staticmethod
+    def completed_simulations(samples):
+        """
+        The simulations of the samples whose simulations all succeeded.
+        """
+        return [s for simulations in samples.values() if all(s.status == SimulationState.Succeeded for s in simulations)
+                for s in simulations]
 
     def kill(self):
         """
@@ -326,6 +439,10 @@ class IterationState:
     def iteration_file(self):
         return os.path.join(self.iteration_directory, "IterationState.json")
 
+    @property
+    def analyzers_file(self):
+        return os.path.join(self.iteration_directory, "Analyzers.json")
+
     @property
     def param_names(self):
         return self.next_point_algo.get_param_names()
@@ -343,7 +460,6 @@ class IterationState:
         state = {
                  'status': self.status.name,
                  'samples_for_this_iteration': self.samples_for_this_iteration,
-                 'analyzers': self.analyzers,
                  'iteration': self.iteration,
                  'iteration_start': self.iteration_start,
                  'results': self.results,
@@ -375,6 +491,11 @@ class IterationState:
         else:
             self.samples_for_this_iteration = samples
 
+    def save_analyzers(self):
+        if not self.calibration_name: return
+        with open(self.analyzers_file, 'w') as f:
+            json.dump(self.analyzers, f, cls=NumpyEncoder)
+
     def save(self):
         """
         Cache information about the IterationState that is needed to resume after an interruption.
@@ -382,3 +503,7 @@ class IterationState:
         """
         if not self.calibration_name: return
         self.to_file()
+
+        # State from before the analyzers file
+        if self._analyzers and not os.path.exists(self.analyzers_file):
+            self.save_analyzers()
@@ -1,9 +1,28 @@
 import math
 
 import numpy as np
+import pandas as pd
 from scipy.special import gammaln
 
 
+_reference_terms = {}
+MAX_REFERENCE_TERMS = 64
+
+
+def gammaln_reference(values):
+    """
+    gammaln(values + 1) for reference data: the same reference is compared to every simulation,
+    the result is computed once and cached.
+    """
+    values = np.asarray(values, dtype=float)
+    key = (values.shape, values.tobytes())
+    if key not in _reference_terms:
+        if len(_reference_terms) >= MAX_REFERENCE_TERMS:
+            _reference_terms.clear()
+        _reference_terms[key] = gammaln(values + 1)
+    return _reference_terms[key]
+
+
 """
 Functions below compare "ref" and "sim" columns of a pandas.DataFrame
 """
@@ -15,15 +34,15 @@ def dirichlet_multinomial_pandas(df):
     # e.g. if levels are ['Channel', 'Season', 'Age Bin', 'PfPR Bin']
     #      keep first three in index, while summing over the last level.
     sum_levels = df.index.names[:-1]
-    n_obs = df.sum(level=sum_levels)
+    n_obs = df.groupby(level=sum_levels).sum()
     n_categories = len(df.index.levels[-1])
 
     n_obs['LL'] = gammaln(n_obs.ref + 1) \
                 + gammaln(n_obs.sim) \
                 - gammaln(n_obs.ref + n_obs.sim + n_categories) \
-                + gammaln(df.ref + df.sim + 1).sum(level=sum_levels) \
-                - gammaln(df.sim + 1).sum(level=sum_levels) \
-                - gammaln(df.ref + 1).sum(level=sum_levels)
+                + gammaln(df.ref + df.sim + 1).groupby(level=sum_levels).sum() \
+                - gammaln(df.sim + 1).groupby(level=sum_levels).sum() \
+                - gammaln(df.ref + 1).groupby(level=sum_levels).sum()
 
     return n_obs.LL.mean() / n_categories
 
@@ -60,28 +79,107 @@ def beta_binomial_pandas(df):
 
     return LL.mean()
 
+"""
+Same comparisons for all the samples of an iteration at once.
+:param ref: reference DataFrame (rows x channels)
+:param sims: {channel: array [n_samples, rows]} aligned on the reference rows (see stack_samples)
+:return: array [n_samples]
+"""
+
+
+def dirichlet_multinomial_pandas_batch(ref, sims):
+    channel = ref.columns[0]
+    ref_counts = ref[channel].values.astype(float)
+    sim_counts = sims[channel]
+
+    # Rows -> group of the levels summed over, as in dirichlet_multinomial_pandas
+    groups = pd.MultiIndex.from_arrays([ref.index.get_level_values(i) for i in range(ref.index.nlevels - 1)]) \
+        if ref.index.nlevels > 2 else ref.index.get_level_values(0)
+    codes, uniques = pd.factorize(groups)
+    n_groups = len(uniques)
+    n_categories = len(ref.index.levels[-1])
+
+    indicator = np.zeros((len(codes), n_groups))
+    indicator[np.arange(len(codes)), codes] = 1
+    ref_nobs = ref_counts.dot(indicator)
+    sim_nobs = sim_counts.dot(indicator)
+
+    LL = (gammaln_reference(ref_nobs) + gammaln(sim_nobs) - gammaln(ref_nobs + sim_nobs + n_categories)).sum(axis=-1) \
+        + (gammaln(ref_counts + sim_counts + 1) - gammaln(sim_counts + 1) - gammaln_reference(ref_counts)).sum(axis=-1)
+
+    return LL / n_groups / n_categories
+
+
+def gamma_poisson_pandas_batch(ref, sims):
+    ref_obs, ref_trials = ref.Observations.values.astype(float), ref.Trials.values.astype(float)
+    sim_obs, sim_trials = sims['Observations'], sims['Trials']
+
+    LL = gammaln(ref_obs + sim_obs + 1) - gammaln_reference(ref_obs) - gammaln(sim_obs + 1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        LL += np.where(ref_trials > 0, (ref_obs + 1) * np.log(ref_trials), 0)
+        LL += np.where(sim_trials > 0, (sim_obs + 1) * np.log(sim_trials), 0)
+        LL -= np.where((ref_trials > 0) & (sim_trials > 0),
+                       (ref_obs + sim_obs + 1) * np.log(ref_trials + sim_trials), 0)
+
+    return LL.mean(axis=-1)
+
+
+def beta_binomial_pandas_batch(ref, sims):
+    ref_obs, ref_trials = ref.Observations.values.astype(float), ref.Trials.values.astype(float)
+    return beta_binomial(ref_trials, sims['Trials'], ref_obs, sims['Observations'])
+
+
+def euclidean_distance_pandas_batch(ref, sims):
+    # Channels are matched by position, as in euclidean_distance_pandas
+    squares = sum(((ref[ref_channel].values - sim) ** 2).sum(axis=-1) for ref_channel, sim in zip(ref.columns, sims.values()))
+    return np.sqrt(squares) * -1
+
+
+def stack_samples(data, ref):
+    """
+    Stack the samples of an iteration aligned on the reference rows, as BaseCalibrationAnalyzer.join_reference does
+    sample by sample.
+    :param data: DataFrame with (sample, channel) columns
+    :param ref: reference DataFrame
+    :return: (samples, ref restricted to the compared rows, {channel: array [n_samples, rows]}) or None if the rows
+    compared would differ between samples (missing values)
+    """
+    samples = sorted(data.columns.get_level_values('sample').unique())
+    if not samples:
+        return None
+
+    first = data[samples[0]]
+    joined = pd.concat({'sim': first, 'ref': ref}, axis=1).dropna()
+    rows = data.reindex(joined.index)
+    if rows.isnull().values.any() or len(data.reindex(ref.dropna().index).dropna()) != len(joined):
+        return None
+
+    # [rows, samples, channels] -> {channel: [samples, rows]}
+    channels = first.columns.tolist()
+    values = rows.reindex(columns=pd.MultiIndex.from_product([samples, channels])).values.astype(float)
+    values = values.reshape(len(rows), len(samples), len(channels))
+    sims = {channel: values[:, :, i].T for i, channel in enumerate(channels)}
+    return samples, joined['ref'], sims
+
+
 """
 Functions below were ported by J.Gerardin
 from K.McCarthy Matlab CalibTool versions
+They also accept stacks of simulations (leading dimensions of sim_data) and then return one result per simulation.
 """
 
 
 def dirichlet_multinomial(raw_data, sim_data):
 
-    num_age_bins = len(raw_data[:, 0])
-    num_cat_bins = len(raw_data[0, :])
-    raw_nobs = [sum(raw_data[i, :]) for i in range(num_age_bins)]
-    sim_nobs = [sum(sim_data[i, :]) for i in range(num_age_bins)]
-    
-    LL = 0.
-    for agebin in range(num_age_bins):
-        LL += gammaln(raw_nobs[agebin] + 1) 
-        LL += gammaln(sim_nobs[agebin]) 
-        LL -= gammaln(raw_nobs[agebin] + sim_nobs[agebin] + num_cat_bins)
-        for catbin in range(num_cat_bins):
-            LL += gammaln(raw_data[agebin, catbin] + sim_data[agebin, catbin] + 1)
-            LL -= gammaln(sim_data[agebin, catbin] + 1)
-            LL -= gammaln(raw_data[agebin, catbin] + 1)
+    raw_data = np.asarray(raw_data, dtype=float)
+    sim_data = np.asarray(sim_data, dtype=float)
+    num_age_bins, num_cat_bins = raw_data.shape
+    raw_nobs = raw_data.sum(axis=-1)
+    sim_nobs = sim_data.sum(axis=-1)
+
+    LL = (gammaln_reference(raw_nobs) + gammaln(sim_nobs) - gammaln(raw_nobs + sim_nobs + num_cat_bins)).sum(axis=-1)
+    LL += (gammaln(raw_data + sim_data + 1) - gammaln(sim_data + 1) - gammaln_reference(raw_data)).sum(axis=(-2, -1))
 
     LL /= (num_age_bins*num_cat_bins)
     return LL
@@ -89,59 +187,51 @@ def dirichlet_multinomial(raw_data, sim_data):
 
 def dirichlet_single(raw_data, sim_data):
 
+    raw_data = np.asarray(raw_data, dtype=float)
+    sim_data = np.asarray(sim_data, dtype=float)
     num_cat_bins = len(raw_data)
-    raw_nobs = sum(raw_data)
-    sim_nobs = sum(sim_data)
-    
-    LL = 0.
-    LL += gammaln(raw_nobs + 1)
-    LL += gammaln(sim_nobs + num_cat_bins)
-    LL -= gammaln(raw_nobs + sim_nobs + num_cat_bins)
-    for catbin in range(num_cat_bins) :
-        LL += gammaln(raw_data[catbin] + sim_data[catbin] + 1)
-        LL -= gammaln(sim_data[catbin] + 1)
-        LL -= gammaln(raw_data[catbin] + 1)
+    raw_nobs = raw_data.sum()
+    sim_nobs = sim_data.sum(axis=-1)
+
+    LL = gammaln_reference(raw_nobs) + gammaln(sim_nobs + num_cat_bins) - gammaln(raw_nobs + sim_nobs + num_cat_bins)
+    LL += (gammaln(raw_data + sim_data + 1) - gammaln(sim_data + 1) - gammaln_reference(raw_data)).sum(axis=-1)
 
     LL /= num_cat_bins
     return LL
 
 
 def beta_binomial(raw_nobs, sim_nobs, raw_data, sim_data):
-    
-    num_bins = len(raw_data)
-    
-    LL = 0.
-    for this_bin in range(num_bins):
-        LL += gammaln(raw_nobs[this_bin] + 1)
-        LL += gammaln(sim_nobs[this_bin] + 2)
-        LL -= gammaln(raw_nobs[this_bin] + sim_nobs[this_bin] + 2)
-        LL += gammaln(raw_data[this_bin] + sim_data[this_bin] + 1)
-        LL += gammaln(raw_nobs[this_bin] - raw_data[this_bin] + sim_nobs[this_bin] - sim_data[this_bin] + 1)
-        LL -= gammaln(raw_data[this_bin] + 1)
-        LL -= gammaln(raw_nobs[this_bin] - raw_data[this_bin] + 1)
-        LL -= gammaln(sim_data[this_bin] + 1)
-        LL -= gammaln(sim_nobs[this_bin] - sim_data[this_bin] + 1)
-
-    LL /= num_bins
-    return LL
+
+    raw_nobs, raw_data = np.asarray(raw_nobs, dtype=float), np.asarray(raw_data, dtype=float)
+    sim_nobs, sim_data = np.asarray(sim_nobs, dtype=float), np.asarray(sim_data, dtype=float)
+
+    LL = gammaln_reference(raw_nobs) \
+       + gammaln(sim_nobs + 2) \
+       - gammaln(raw_nobs + sim_nobs + 2) \
+       + gammaln(raw_data + sim_data + 1) \
+       + gammaln(raw_nobs - raw_data + sim_nobs - sim_data + 1) \
+       - gammaln_reference(raw_data) \
+       - gammaln_reference(raw_nobs - raw_data) \
+       - gammaln(sim_data + 1) \
+       - gammaln(sim_nobs - sim_data + 1)
+
+    return LL.mean(axis=-1)
 
 
 def gamma_poisson(raw_nobs, sim_nobs, raw_data, sim_data):
-    
-    num_bins = len(raw_data)
-    
-    LL = 0.
-    for this_bin in range(num_bins):
-        if raw_nobs[this_bin] > 0:
-            LL += (raw_data[this_bin] + 1) * math.log(raw_nobs[this_bin])
-        if sim_nobs[this_bin] > 0:
-            LL += (sim_data[this_bin] + 1) * math.log(sim_nobs[this_bin])
-        if raw_nobs[this_bin] + sim_nobs[this_bin] > 0:
-            LL -= (raw_data[this_bin] + sim_data[this_bin] + 1) * math.log(raw_nobs[this_bin] + sim_nobs[this_bin])
-        LL += gammaln(raw_data[this_bin] + sim_data[this_bin] + 1)
-        LL -= gammaln(raw_data[this_bin] + 1)
-        LL -= gammaln(sim_data[this_bin] + 1)
 
+    raw_nobs, raw_data = np.asarray(raw_nobs, dtype=float), np.asarray(raw_data, dtype=float)
+    sim_nobs, sim_data = np.asarray(sim_nobs, dtype=float), np.asarray(sim_data, dtype=float)
+    num_bins = raw_data.shape[-1]
+
+    LL = gammaln(raw_data + sim_data + 1) - gammaln_reference(raw_data) - gammaln(sim_data + 1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        LL += np.where(raw_nobs > 0, (raw_data + 1) * np.log(raw_nobs), 0)
+        LL += np.where(sim_nobs > 0, (sim_data + 1) * np.log(sim_nobs), 0)
+        LL -= np.where(raw_nobs + sim_nobs > 0, (raw_data + sim_data + 1) * np.log(raw_nobs + sim_nobs), 0)
+
+    LL = LL.sum(axis=-1)
     if num_bins != 0:
         LL /= num_bins
     return LL
@@ -153,8 +243,9 @@ Other weighting functions
 
 def euclidean_distance(raw_data, sim_data):
 
-    num_obs = len(raw_data)
-    return math.sqrt(sum([(raw_data[x] - sim_data[x])**2 for x in range(num_obs)]))*-1
+    raw_data = np.asarray(raw_data, dtype=float)
+    sim_data = np.asarray(sim_data, dtype=float)
+    return np.sqrt(((raw_data - sim_data[..., :len(raw_data)])**2).sum(axis=-1))*-1
 
 
 def euclidean_distance_pandas(df):
@@ -170,3 +261,10 @@ def weighted_squares(raw_data, sim_data):
 
     num_obs = len(raw_data)
     return math.sqrt(sum([(raw_data[x] - sim_data[x])**2/raw_data[x] for x in range(num_obs)]))*-1
+
+
+# Batched versions of the pandas comparison functions, used by BaseCalibrationAnalyzer.finalize
+BATCHED = {dirichlet_multinomial_pandas: dirichlet_multinomial_pandas_batch,
+           gamma_poisson_pandas: gamma_poisson_pandas_batch,
+           beta_binomial_pandas: beta_binomial_pandas_batch,
+           euclidean_distance_pandas: euclidean_distance_pandas_batch}
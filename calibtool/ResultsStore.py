@@ -0,0 +1,75 @@
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+
+class ResultsStore:
+    """
+    Append-only store of the calibration results (one row per sample) in the calibration directory.
+    Each iteration is appended once when done instead of rewriting the whole results table in CalibManager.json.
+    """
+    filename = 'results.sqlite'
+    table = 'results'
+
+    def __init__(self, calibration_name):
+        self.path = os.path.join(calibration_name, self.filename)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    @staticmethod
+    def quote(name):
+        return '"%s"' % str(name).replace('"', '""')
+
+    def columns(self, conn):
+        return [row[1] for row in conn.execute('PRAGMA table_info(%s)' % self.quote(self.table))]
+
+    def append(self, results):
+        """
+        Store the results of one or more iterations.
+        The rows previously stored for these iterations and the following ones (resumed calibration) are replaced.
+        :param results: DataFrame of the results indexed by sample, with an iteration column
+        """
+        if results.empty:
+            return
+
+        data = results.rename_axis('sample').reset_index()
+        data['iteration'] = data['iteration'].astype(int)
+
+        with closing(sqlite3.connect(self.path)) as conn:
+            columns = self.columns(conn)
+            if columns:
+                conn.execute('DELETE FROM %s WHERE iteration >= ?' % self.quote(self.table),
+                             (int(data['iteration'].min()),))
+                for column in data.columns.difference(columns):
+                    conn.execute('ALTER TABLE %s ADD COLUMN %s' % (self.quote(self.table), self.quote(column)))
+            data.to_sql(self.table, conn, if_exists='append', index=False)
+            conn.commit()
+
+    def read(self, max_iteration=None, columns=None):
+        """
+        Load the stored results, with the sample as a column.
+        :param max_iteration: Only load the iterations up to this one
+        :param columns: Only load these columns (sample and iteration are always loaded)
+        :return: DataFrame of the results or None if nothing is stored yet
+        """
+        if not self.exists():
+            return None
+
+        with closing(sqlite3.connect(self.path)) as conn:
+            stored = self.columns(conn)
+            if not stored:
+                return None
+
+            if columns is not None:
+                stored = ['sample', 'iteration'] + [c for c in stored if c in columns and c not in ('sample', 'iteration')]
+
+            query = 'SELECT %s FROM %s' % (', '.join(self.quote(c) for c in stored), self.quote(self.table))
+            params = ()
+            if max_iteration is not None:
+                query += ' WHERE iteration <= ?'
+                params = (int(max_iteration),)
+
+            return pd.read_sql_query(query + ' ORDER BY rowid', conn, params=params)
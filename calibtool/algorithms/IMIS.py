@@ -30,6 +30,7 @@ class IMIS(NextPointAlgorithm):
     iteratively constructed importance sampling distribution that covers the target distribution
     well.
     """
+    supports_partial_results = True
 
     def __init__(self, prior_fn, initial_samples=1e4, samples_per_iteration=1e3, n_resamples=3e3, current_state=None):
 
@@ -440,7 +441,8 @@ class IMIS(NextPointAlgorithm):
             self.validate_parameters()  # if the current state is being reset from file
 
     def set_results_for_iteration(self, iteration, results):
-        results = results.total.tolist()
+        # The samples without results have a null likelihood, hence no weight
+        results = results.total.fillna(0).tolist()
         logger.info('%s: Choosing samples at iteration %d:', self.__class__.__name__, iteration)
         logger.debug('Results:\n%s', results)
 
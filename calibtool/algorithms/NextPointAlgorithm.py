@@ -5,6 +5,9 @@ import pandas as pd
 
 
 class NextPointAlgorithm(metaclass=ABCMeta):
+    # Can the next samples be chosen from the results of part of the iteration samples?
+    # The missing results are NaN (see IterationState.wait_for_samples)
+    supports_partial_results = False
 
     def __init__(self):
         self.iteration = 0
@@ -79,7 +82,7 @@ class NextPointAlgorithm(metaclass=ABCMeta):
         return previous_results, previous_results[['iteration', 'total']].head(10)
 
     def get_results_to_cache(self, results):
-        results['total'] = results.sum(axis=1)
+        results['total'] = results.sum(axis=1, min_count=1)
         return results.to_dict(orient='list')
 
 
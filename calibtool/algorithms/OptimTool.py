@@ -17,6 +17,8 @@ class OptimTool(NextPointAlgorithm):
 
     The basic idea of OptimTool is
     """
+    supports_partial_results = True
+
     def __init__(self, params, constrain_sample_fn=lambda s: s, mu_r=0.1, sigma_r=0.02, center_repeats=2,
                  samples_per_iteration=1e2, rsquared_thresh=0.5):
 
@@ -191,10 +193,12 @@ class OptimTool(NextPointAlgorithm):
         dynamic_params = [r['Parameter'] for idx, r in state_prev_iter.iterrows() if r['Dynamic']]
 
         self.data.set_index('Iteration', inplace=True)
-        latest_dynamic_samples = self.data.loc[iteration - 1, dynamic_params].values
-        latest_results = self.data.loc[iteration - 1, 'Results'].values
+        latest_dynamic_samples = self.data.loc[iteration - 1, dynamic_params].values.astype(float)
+        latest_results = self.data.loc[iteration - 1, 'Results'].values.astype(float)
 
-        mod = sm.OLS(latest_results, sm.add_constant(latest_dynamic_samples))
+        # Leave the samples without results out of the regression
+        evaluated = ~np.isnan(latest_results)
+        mod = sm.OLS(latest_results[evaluated], sm.add_constant(latest_dynamic_samples[evaluated]))
 
         mod_fit = mod.fit()
         # print(mod_fit.summary())
@@ -244,7 +248,9 @@ class OptimTool(NextPointAlgorithm):
 
         self.fit_summary = mod_fit.summary().as_csv()
 
-        self.data.loc[iteration - 1, 'Fitted'] = mod_fit.fittedvalues
+        fitted = np.full(len(latest_results), np.nan)
+        fitted[evaluated] = mod_fit.fittedvalues
+        self.data.loc[iteration - 1, 'Fitted'] = fitted
         self.data.reset_index(inplace=True)
 
         # Choose X_center for this iteration based on previous
@@ -261,7 +267,7 @@ class OptimTool(NextPointAlgorithm):
 
         else:
             # print('Bad R^2 (%f)'%mod_fit.rsquared)
-            max_idx = np.argmax(latest_results)
+            max_idx = np.nanargmax(latest_results)
             'Stepping to argmax of %f at:' % latest_results[max_idx], latest_dynamic_samples[max_idx]
             new_dynamic_center = latest_dynamic_samples[max_idx].tolist()
 
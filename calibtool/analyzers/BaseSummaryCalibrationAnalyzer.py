@@ -1,6 +1,7 @@
 import logging
 import threading
 import pandas as pd
+from calibtool import LL_calculators
 from calibtool.analyzers.BaseComparisonAnalyzer import BaseComparisonAnalyzer
 
 logger = logging.getLogger(__name__)
@@ -40,8 +41,15 @@ class BaseSummaryCalibrationAnalyzer(BaseComparisonAnalyzer):
     def finalize(self):
         """
         Calculate the output result for each sample.
+        All the samples are compared at once when the comparison function has a batched version.
         """
-        self.result = self.data.groupby(level='sample', axis=1).apply(self.compare)
+        batch_fn = LL_calculators.BATCHED.get(self.compare_fn)
+        stacked = LL_calculators.stack_samples(self.data, self.reference) if batch_fn else None
+        if stacked:
+            samples, ref, sims = stacked
+            self.result = pd.Series(batch_fn(ref, sims), index=pd.Index(samples, name='sample'))
+        else:
+            self.result = self.data.groupby(level='sample', axis=1).apply(self.compare)
         logger.debug(self.result)
 
     def cache(self):
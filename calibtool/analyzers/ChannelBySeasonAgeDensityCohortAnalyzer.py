@@ -1,12 +1,15 @@
+import calendar
 import logging
+from datetime import date
+
+import numpy as np
 import pandas as pd
 
-from dtk.utils.parsers.malaria_summary import summary_channel_to_pandas
+from dtk.utils.parsers.malaria_summary import get_grouping_for_summary_channel, get_bins_for_summary_grouping
 
-from calibtool.analyzers.BaseCalibrationAnalyzer import BaseCalibrationAnalyzer, thread_lock
+from calibtool.analyzers.BaseCalibrationAnalyzer import BaseCalibrationAnalyzer
 from calibtool import LL_calculators
-from calibtool.analyzers.Helpers import \
-    convert_to_counts, age_from_birth_cohort, season_from_time, aggregate_on_index
+from calibtool.analyzers.Helpers import ReferenceBinning
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +34,41 @@ class ChannelBySeasonAgeDensityCohortAnalyzer(BaseCalibrationAnalyzer):
 
         self.seasons = kwargs.get('seasons')
 
+        # Reference binning of each channel, compiled once for all the simulations
+        self.binnings = {channel: ReferenceBinning(self.reference.loc[channel].index) for channel in self.channels}
+
+        # Flat reference bins of the (Time, PfPR Bin) simulation bins by channel and simulation binning
+        self.flat_codes = {}
+
+    def time_columns(self, time):
+        """
+        Values of the birth cohort by time: 'Age Bin' from 'Time' and 'Season' (or 'Month') of the day of year
+        """
+        months = [calendar.month_name[date.fromordinal(1 + int(t) % 365).month] for t in time]
+        columns = {'Time': time, 'Age Bin': time / 365.0}
+        if self.seasons:
+            columns['Season'] = np.array([self.seasons.get(m) for m in months], dtype=object)
+        else:
+            columns['Month'] = np.array(months, dtype=object)
+        return columns
+
+    def get_flat_codes(self, channel, time, pfpr_bins):
+        key = (channel, tuple(time), tuple(pfpr_bins))
+        if key not in self.flat_codes:
+            # Time along the first axis, PfPR Bin along the second
+            columns = {k: v[:, np.newaxis] for k, v in self.time_columns(time).items()}
+            columns['PfPR Bin'] = pfpr_bins[np.newaxis, :]
+
+            binning = self.binnings[channel]
+            missing = [name for name in binning.names if name not in columns]
+            if missing:
+                raise Exception('Cannot perform aggregation as MultiIndex level (%s) not found in simulation bins %s'
+                                % (', '.join(missing), list(columns.keys())))
+
+            self.flat_codes[key] = binning.flat_codes(*[columns[name] for name in binning.names])
+
+        return self.flat_codes[key]
+
     def apply(self, parser):
         """
         Extract data from output simulation data and accumulate in same bins as reference.
@@ -39,29 +77,26 @@ class ChannelBySeasonAgeDensityCohortAnalyzer(BaseCalibrationAnalyzer):
         # Load data from simulation
         data = parser.raw_data[self.filenames[0]]
 
-        # Population by age and time series (to convert parasite prevalence to counts)
-        population = summary_channel_to_pandas(data, self.population_channel)
+        # Population by time and age (to convert parasite prevalence to counts)
+        population = np.asarray(data[get_grouping_for_summary_channel(data, self.population_channel)]
+                                [self.population_channel], dtype=float)
 
         # Coerce channel data into format for comparison with reference
         channel_data_dict = {}
         for channel in self.channels:
+            grouping = get_grouping_for_summary_channel(data, channel)
+            bins = get_bins_for_summary_grouping(data, grouping)
 
-            # Prevalence by density, age, and time series
-            channel_data = summary_channel_to_pandas(data, channel)
-
-            with thread_lock:  # TODO: re-code following block to ensure thread safety (Issue #758)?
-
-                # Calculate counts from prevalence and population
-                channel_counts = convert_to_counts(channel_data, population)
+            # Prevalence by time, density and age
+            channel_data = np.asarray(data[grouping][channel], dtype=float)
 
-                # Reset multi-index and perform transformations on index columns
-                df = channel_counts.reset_index()
-                df = age_from_birth_cohort(df)  # calculate age from time for birth cohort
-                df = season_from_time(df, seasons=self.seasons)  # calculate month from time
+            # Counts from prevalence and population, summed over the age bins (age is taken from time for the cohort)
+            counts = np.nansum(channel_data * population[:, np.newaxis, :], axis=2)
 
-                # Re-bin according to reference and return single-channel Series
-                rebinned = aggregate_on_index(df, self.reference.loc(axis=1)[channel].index, keep=[channel])
-                channel_data_dict[channel] = rebinned[channel].rename('Counts')
+            # Re-bin according to reference and return single-channel Series
+            flat = self.get_flat_codes(channel, np.asarray(bins['Time'], dtype=float),
+                                       np.asarray(bins['PfPR Bin'], dtype=float))
+            channel_data_dict[channel] = self.binnings[channel].rebin(flat, counts, name='Counts')
 
         sim_data = pd.concat(channel_data_dict.values(), keys=channel_data_dict.keys(), names=['Channel'])
         sim_data = pd.DataFrame(sim_data)  # single-column DataFrame for standardized combine/compare pattern
@@ -8,9 +8,9 @@ from scipy.stats import binom
 
 from calibtool import LL_calculators
 from dtk.utils.parsers.malaria_summary import summary_channel_to_pandas
-from calibtool.analyzers.BaseCalibrationAnalyzer import BaseCalibrationAnalyzer, thread_lock
+from calibtool.analyzers.BaseCalibrationAnalyzer import BaseCalibrationAnalyzer
 from calibtool.analyzers.Helpers import \
-    convert_annualized, convert_to_counts, age_from_birth_cohort, aggregate_on_index, aggregate_on_month
+    convert_annualized, convert_to_counts, age_from_birth_cohort, aggregate_on_month, ReferenceBinning
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +29,10 @@ class ChannelBySeasonSpatialCohortAnalyzer(BaseCalibrationAnalyzer):
         super(ChannelBySeasonSpatialCohortAnalyzer, self).__init__(site, weight, compare_fn)
         self.reference = site.get_reference_data(self.site_ref_type)
 
+        # Reference binning of each species, compiled once for all the simulations
+        self.binnings = {channel: ReferenceBinning(self.reference.loc[channel].index)
+                         for channel in site.metadata['species']}
+
     def apply(self, parser):
         """
         Extract data from output data and accumulate in same bins as reference.
@@ -52,18 +56,10 @@ class ChannelBySeasonSpatialCohortAnalyzer(BaseCalibrationAnalyzer):
         data = data.set_index(['Channel', 'Month', 'NodeID'])
         channel_data_dict = {}
 
+        # Re-bin according to reference and return single-channel Series
+        df = data.reset_index()
         for channel in self.site.metadata['species']:
-
-            with thread_lock:  # TODO: re-code following block to ensure thread safety (Issue #758)?
-
-                # Reset multi-index and perform transformations on index columns
-                df = data.copy().reset_index()
-                df = df.rename(columns={'Counts': channel})
-                del df['Channel']
-
-                # Re-bin according to reference and return single-channel Series
-                rebinned = aggregate_on_index(df, self.reference.loc(axis=1)[channel].index, keep=[channel])
-                channel_data_dict[channel] = rebinned[channel].rename('Counts')
+            channel_data_dict[channel] = self.binnings[channel].aggregate(df, 'Counts')
 
         sim_data = pd.concat(channel_data_dict.values(), keys=channel_data_dict.keys(), names=['Channel'])
         sim_data = pd.DataFrame(sim_data)  # single-column DataFrame for standardized combine/compare pattern
@@ -13,6 +13,7 @@ import pandas as pd
 
 
 import dtk.utils.parsers.malaria_summary as malaria_summary
+from dtk.tools.output.SpatialOutput import SpatialOutput
 
 logger = logging.getLogger(__name__)
 
@@ -334,6 +335,88 @@ def aggregate_on_index(df, index, keep=slice(None)):
     return df
 
 
+class ReferenceBinning(object):
+    """
+    The binning of a reference (Multi)Index compiled once into integer maps, with the semantics of aggregate_on_index:
+    object levels keep the values present in the reference, numeric levels are right-bin-edges.
+    Simulation data are then re-binned with a bincount on the flat bin positions: no pandas grouping (not thread safe,
+    see Issue #758) so the analyzers do not need the thread_lock.
+    """
+
+    def __init__(self, index):
+        self.levels = list(index.levels) if isinstance(index, pd.MultiIndex) else [index]
+        self.names = [ix.name for ix in self.levels]
+        self.shape = tuple(len(ix) for ix in self.levels)
+        self.index = pd.MultiIndex.from_product(self.levels, names=self.names) if len(self.levels) > 1 else index
+        self.numeric = [ix.dtype in ['int64', 'float64'] for ix in self.levels]
+
+    def level_codes(self, level, values):
+        """
+        Position of the values in the bins of a level, -1 for the values outside of the reference bins
+        """
+        ix = self.levels[level]
+        values = np.asarray(values)
+
+        if not self.numeric[level]:
+            return ix.get_indexer(values.ravel()).reshape(values.shape)
+
+        # Same as pd.cut on [-inf] + edges: value in (edge[i-1], edge[i]] -> i (NaN and beyond the last edge -> -1)
+        codes = np.searchsorted(ix.values, values, side='left')
+        codes[codes == len(ix)] = -1
+        return codes
+
+    def flat_codes(self, *columns):
+        """
+        Flat position in the reference bins for the values of each level (broadcast together), -1 outside of the bins.
+        The result can be kept to re-bin all the data sharing the same binning, e.g. the simulations of a calibration.
+        :param columns: one array of values per level of the reference index, in the order of the levels
+        """
+        codes = np.broadcast_arrays(*[self.level_codes(i, c) for i, c in enumerate(columns)])
+        inside = np.all([c >= 0 for c in codes], axis=0)
+
+        flat = np.full(inside.shape, -1, dtype=np.intp)
+        flat[inside] = np.ravel_multi_index([c[inside] for c in codes], self.shape)
+        return flat
+
+    def rebin(self, flat, values, name=None):
+        """
+        Sum the values in the reference bins
+        :param flat: flat bin positions as returned by flat_codes
+        :param values: values to aggregate (same shape as flat), missing values are ignored
+        :return: pandas.Series indexed on the reference binning (only the object-level values found in the data)
+        """
+        flat = np.ravel(flat)
+        values = np.ravel(values)
+        inside = flat >= 0
+
+        sums = np.bincount(flat[inside], weights=np.nan_to_num(values[inside]), minlength=np.prod(self.shape))
+
+        # As the groupby on the categorical levels in aggregate_on_index: every bin of the numeric levels is kept
+        # but only the values of the object levels present in the data
+        observed = np.ones(self.shape, dtype=bool)
+        for level, codes in enumerate(np.unravel_index(flat[inside], self.shape)):
+            if not self.numeric[level]:
+                found = np.bincount(codes, minlength=self.shape[level]) > 0
+                observed &= found.reshape([-1 if i == level else 1 for i in range(len(self.shape))])
+
+        observed = observed.ravel()
+        return pd.Series(sums[observed], index=self.index[observed], name=name)
+
+    def aggregate(self, df, column):
+        """
+        Equivalent of aggregate_on_index(df, index, keep=[column])[column]
+        :param df: a pandas.DataFrame with columns matching the reference (Multi)Index (level) names
+        :param column: column to aggregate
+        """
+        missing = [name for name in self.names if name not in df.columns]
+        if missing:
+            raise Exception('Cannot perform aggregation as MultiIndex level (%s) not found in DataFrame:\n%s'
+                            % (', '.join(missing), df.head()))
+
+        flat = self.flat_codes(*[df[name].values for name in self.names])
+        return self.rebin(flat, df[column].values, name=column)
+
+
 def aggregate_on_month(sim, ref):
     months = list(ref['Month'].unique())
     sim = sim[sim['Month'].isin(months)]
@@ -341,42 +424,95 @@ def aggregate_on_month(sim, ref):
     return sim
 
 
-def get_spatial_report_data_at_date(sp_data, date):
+def get_spatial_report_data_at_date(sp_data, date, nodes=None):
+    """
+    Values of a SpatialReport at a given time step.
+    :param sp_data: SpatialOutput or its dictionary representation (as parsed)
+    :param date: Time step index
+    :param nodes: Only read these node ids (all the nodes if None)
+    """
+    if not isinstance(sp_data, SpatialOutput):
+        sp_data = SpatialOutput.from_dict(sp_data)
+
+    return pd.DataFrame({'node': sp_data.nodeids if nodes is None else np.asarray(nodes),
+                         'data': sp_data.get_data(node_ids=nodes, tsteps=date)})
 
-    return pd.DataFrame({'node': sp_data['nodeids'],
-                         'data': sp_data['data'][date]})
+
+class DistanceNeighbors(object):
+    """
+    Sparse index of the pairs of nodes (households) within max_distance of each other, built once per site
+    and used by get_risk_by_distance for every simulation.
+    """
+
+    def __init__(self, node1, node2, dist, max_distance=None):
+        node1, node2, dist = np.asarray(node1), np.asarray(node2), np.asarray(dist, dtype=float)
+        keep = node1 != node2
+        if max_distance is not None:
+            keep &= dist <= max_distance
+        self.node1, self.node2, self.dist = node1[keep], node2[keep], dist[keep]
+
+    @classmethod
+    def from_distance_matrix(cls, ddf, max_distance=None):
+        """
+        :param ddf: DataFrame of the pairwise distances with node1, node2 and dist columns
+        """
+        ddf = ddf.drop_duplicates(['node1', 'node2'])
+        return cls(ddf['node1'].values, ddf['node2'].values, ddf['dist'].values, max_distance)
+
+    @classmethod
+    def from_coordinates(cls, nodes, x, y, max_distance):
+        """
+        :param nodes: Node ids
+        :param x, y: Node coordinates (same unit as max_distance)
+        """
+        from scipy.spatial import cKDTree
+        tree = cKDTree(np.column_stack((x, y)))
+        pairs = tree.sparse_distance_matrix(tree, max_distance, output_type='ndarray')
+        nodes = np.asarray(nodes)
+        return cls(nodes[pairs['i']], nodes[pairs['j']], pairs['v'])
+
+    def pairs_in(self, nodes):
+        """
+        Pairs of the index with both nodes in the given list.
+        :return: (positions of node1 in nodes, positions of node2 in nodes, distances)
+        """
+        index = pd.Index(nodes)
+        rows1, rows2 = index.get_indexer(self.node1), index.get_indexer(self.node2)
+        found = (rows1 >= 0) & (rows2 >= 0)
+        return rows1[found], rows2[found], self.dist[found]
 
 
 def get_risk_by_distance(df_sim, distances, ddf):
+    """
+    Fraction of positive people around the positive households, by distance bin:
+    for the bin (distances[k-1], distances[k]], the positives and population of the neighbors in this bin are summed
+    over the households with at least one positive. The bin of distance 0 uses the household itself.
+    :param df_sim: DataFrame with node, pos and pop columns
+    :param distances: Upper bounds of the distance bins
+    :param ddf: DistanceNeighbors (or DataFrame of the pairwise distances with node1, node2 and dist columns)
+    """
+    neighbors = ddf if isinstance(ddf, DistanceNeighbors) else DistanceNeighbors.from_distance_matrix(ddf)
+    households, others, dist = neighbors.pairs_in(df_sim['node'].values)
 
-    nodelist = df_sim['node'].values.tolist()
-    rel_risk = []
+    pos = df_sim['pos'].values.astype(float)
+    pop = df_sim['pop'].values.astype(float)
+    positive = ~(pos < 1)
 
+    rel_risk = []
     for k, n_dist in enumerate(distances):
+        in_bin = (dist <= n_dist) & (dist > distances[k-1]) & positive[households]
         pos_w_pos = 0.
         tot_w_pos = 0.
 
-        for hh_num in df_sim.index:
-            if df_sim.ix[hh_num, 'pos'] < 1:
-                continue
-
-            if n_dist == 0 and df_sim.ix[hh_num, 'pop'] > 1:
-                hh_pos = df_sim.ix[hh_num, 'pos']
-                hh_tot = df_sim.ix[hh_num, 'pop']
-                num_pos = (hh_pos - 1)*hh_pos
-                num_ppl = (hh_tot - 1)*hh_pos
-
-            else:
-                # node IDs of nodes within distance
-                neighbors = ddf[(ddf['node1'] == nodelist[hh_num]) & (ddf['node2'] != nodelist[hh_num]) &
-                                (ddf['dist'] <= n_dist) & (ddf['dist'] > distances[k-1])]['node2'].values
-
-                ndf = df_sim[df_sim['node'].isin(neighbors)]
-                num_pos = sum(ndf['pos'].values)
-                num_ppl = sum(ndf['pop'].values)
+        if n_dist == 0:
+            # Households with more than one person only count the other people of the household
+            within = positive & (pop > 1)
+            in_bin &= ~within[households]
+            pos_w_pos += np.sum(((pos - 1) * pos)[within])
+            tot_w_pos += np.sum(((pop - 1) * pos)[within])
 
-            pos_w_pos += num_pos
-            tot_w_pos += num_ppl
+        pos_w_pos += np.sum(pos[others[in_bin]])
+        tot_w_pos += np.sum(pop[others[in_bin]])
 
         if tot_w_pos > 0:
             rel_risk.append(pos_w_pos/tot_w_pos)
@@ -6,7 +6,7 @@ import logging
 import pandas as pd
 
 from calibtool import LL_calculators
-from calibtool.analyzers.Helpers import get_spatial_report_data_at_date, get_risk_by_distance
+from calibtool.analyzers.Helpers import get_spatial_report_data_at_date, get_risk_by_distance, DistanceNeighbors
 from calibtool.analyzers.BaseCalibrationAnalyzer import BaseCalibrationAnalyzer
 
 
@@ -29,6 +29,8 @@ class PositiveFractionByDistanceAnalyzer(BaseCalibrationAnalyzer):
         self.reference = site.get_reference_data('risk_by_distance')
         self.ignore_nodes = site.get_ignore_node_list()
         self.distmat = site.get_distance_matrix()
+        # Pairs of households close enough to be in a distance bin, indexed once for all the simulations
+        self.neighbors = DistanceNeighbors.from_distance_matrix(self.distmat, max(self.reference['distances']))
 
     # def set_site(self, site):
     #     '''
@@ -75,7 +77,7 @@ class PositiveFractionByDistanceAnalyzer(BaseCalibrationAnalyzer):
         df['pos'] = df['prev']*df['pop']
         ref_distance = self.reference['distances']
         
-        positive_fraction = get_risk_by_distance(df, ref_distance, self.distmat)
+        positive_fraction = get_risk_by_distance(df, ref_distance, self.neighbors)
         
         channel_data = pd.DataFrame({ self.y : positive_fraction + [df['pos'].sum()/df['pop'].sum()]},
                                       index=ref_distance+[1000])
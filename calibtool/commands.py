@@ -52,8 +52,16 @@ def get_resamplers(args, unknownArgs, force_metadata=False):
     return resamplers
 
 
+def set_plot_mode(manager, args):
+    if args.no_plots:
+        manager.plot_mode = 'off'
+    elif args.defer_plots:
+        manager.plot_mode = 'deferred'
+
+
 def run(args, unknownArgs):
     manager = get_calib_manager(args, unknownArgs)
+    set_plot_mode(manager, args)
     manager.run_calibration()
 
 
@@ -73,9 +81,15 @@ def resume(args, unknownArgs):
             print("Invalid iter_step '%s', ignored." % args.iter_step)
             exit()
     manager = get_calib_manager(args, unknownArgs, force_metadata=True)
+    set_plot_mode(manager, args)
     manager.resume_calibration(args.iteration, iter_step=args.iter_step)
 
 
+def replot(args, unknownArgs):
+    manager = get_calib_manager(args, unknownArgs, force_metadata=True)
+    manager.replot_calibration(args.iteration)
+
+
 def cleanup(args, unknownArgs):
     manager = args.loaded_module.calib_manager
     # If no result present -> just exit
@@ -103,6 +117,9 @@ def main():
     # 'calibtool resume' options
     commands_args.populate_resume_arguments(subparsers, resume)
 
+    # 'calibtool replot' options
+    commands_args.populate_replot_arguments(subparsers, replot)
+
     # 'calibtool cleanup' options
     commands_args.populate_cleanup_arguments(subparsers, cleanup)
 
@@ -5,6 +5,8 @@ def populate_run_arguments(subparsers, func):
     parser_run.add_argument(dest='config_name', default=None, help='Name of configuration python script for custom running of calibration.')
     parser_run.add_argument('--priority', default=None, help='Specify priority of COMPS simulation (only for HPC).')
     parser_run.add_argument('--node_group', default=None, help='Specify node group of COMPS simulation (only for HPC).')
+    parser_run.add_argument('--no-plots', dest='no_plots', action='store_true', help='Do not plot the iterations.')
+    parser_run.add_argument('--defer-plots', dest='defer_plots', action='store_true', help='Plot all the iterations at the end of the calibration.')
     parser_run.set_defaults(func=func)
 
 # 'calibtool resample' options
@@ -26,8 +28,17 @@ def populate_resume_arguments(subparsers, func):
     parser_resume.add_argument('--iter_step', default=None, help="Resume calibration on specified iteration step ['commission', 'analyze', 'plot', 'next_point'].")
     parser_resume.add_argument('--priority', default=None, help='Specify priority of COMPS simulation (only for HPC).')
     parser_resume.add_argument('--node_group', default=None, help='Specify node group of COMPS simulation (only for HPC).')
+    parser_resume.add_argument('--no-plots', dest='no_plots', action='store_true', help='Do not plot the iterations.')
+    parser_resume.add_argument('--defer-plots', dest='defer_plots', action='store_true', help='Plot all the iterations at the end of the calibration.')
     parser_resume.set_defaults(func=func)
 
+# 'calibtool replot' options
+def populate_replot_arguments(subparsers, func):
+    parser_replot = subparsers.add_parser('replot', help='Plot the iterations of a calibration')
+    parser_replot.add_argument(dest='config_name', default=None, help='Name of configuration python script for custom running of calibration.')
+    parser_replot.add_argument('--iteration', default=None, type=int, help='Plot only this iteration (default is all the iterations).')
+    parser_replot.set_defaults(func=func)
+
 # 'calibtool cleanup' options
 def populate_cleanup_arguments(subparsers, func):
     parser_cleanup = subparsers.add_parser('cleanup', help='Cleanup a calibration')
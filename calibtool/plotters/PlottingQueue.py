@@ -0,0 +1,61 @@
+import logging
+import multiprocessing
+
+from simtools.Utilities.LocalOS import LocalOS
+
+logger = logging.getLogger(__name__)
+
+
+def render(plotters, iteration_state):
+    """
+    Run the plotters on the iteration state, a failing plotter does not prevent the others to plot.
+    """
+    for plotter in plotters:
+        try:
+            plotter.visualize(iteration_state)
+        except Exception:
+            logger.exception("Error in the plotter %s for iteration %s"
+                             % (plotter.__class__.__name__, iteration_state.iteration))
+
+
+class PlottingQueue:
+    """
+    Render the plots of the calibration iterations in worker processes.
+    The workers are forked from the calibration: they plot a snapshot of the iteration state
+    while the calibration carries on with the next steps. They inherit the threads, database and COMPS handles of
+    the calibration process in whatever state they are, so the plotters must not use them.
+    """
+
+    def __init__(self, max_processes=1):
+        """
+        :param max_processes: Number of plotting processes running at the same time. Submitting more jobs
+        waits for the oldest ones. Successive iterations write the same plot files so 1 keeps them in order.
+        """
+        self.max_processes = max_processes
+        self.processes = []
+
+    @staticmethod
+    def can_fork():
+        # On mac, matplotlib does not support being forked (same as in the AnalyzeManager)
+        return LocalOS.name != LocalOS.MAC and 'fork' in multiprocessing.get_all_start_methods()
+
+    def submit(self, plotters, iteration_state):
+        if not plotters:
+            return
+
+        if not self.can_fork():
+            render(plotters, iteration_state)
+            return
+
+        self.wait(self.max_processes - 1)
+        process = multiprocessing.get_context('fork').Process(target=render, args=(plotters, iteration_state))
+        process.start()
+        self.processes.append(process)
+
+    def wait(self, max_running=0):
+        """
+        Wait until at most max_running plotting processes are still running.
+        """
+        self.processes = [p for p in self.processes if p.is_alive()]
+        while len(self.processes) > max(max_running, 0):
+            self.processes.pop(0).join()
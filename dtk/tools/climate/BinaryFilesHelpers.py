@@ -1,6 +1,73 @@
 import json
-import struct
-from collections import OrderedDict
+import os
+from functools import lru_cache
+
+import numpy as np
+
+
+def parse_node_offsets(offsets):
+    """
+    Parse the NodeOffsets string of a climate .bin.json file: 16 hexadecimal characters per node,
+    the node id then the offset (in bytes) of its series in the .bin file.
+    :return: (node ids, offsets) arrays
+    """
+    digits = np.frombuffer(offsets.encode('ascii'), dtype=np.uint8).reshape(-1, 2, 8).astype(np.int64)
+    # ASCII hexadecimal characters -> values
+    digits = np.where(digits >= ord('a'), digits - ord('a') + 10,
+                      np.where(digits >= ord('A'), digits - ord('A') + 10, digits - ord('0')))
+    values = digits.dot(16 ** np.arange(7, -1, -1, dtype=np.int64))
+    return values[:, 0], values[:, 1]
+
+
+class ClimateBinary:
+    """
+    Climate binary file (.bin with its .bin.json metadata) read through a memory map.
+    The offset table is parsed once, only the series of the requested nodes are read.
+    """
+    def __init__(self, binary_file):
+        with open(binary_file + '.json', 'r') as meta_file:
+            meta = json.load(meta_file)
+
+        self.binary_file = binary_file
+        self.metadata = meta['Metadata']
+        self.tsteps = self.metadata['DatavalueCount']
+        self.node_ids, self.offsets = parse_node_offsets(meta['NodeOffsets'])
+        self.data = np.memmap(binary_file, dtype=np.float32, mode='r')
+        self._node_order = np.argsort(self.node_ids)
+
+    @classmethod
+    def load(cls, binary_file):
+        """
+        ClimateBinary shared between the calls as long as the file does not change.
+        """
+        return _load_climate_binary(os.path.abspath(binary_file), os.path.getmtime(binary_file))
+
+    def node_index(self, node_ids):
+        """
+        Position of the given nodes in the offset table.
+        """
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        sorted_ids = self.node_ids[self._node_order]
+        positions = np.minimum(np.searchsorted(sorted_ids, node_ids), len(sorted_ids) - 1)
+        found = sorted_ids[positions] == node_ids
+        if not found.all():
+            raise KeyError("Nodes not in the climate file: {}".format(node_ids[~found].tolist()))
+
+        return self._node_order[positions]
+
+    def get(self, node_ids=None):
+        """
+        Read the series of the given nodes.
+        :param node_ids: The node ids (all the nodes of the file if None)
+        :return: Array of shape [nodes, time steps]
+        """
+        offsets = self.offsets if node_ids is None else self.offsets[self.node_index(node_ids)]
+        return np.array(self.data[(offsets // 4)[:, None] + np.arange(self.tsteps)])
+
+
+@lru_cache(maxsize=16)
+def _load_climate_binary(binary_file, mtime):
+    return ClimateBinary(binary_file)
 
 
 def extract_data_from_climate_bin_for_node(node, binary_file):
@@ -8,22 +75,4 @@ def extract_data_from_climate_bin_for_node(node, binary_file):
     This function returns the data for a particular node in the provided binary_file.
     Works for climate binaries
     """
-    meta = json.load(open(binary_file+'.json','rb'))
-    tsteps = meta['Metadata']['DatavalueCount']
-    offsets = meta['NodeOffsets']
-    offsets_nodes = OrderedDict()
-    i=0
-    while i <len(offsets):
-        nodeid = int(offsets[i:i+8],16)
-        offset = int(offsets[i+9:i+16], 16)
-        offsets_nodes[nodeid] = offset
-        i+=16
-
-    series = []
-    with open(binary_file, 'rb') as bin_file:
-        bin_file.seek(offsets_nodes[node.id])
-
-        # Read the data
-        for i in range(tsteps):
-            series.append(struct.unpack('f', bin_file.read(4))[0])
-    return series
\ No newline at end of file
+    return ClimateBinary.load(binary_file).get([node.id])[0].tolist()
@@ -1,11 +1,9 @@
 import json
 import os
-import struct
 import time
 import logging
-from collections import OrderedDict
 
-import itertools
+import numpy as np
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(filename='ClimateFileCreator_Log.log', level=logging.DEBUG)
@@ -75,42 +73,62 @@ class ClimateFileCreator:
     # Format climate data
     @staticmethod
     def prepare_data(data, invalid_handler=None, test_function=None):
-        ret = []
+        """
+        Replace the invalid values of a series.
+        The test function and the invalid handler are applied to whole arrays when they support it (like the valid_*
+        and invalid_*_handler functions), otherwise value by value.
+        :return: The cleaned series as a numpy array
+        """
+        ret = np.array(data, dtype=float)
+
         # Make sure all data is correct
-        for i in range(len(data)):
-            data_day = data[i]
-            if test_function(data_day):
-                # The weather value is correct
-                ret.append(data_day)
-            else:
-                clean_value = invalid_handler(data_day, i, data)
-                logger.warning("Bad value: %s, replaced by %s at index %s" % (data_day, clean_value, i), exc_info=1)
-                ret.append(clean_value)
+        try:
+            valid = np.asarray(test_function(ret))
+        except (TypeError, ValueError):
+            valid = None
+        if valid is None or valid.shape != ret.shape:
+            valid = np.fromiter((test_function(value) for value in data), dtype=bool, count=len(ret))
+
+        invalid = np.flatnonzero(~valid)
+        try:
+            ret[invalid] = invalid_handler(ret[invalid], invalid, ret)
+        except (TypeError, ValueError, IndexError):
+            for i in invalid:
+                ret[i] = invalid_handler(data[i], i, data)
+
+        # One message per series (a message per value would cost more than the cleaning itself)
+        if len(invalid):
+            logger.warning("%d bad value(s) replaced at indices %s%s" % (len(invalid), invalid[:10].tolist(),
+                                                                         '...' if len(invalid) > 10 else ''))
 
         return ret
 
     def generate_climate_files(self, output_path):
-        for data_set in ('air_temperature', 'land_temperature', 'humidity', 'rainfall'):
-            data = OrderedDict()
-            offset = 0
-            offset_string = ""
+        if not self.nodes:
+            return
 
-            for node in self.nodes:
-                key = tuple(getattr(node, data_set))
-
-                if not key in data:
-                    data[key] = offset
-                    offset += len(key)*4
-
-                offset_string = "%s%08x%08x" % (offset_string, node.id, data[key])
-
-            if len(data) > 0:
-                self.write_files(output_path=output_path,
-                                 count=len(list(data)[0]),
-                                 offset_string=offset_string,
-                                 available_nodes_count=len(data),
-                                 data_to_save=list(itertools.chain.from_iterable(list(data))),
-                                 data_name=data_set)
+        node_ids = [node.id for node in self.nodes]
+        for data_set in ('air_temperature', 'land_temperature', 'humidity', 'rainfall'):
+            data = np.array([getattr(node, data_set) for node in self.nodes], dtype=np.float32).reshape(len(node_ids), -1)
+
+            # Identical series are only saved once: dedup the rows on their bytes, keeping the order of first appearance
+            slots = {}
+            first = []
+            offsets = np.empty(len(data), dtype=np.int64)
+            for i, row in enumerate(data):
+                slot = slots.setdefault(row.tobytes(), len(slots))
+                if slot == len(first):
+                    first.append(i)
+                offsets[i] = slot * data.shape[1] * 4
+
+            offset_string = "".join("%08x%08x" % pair for pair in zip(node_ids, offsets.tolist()))
+
+            self.write_files(output_path=output_path,
+                             count=data.shape[1],
+                             offset_string=offset_string,
+                             available_nodes_count=len(first),
+                             data_to_save=data[first],
+                             data_name=data_set)
 
     def write_files(self, output_path, count, offset_string, available_nodes_count, data_to_save, data_name):
         dump = lambda content: json.dumps(content, sort_keys=True, indent=4).strip('"')
@@ -136,9 +154,7 @@ class ClimateFileCreator:
         json_file_name = file_name + ".bin.json"
 
         with open(os.path.join(output_path, '%s' % bin_file_name), 'wb') as handle:
-            a = struct.pack('f' * len(data_to_save), *data_to_save)
-            # Write it to the file
-            handle.write(a)
+            np.asarray(data_to_save, dtype=np.float32).tofile(handle)
 
         with open(os.path.join(output_path, '%s' % json_file_name), 'w') as f:
             f.write(dump(metadata))
@@ -149,7 +165,7 @@ class ClimateFileCreator:
 
     @staticmethod
     def valid_rainfall(current_value):
-        return 0 <= current_value < 2493
+        return (current_value >= 0) & (current_value < 2493)
 
     @staticmethod
     def invalid_air_temperature_handler(current_value, index, data):
@@ -157,7 +173,7 @@ class ClimateFileCreator:
 
     @staticmethod
     def valid_air_temperature(current_value):
-        return -89.2 <= current_value < 56.7
+        return (current_value >= -89.2) & (current_value < 56.7)
 
     @staticmethod
     def invalid_land_temperature_handler(current_value, index, data):
@@ -165,7 +181,7 @@ class ClimateFileCreator:
 
     @staticmethod
     def valid_land_temperature(current_value):
-        return -89.2 <= current_value < 56.77
+        return (current_value >= -89.2) & (current_value < 56.77)
 
     @staticmethod
     def invalid_humidity_handler(current_value, index, data):
@@ -173,4 +189,4 @@ class ClimateFileCreator:
 
     @staticmethod
     def valid_humidity(current_value):
-        return 0 <= current_value <= 100
\ No newline at end of file
+        return (current_value >= 0) & (current_value <= 100)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from dtk.tools.climate.BinaryFilesHelpers import extract_data_from_climate_bin_for_node
+from dtk.tools.climate.BinaryFilesHelpers import ClimateBinary
 from dtk.tools.demographics.Node import Node
 
 
@@ -11,15 +11,21 @@ class WeatherNode(Node):
         self.humidity = []
 
     def data_from_files(self, air_temperature=None, land_temperature=None, humidity=None, rainfall=None):
-        if air_temperature:
-            self.air_temperature = extract_data_from_climate_bin_for_node(self, air_temperature)
+        self.nodes_data_from_files([self], air_temperature=air_temperature, land_temperature=land_temperature,
+                                   humidity=humidity, rainfall=rainfall)
 
-        if land_temperature:
-            self.air_temperature = extract_data_from_climate_bin_for_node(self, land_temperature)
+    @staticmethod
+    def nodes_data_from_files(nodes, air_temperature=None, land_temperature=None, humidity=None, rainfall=None):
+        """
+        Load the climate series of several nodes, one read per file.
+        """
+        files = {'air_temperature': air_temperature, 'land_temperature': land_temperature,
+                 'humidity': humidity, 'rainfall': rainfall}
 
-        if humidity:
-            self.humidity = extract_data_from_climate_bin_for_node(self, humidity)
-
-        if rainfall:
-            self.rainfall = extract_data_from_climate_bin_for_node(self, rainfall)
+        for data_set, binary_file in files.items():
+            if not binary_file:
+                continue
 
+            series = ClimateBinary.load(binary_file).get([node.id for node in nodes])
+            for node, node_series in zip(nodes, series):
+                setattr(node, data_set, node_series.tolist())
@@ -1,6 +1,11 @@
 import networkx as nx
-from math import radians, cos, sin, asin, sqrt
-import itertools
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+# 6367 km is the radius of the Earth
+EARTH_RADIUS = 6367
 
 class GeoGraphGenerator(object):
 	
@@ -83,49 +88,88 @@ class GeoGraphGenerator(object):
 			G.position[node_id]=(properties[0], properties[1]) # (x,y) for matplotlib
 	
 		# add an edge between any two nodes distanced less than max_kms away
-		
-		for n in itertools.combinations(G.nodes(),2):
-			distance = self.get_haversine_distance(G.position[n[0]][0],G.position[n[0]][1],G.position[n[1]][0],G.position[n[1]][1])
-			if not self.migration_radius or distance < self.migration_radius:
-				G.add_edge(n[0], n[1], weight = distance)
-		
-	
+		node_ids = list(G.nodes())
+		positions = np.array([G.position[node_id] for node_id in node_ids], dtype=float).reshape(-1, 2)
+		first, second = self.get_node_pairs(positions)
+		distances = self.get_haversine_distance(positions[first, 0], positions[first, 1], positions[second, 0], positions[second, 1])
+		if self.migration_radius:
+			close = distances < self.migration_radius
+			first, second, distances = first[close], second[close], distances[close]
+		G.add_weighted_edges_from(zip([node_ids[i] for i in first], [node_ids[i] for i in second], distances.tolist()))
+
 		# add edge based on adjacency matrix
-		for node_id, node_links in self.adjacency_list.items():
-			for node_link_id, w in node_links.items():
-				distance = self.get_haversine_distance(G.position[int(node_id)][0], G.position[int(node_id)][1], G.position[int(node_link_id)][0], G.position[int(node_link_id)][1])
-				G.add_edge(int(node_id), int(node_link_id), weight = distance*w)
-				
+		links = [(int(node_id), int(node_link_id), w) for node_id, node_links in self.adjacency_list.items() for node_link_id, w in node_links.items()]
+		if links:
+			sources, destinations, weights = zip(*links)
+			source_positions = np.array([G.position[node_id] for node_id in sources], dtype=float)
+			destination_positions = np.array([G.position[node_id] for node_id in destinations], dtype=float)
+			distances = self.get_haversine_distance(source_positions[:, 0], source_positions[:, 1], destination_positions[:, 0], destination_positions[:, 1])
+			G.add_weighted_edges_from(zip(sources, destinations, (distances * np.array(weights, dtype=float)).tolist()))
+
 		self.graph = G
-		
+
 		return G
-	
-	
+
+
 	'''
-	get shortest paths based on link weights
+	index pairs (i < j) of the nodes to test for an edge: all the pairs if there is no migration radius, otherwise only the
+	pairs found within the radius by a KD-tree query on the nodes positions projected on the unit sphere
 	'''
-	def get_shortest_paths(self):
-		
-		return nx.shortest_path_length(self.graph, weight='weight') 
-	
-		
+	def get_node_pairs(self, positions):
+
+		if not self.migration_radius:
+			return np.triu_indices(len(positions), k=1)
+
+		lon, lat = np.radians(positions[:, 0]), np.radians(positions[:, 1])
+		points = np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+		# chord length corresponding to the migration radius on the great circle (+ margin, the exact distance is tested after)
+		chord = 2 * np.sin(min(self.migration_radius / EARTH_RADIUS, np.pi) / 2) * (1 + 1e-9)
+		pairs = cKDTree(points).query_pairs(chord, output_type='ndarray')
+
+		return pairs[:, 0], pairs[:, 1]
+
+
+	'''
+	get shortest paths based on link weights;
+	paths longer than cutoff are not explored (e.g. GravityModelRatesGenerator.dist_cutoff), which keeps the search local;
+	yields (source, {destination: path length}) like nx.shortest_path_length
+	'''
+	def get_shortest_paths(self, cutoff=None, batch_size=256):
+
+		node_ids = list(self.graph.nodes())
+		index = {node_id: i for i, node_id in enumerate(node_ids)}
+		edges = list(self.graph.edges(data='weight'))
+		rows = [index[u] for u, v, w in edges]
+		columns = [index[v] for u, v, w in edges]
+		# explicit zeros are kept as edges by dijkstra
+		matrix = coo_matrix(([w for u, v, w in edges], (rows, columns)), shape=(len(node_ids), len(node_ids))).tocsr()
+
+		limit = np.inf if cutoff is None else cutoff
+		for start in range(0, len(node_ids), batch_size):
+			sources = np.arange(start, min(start + batch_size, len(node_ids)))
+			lengths = dijkstra(matrix, directed=False, indices=sources, limit=limit)
+			for source, source_lengths in zip(sources, lengths):
+				reached = np.flatnonzero(np.isfinite(source_lengths))
+				yield node_ids[source], dict(zip([node_ids[i] for i in reached], source_lengths[reached].tolist()))
+
+
 	'''
 	    Calculate the great circle distance between two points 
 	    on the earth (specified in decimal degrees)
 	'''
 	def get_haversine_distance(self, lon1, lat1, lon2, lat2):
-
+		# works on scalars and numpy arrays
 
 		# convert decimal degrees to radians 
-		lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+		lon1, lat1, lon2, lat2 = map(np.radians, [lon1, lat1, lon2, lat2])
 		
 		# haversine formula 
 		dlon = lon2 - lon1 
 		dlat = lat2 - lat1 
-		a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-		c = 2 * asin(sqrt(a))
+		a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+		c = 2 * np.arcsin(np.sqrt(a))
 		
-		# 6367 km is the radius of the Earth
-		km = 6367 * c
+		km = EARTH_RADIUS * c
 		
-		return km
\ No newline at end of file
+		return km
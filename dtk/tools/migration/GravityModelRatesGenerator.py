@@ -1,6 +1,7 @@
-import heapq
 import warnings
+
 import networkx as nx
+import numpy as np
 
 
 class GravityModelRatesGenerator(object):
@@ -9,6 +10,8 @@ class GravityModelRatesGenerator(object):
     see MigrationGenerator for path lengths/weights and graph topology generation 
     '''
 
+    dist_cutoff = 20  # beyond 20km effective distance not reached in 1 day.
+
     def __init__(self, path_lengths, graph, coeff=1):
         self.path_lengths = path_lengths
 
@@ -24,50 +27,66 @@ class GravityModelRatesGenerator(object):
         
         
     '''
-    gravity model based link rates
+    gravity model based link rates;
+    the links of all the sources are processed as arrays: the kept links are sorted by source then decreasing rate
+    and the max_migration_dests first of each source are selected
     '''
 
     def generate_migration_links_rates(self):
 
-        paths = {}
-
-        migs = []
-
-        max_migs = []
-
-        mindist = 1  # 1km minimum distance in gravity model for improved short-distance asymptotic behavior
-        dist_cutoff = 20  # beyond 20km effective distance not reached in 1 day.
         max_migration_dests = 100  # limit of DTK local migration
 
+        sources = []
+        source_indices = []
+        destinations = []
+        distances = []
         for src, v in self.path_lengths:
-            paths[src] = {}
-
-            for dest, dist in v.items():
-                # print (dist)
-                # print (src)
-                # print (dest)
-                if not dist or src == dest:
-                    continue
-                if dist < dist_cutoff:
-                    mig_rate = self.coeff * self.graph.population[int(dest)]
-                    mig_volume = self.graph.population[int(src)] * mig_rate
-                    paths[src][dest] = mig_rate
-                    migs.append(mig_rate)
-                else:
-                    warnings.warn('Check if dist_cutoff is too low for source node ' + str(src) + " distance is " + str(dist))
-
-            d = paths[src]
-
-            if not d:
+            source_indices.append(np.full(len(v), len(sources)))
+            sources.append(src)
+            destinations.append(np.array([int(dest) for dest in v.keys()], dtype=np.int64))
+            distances.append(np.array(list(v.values()), dtype=float))
+
+        if not sources:
+            self.link_rates = {}
+            return self.link_rates
+
+        source_indices = np.concatenate(source_indices).astype(np.int64)
+        destinations = np.concatenate(destinations)
+        distances = np.concatenate(distances)
+        source_ids = np.array([int(src) for src in sources], dtype=np.int64)
+
+        links = (distances != 0) & ~np.isnan(distances) & (source_ids[source_indices] != destinations)
+        close = links & (distances < self.dist_cutoff)
+        if (links & ~close).any():
+            warnings.warn('Check if dist_cutoff is too low: %d paths are longer than %s' % ((links & ~close).sum(), self.dist_cutoff))
+
+        source_indices = source_indices[close]
+        destinations = destinations[close]
+
+        # mig_rate = coeff * destination population
+        unique_destinations, inverse = np.unique(destinations, return_inverse=True)
+        population = np.array([self.graph.population[dest] for dest in unique_destinations.tolist()], dtype=float)
+        rates = self.coeff * population[inverse.ravel()]
+
+        # per source top max_migration_dests (stable sort: ties are kept in the paths order, as heapq.nlargest does)
+        order = np.lexsort((-rates, source_indices))
+        counts = np.bincount(source_indices, minlength=len(sources))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        ranks = np.arange(len(order)) - starts[source_indices[order]]
+        order = order[ranks < max_migration_dests]
+        kept_counts = np.minimum(counts, max_migration_dests)
+
+        paths = {}
+        kept_destinations = destinations[order].tolist()
+        kept_rates = rates[order].tolist()
+        end = 0
+        for src, count in zip(sources, kept_counts.tolist()):
+            start, end = end, end + count
+            paths[src] = dict(zip(kept_destinations[start:end], kept_rates[start:end]))
+
+            if not count:
                 warnings.warn('No paths from source ' + str(src) + ' found! Check if node is isolated.')
                 print("Node " + str(src) + " is isolate " + str(nx.is_isolate(self.graph, src)))
-                continue
-
-            nl = heapq.nlargest(max_migration_dests, d, key=lambda k: d[k])
-            # print(len(d), nl, [int(d[k]) for k in nl])
-            max_migs.append(d[nl[0]])
-
-            paths[src] = dict([(k, d[k]) for k in nl])
 
         self.link_rates = paths
 
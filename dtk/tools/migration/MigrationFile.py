@@ -1,5 +1,6 @@
 import json
-from struct import pack
+
+import numpy as np
 
 from dtk.tools.climate.BaseInputFile import BaseInputFile
 
@@ -24,50 +25,76 @@ class MigrationFile(BaseInputFile):
     def generate_file(self, name):
         # Before generating, transform the matrix
         matrix_id = self.nodes_to_id()
-
-        offset = 0
-        offset_str = ""
+        node_ids = np.array(list(matrix_id.keys()), dtype=np.uint32)
 
         # Make sure we have the same destinations size everywhere
         # First find the max size
         max_size = max([len(dest) for dest in matrix_id.values()])
 
-        # Add a fake node destinations in nodes to make sure the destinations are all same size
-        for source, dests in self.matrix.items():
-            self.get_filler_nodes(source, dests, max_size, matrix_id.keys())
-
-        with open(name, 'wb') as migration_file:
-            for nodeid, destinations in matrix_id.items():
-                destinations_id = pack('I' * len(destinations.keys()), *destinations.keys())
-                destinations_rate = pack('d' * len(destinations.values()), *destinations.values())
+        # [nodes, max_size] destinations and rates, the missing destinations are left at 0
+        counts = np.array([len(dests) for dests in matrix_id.values()], dtype=np.int64)
+        rows = np.repeat(np.arange(len(node_ids)), counts)
+        columns = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        destinations = np.zeros((len(node_ids), max_size), dtype=np.uint32)
+        rates = np.zeros((len(node_ids), max_size), dtype=np.float64)
+        destinations[rows, columns] = [dest for dests in matrix_id.values() for dest in dests.keys()]
+        rates[rows, columns] = [rate for dests in matrix_id.values() for rate in dests.values()]
 
-                # Write
-                migration_file.write(destinations_id)
-                migration_file.write(destinations_rate)
+        # Add fake node destinations in nodes to make sure the destinations are all same size
+        self.get_filler_nodes(node_ids, destinations, counts, node_ids)
 
-                # Write offset
-                offset_str = "%s%s%s" % (offset_str, "{0:08x}".format(nodeid), "{0:08x}".format(offset))
+        # Each node record: the destination ids followed by the rates
+        record = np.dtype([('destinations', np.uint32, (max_size,)), ('rates', np.float64, (max_size,))])
+        records = np.empty(len(node_ids), dtype=record)
+        records['destinations'] = destinations
+        records['rates'] = rates
+        with open(name, 'wb') as migration_file:
+            records.tofile(migration_file)
 
-                # Increment offset
-                offset += 12 * len(destinations)
+        offsets = np.arange(len(node_ids)) * record.itemsize
+        offset_str = "".join("%08x%08x" % pair for pair in zip(node_ids.tolist(), offsets.tolist()))
 
         # Write the headers
-        meta = self.generate_headers({"NodeCount": len(matrix_id), "DatavalueCount": len(matrix_id.values()) })
+        meta = self.generate_headers({"NodeCount": len(matrix_id), "DatavalueCount": max_size})
         headers = {
             "Metadata": meta,
             "NodeOffsets": offset_str
         }
         json.dump(headers, open("%s.json" % name, 'w'), indent=3)
 
-    def get_filler_nodes(self, source, dests, n, available_nodes):
+    @staticmethod
+    def get_filler_nodes(sources, destinations, counts, available_nodes, batch_size=4096):
         """
-        Fills the destinations with n filler nodes.
-        Makes sure the nodes ids chosen are not the source, not the destinations and come from the available_nodes
+        Fills the rows of the destinations array after their counts first columns with filler nodes (rate 0).
+        Makes sure the nodes ids chosen are not the source, not the destinations and come from the available_nodes.
+        :param sources: Array of the source ids (one per row)
+        :param destinations: [sources, n] array of destination ids, filled in place
+        :param counts: Number of actual destinations of each row
+        :param available_nodes: Array of the candidate node ids
         """
-        while len(dests) < n:
-            for node in available_nodes:
-                if node not in dests and node != source:
-                    dests[node] = 0
+        n = destinations.shape[1]
+        # In the worst case, the source and the n - 1 destinations are among the first candidates
+        candidates = np.asarray(available_nodes, dtype=np.int64)[:2 * n]
+
+        for start in range(0, len(sources), batch_size):
+            stop = min(start + batch_size, len(sources))
+            rows = np.arange(start, stop)
+            missing = n - counts[rows]
+            if not missing.any():
+                continue
+
+            # Candidate c of row r is valid if it is not the source or one of the destinations of the row
+            keys = (rows[:, None] << 32) + candidates[None, :]
+            taken = (rows[:, None] << 32) + destinations[rows].astype(np.int64)
+            taken = taken[np.arange(n)[None, :] < counts[rows][:, None]]
+            valid = ~np.isin(keys, taken) & (candidates[None, :] != np.asarray(sources[rows], dtype=np.int64)[:, None])
+
+            # Keep the first missing valid candidates of each row, placed after the actual destinations
+            rank = np.cumsum(valid, axis=1) - 1
+            chosen = valid & (rank < missing[:, None])
+            chosen_rows, chosen_columns = np.nonzero(chosen)
+            destinations[rows[chosen_rows], counts[rows][chosen_rows] + rank[chosen_rows, chosen_columns]] = \
+                candidates[chosen_columns]
 
     def nodes_to_id(self):
         """
@@ -223,7 +223,8 @@ class MigrationGenerator(object):
             print ("Preparing link rates generation config...")
 
             self.lrm = GravityModelRatesGenerator(
-                self.gt.get_shortest_paths(),
+                # paths longer than the gravity model cutoff are not used: do not compute them
+                self.gt.get_shortest_paths(cutoff=GravityModelRatesGenerator.dist_cutoff),
                 # assume all graph topologies implement the get_shortest_paths() method; enforce via interface? in Python??
                 self.graph_topo,
                 coeff=1e-4
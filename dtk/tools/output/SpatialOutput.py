@@ -1,3 +1,4 @@
+import os
 import struct
 
 import numpy as np
@@ -12,38 +13,109 @@ class SpatialOutput:
         self.data     = None
         self.start    = 0
         self.interval = 1
+        self._node_order = None
 
-    @classmethod
-    def from_bytes(cls, bytes, filtered=False):
+    @staticmethod
+    def header_size(filtered):
         # The header size changes if the file is a filtered one
-        headersize = 16 if filtered else 8
-
-        # Create the class
-        so = cls()
+        return 16 if filtered else 8
 
+    def read_header(self, header, filtered):
         # Retrive the number of nodes and number of timesteps
-        so.n_nodes, = struct.unpack('i', bytes[0:4])
-        so.n_tstep, = struct.unpack('i', bytes[4:8])
+        self.n_nodes, self.n_tstep = struct.unpack_from('ii', header, 0)
 
         # If filtered, retrieve the start and interval
         if filtered:
-            start, = struct.unpack('f', bytes[8:12])
-            interval, = struct.unpack('f', bytes[12:16])
-            so.start = int(start)
-            so.interval = int(interval)
+            start, interval = struct.unpack_from('ff', header, 8)
+            self.start = int(start)
+            self.interval = int(interval)
+
+    @classmethod
+    def from_bytes(cls, bytes, filtered=False):
+        """
+        Read a SpatialReport from its content.
+        :param bytes: bytes or any buffer (memoryview, mmap...). The arrays are writable copies (the data as float64)
+        and do not keep the buffer alive. See from_file to only read the parts of a report actually used.
+        :param filtered: Is it a filtered report (including start and interval in the header)
+        """
+        headersize = cls.header_size(filtered)
+
+        # Create the class
+        so = cls()
+        so.read_header(bytes, filtered)
 
         # Get the nodeids
-        so.nodeids = struct.unpack(str(so.n_nodes) + 'I', bytes[headersize:headersize + so.n_nodes * 4])
-        so.nodeids = np.asarray(so.nodeids)
+        so.nodeids = np.frombuffer(bytes, dtype=np.uint32, count=so.n_nodes, offset=headersize).astype(int)
 
         # Retrieve the data
-        so.data = struct.unpack(str(so.n_nodes * so.n_tstep) + 'f',
-                                     bytes[headersize + so.n_nodes * 4:headersize + so.n_nodes * 4 + so.n_nodes * so.n_tstep * 4])
-        so.data = np.asarray(so.data)
+        so.data = np.frombuffer(bytes, dtype=np.float32, count=so.n_nodes * so.n_tstep,
+                                offset=headersize + so.n_nodes * 4).astype(np.float64)
         so.data = so.data.reshape(so.n_tstep, so.n_nodes)
 
         return so
 
+    @classmethod
+    def from_file(cls, path, filtered=None):
+        """
+        Memory-map a SpatialReport file. Only the parts of the data actually accessed (see get_data) are read from
+        the disk.
+        :param path: Path of the .bin file
+        :param filtered: Is it a filtered report? If None, guessed from the file name
+        """
+        if filtered is None:
+            filtered = 'Filtered' in os.path.basename(path)
+        headersize = cls.header_size(filtered)
+
+        so = cls()
+        with open(path, 'rb') as spatial_file:
+            so.read_header(spatial_file.read(headersize), filtered)
+
+        so.nodeids = np.fromfile(path, dtype=np.uint32, count=so.n_nodes, offset=headersize).astype(int)
+        so.data = np.memmap(path, dtype=np.float32, mode='r', offset=headersize + so.n_nodes * 4,
+                            shape=(so.n_tstep, so.n_nodes))
+        return so
+
+    @classmethod
+    def from_dict(cls, sp_data):
+        """
+        Inverse of to_dict()
+        """
+        so = cls()
+        for key in ('n_nodes', 'n_tstep', 'start', 'interval', 'data'):
+            setattr(so, key, sp_data[key])
+        so.nodeids = np.asarray(sp_data['nodeids'])
+        return so
+
+    def node_index(self, node_ids):
+        """
+        Position of the given nodes in the data columns.
+        :param node_ids: Iterable of node ids
+        :return: Array of column indices
+        """
+        if self._node_order is None:
+            self._node_order = np.argsort(self.nodeids)
+
+        node_ids = np.asarray(node_ids, dtype=int)
+        sorted_ids = self.nodeids[self._node_order]
+        positions = np.minimum(np.searchsorted(sorted_ids, node_ids), len(sorted_ids) - 1)
+        found = sorted_ids[positions] == node_ids
+        if not found.all():
+            raise KeyError("Nodes not in the report: {}".format(node_ids[~found].tolist()))
+
+        return self._node_order[positions]
+
+    def get_data(self, node_ids=None, tsteps=None):
+        """
+        Extract a subset of the data without loading the rest of the report.
+        :param node_ids: The node ids to select (all if None)
+        :param tsteps: Time step index (int), time window (slice) or list of time step indices (all if None)
+        :return: Array of shape [time steps, nodes] (or [nodes] if tsteps is an int)
+        """
+        data = self.data if tsteps is None else self.data[tsteps]
+        if node_ids is not None:
+            data = data[..., self.node_index(node_ids)]
+        return np.array(data)
+
     def to_dict(self):
         return {'n_nodes' : self.n_nodes,
                 'n_tstep' : self.n_tstep,
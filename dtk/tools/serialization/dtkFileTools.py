@@ -5,10 +5,16 @@ Support for three formats of serialized population files:
 1. "Original version": single payload chunk with simulation and all nodes, uncompressed or snappy or LZ4
 2. "First chunked version": multiple payload chunks, one for simulation and one each for nodes
 3. "Second chunked version": multiple payload chunks, simulation and node objects are "root" objects in each chunk
+
+By default read() memory-maps the file: a chunk is only read (and decompressed) when accessed, the last decoded
+objects are kept in a bounded LRU cache and write() copies the untouched chunks as they are.
 """
 
 from . import dtkFileSupport as support
+from collections import OrderedDict, deque
+from multiprocessing import Pool
 import json
+import mmap
 import os
 import snappy
 import time
@@ -21,6 +27,8 @@ SNAPPY = 'SNAPPY'
 
 __engines__ = {LZ4: support.EllZeeFour, SNAPPY: snappy, NONE: support.Uncompressed}
 
+CACHE_SIZE = 8      # Number of decoded objects (nodes) kept in memory
+
 
 def uncompress(data, engine):
     if engine in __engines__:
@@ -36,6 +44,53 @@ def compress(data, engine):
         raise RuntimeError("Unknown compression scheme '{0}'".format(engine))
 
 
+class MappedChunks(object):
+    """
+    List of the chunks of a memory-mapped file.
+    A chunk is only read from the map when accessed. Replaced and appended chunks are kept in memory.
+    Iterating yields memoryviews on the map for the untouched chunks (used by write() to copy them without reading).
+    """
+    def __init__(self, mapped, offset, sizes, filename=''):
+        self.map = mapped
+        self.filename = filename
+        self._entries = []      # (offset, size) of the chunk in the map or its content if replaced/appended
+        for index, size in enumerate(sizes):
+            if offset + size > len(mapped):
+                raise UserWarning("Only read {0} bytes of {1} for chunk {2} of file '{3}'".format(
+                    max(len(mapped) - offset, 0), size, index, filename))
+            self._entries.append((offset, size))
+            offset += size
+        return
+
+    def __getitem__(self, index):
+        entry = self._entries[index]
+        if isinstance(entry, tuple):
+            return self.map[entry[0]:entry[0] + entry[1]]
+        return entry
+
+    def __setitem__(self, index, value):
+        self._entries[index] = value
+        return
+
+    def __iter__(self):
+        for entry in self._entries:
+            yield memoryview(self.map)[entry[0]:entry[0] + entry[1]] if isinstance(entry, tuple) else entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def append(self, chunk):
+        self._entries.append(chunk)
+        return
+
+    def size(self, index):
+        entry = self._entries[index]
+        return entry[1] if isinstance(entry, tuple) else len(entry)
+
+    def is_mapped(self, index):
+        return isinstance(self._entries[index], tuple)
+
+
 class DtkHeader(support.SerialObject):
     # noinspection PyDefaultArgument
     def __init__(self, dictionary={
@@ -80,6 +135,7 @@ class DtkFile(object):
         def __setitem__(self, index, value):
             data = compress(value, self.__parent__.compression)
             self.__parent__.chunks[index] = data
+            self.__parent__.objects.discard(index)
             return
 
         def append(self, item):
@@ -91,8 +147,15 @@ class DtkFile(object):
             return length
 
     class Objects(object):
-        def __init__(self, parent):
+        """
+        Decoded chunks. The last cache_size objects accessed are kept decoded (LRU).
+        An assigned object is only encoded when evicted from the cache or when the file is written (see flush).
+        """
+        def __init__(self, parent, cache_size=CACHE_SIZE):
             self.__parent__ = parent
+            self.cache_size = cache_size
+            self._cache = OrderedDict()
+            self._dirty = set()
             return
 
         def __iter__(self):
@@ -102,32 +165,76 @@ class DtkFile(object):
                 index += 1
 
         def __getitem__(self, index):
+            index = self._position(index)
+            if index in self._cache:
+                self._cache.move_to_end(index)
+                return self._cache[index]
+
             try:
                 contents = self.__parent__.contents[index]
                 item = json.loads(contents, object_hook=support.SerialObject)
             except:
                 raise UserWarning("Could not parse JSON in chunk {0}".format(index))
+            self._store(index, item)
             return item
 
         def __setitem__(self, index, value):
-            contents = json.dumps(value, separators=(',', ':'))
-            self.__parent__.contents[index] = contents
+            index = self._position(index)
+            self._store(index, value)
+            self._dirty.add(index)
             return
 
         def append(self, item):
-            contents = json.dumps(item, separators=(',', ':'))
-            self.__parent__.contents.append(contents)
+            self.__parent__.contents.append(self._encode(item))
             return
 
+        def flush(self):
+            """
+            Encode the objects assigned since the last flush.
+            """
+            for index in sorted(self._dirty):
+                self._write(index, self._cache[index])
+            self._dirty.clear()
+            return
+
+        def discard(self, index):
+            index = self._position(index)
+            self._cache.pop(index, None)
+            self._dirty.discard(index)
+            return
+
+        def _position(self, index):
+            if not -len(self) <= index < len(self):
+                raise IndexError("Chunk index {0} out of range".format(index))
+            return index % len(self)
+
+        def _store(self, index, item):
+            self._cache[index] = item
+            self._cache.move_to_end(index)
+            while len(self._cache) > max(self.cache_size, 1):
+                evicted, evicted_item = self._cache.popitem(last=False)
+                if evicted in self._dirty:
+                    self._write(evicted, evicted_item)
+                    self._dirty.discard(evicted)
+            return
+
+        def _write(self, index, item):
+            self.__parent__.chunks[index] = compress(self._encode(item), self.__parent__.compression)
+            return
+
+        @staticmethod
+        def _encode(item):
+            return json.dumps(item, separators=(',', ':')).encode('utf-8')
+
         def __len__(self):
             length = len(self.__parent__.chunks)
             return length
 
-    def __init__(self, header):
+    def __init__(self, header, chunks=None, cache_size=CACHE_SIZE):
         self.__header__ = header
-        self._chunks = [None for index in range(header.chunkcount)]
+        self._chunks = chunks if chunks is not None else [None for index in range(header.chunkcount)]
         self.contents = self.Contents(self)
-        self.objects = self.Objects(self)
+        self.objects = self.Objects(self, cache_size)
         return
 
     @property
@@ -166,9 +273,15 @@ class DtkFile(object):
 
     @property
     def chunk_sizes(self):
+        if isinstance(self.chunks, MappedChunks):
+            return [self.chunks.size(index) for index in range(len(self.chunks))]
         sizes = [len(chunk) for chunk in self.chunks]
         return sizes
 
+    @property
+    def mapped(self):
+        return isinstance(self.chunks, MappedChunks)
+
     # Optional header entries
     @property
     def author(self):
@@ -208,16 +321,64 @@ class DtkFile(object):
     def nodes(self):
         return self._nodes
 
+    def map_nodes(self, fn, workers=None):
+        """
+        Apply a function to every node, the nodes being decoded, processed and encoded again in a pool of processes.
+        The function receives the node and returns it once modified, or None to leave the node untouched.
+        It needs to be picklable (module level function or functools.partial of one).
+        :param fn: Function node -> node or None
+        :param workers: Number of processes (all the cores if None, no pool if 1)
+        :return: Number of nodes modified
+        """
+        if not hasattr(self, '_unwrap_node'):
+            raise UserWarning("map_nodes needs a chunked file (version >= 2), this file is version {0}".format(self.version))
+        if workers is not None and workers < 1:
+            raise UserWarning("map_nodes needs at least one worker, got {0}".format(workers))
+
+        # The chunks need to be up to date before being sent to the workers
+        self.objects.flush()
+        tasks = ((fn, type(self), self.compression, self.chunks[index + 1]) for index in range(len(self.nodes)))
+
+        pool = Pool(workers) if workers != 1 else None
+        try:
+            if pool:
+                # Only a few chunks are read from the map ahead of the workers (pool.imap would queue them all at once)
+                results = _imap_bounded(pool, _map_node_chunk, tasks, 2 * (workers or os.cpu_count() or 1))
+            else:
+                results = map(_map_node_chunk, tasks)
+            modified = 0
+            for index, chunk in enumerate(results):
+                if chunk is not None:
+                    self.chunks[index + 1] = chunk
+                    self.objects.discard(index + 1)
+                    modified += 1
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        return modified
+
+    def close(self):
+        """
+        Release the memory map of a file read lazily. The chunks not modified are not accessible anymore.
+        """
+        if self.mapped:
+            self.chunks.map.close()
+        return
+
     def _sync_header(self):
 
+        self.objects.flush()
         self.__header__.date = time.strftime('%a %b %d %H:%M:%S %Y')
         self.__header__.chunkcount = len(self.chunks)
-        self.__header__.chunksizes = [len(chunk) for chunk in self.chunks]
+        self.__header__.chunksizes = self.chunk_sizes
         self.__header__.bytecount = sum(self.__header__.chunksizes)
 
         return
 
     def __set_compression__(self, engine):
+        self.objects.flush()
         if engine != self.compression:
             for index in range(self.chunk_count):
                 chunk = compress(self.contents[index], engine)
@@ -229,11 +390,12 @@ class DtkFile(object):
 
 class DtkFileV1(DtkFile):
 
-    def __init__(self, header=DtkHeader(), filename='', handle=None):
+    def __init__(self, header=DtkHeader(), filename='', handle=None, chunks=None, cache_size=CACHE_SIZE):
         header.version = 1
-        super(DtkFileV1, self).__init__(header)
-        if handle is not None:
+        super(DtkFileV1, self).__init__(header, chunks, cache_size)
+        if handle is not None and chunks is None:
             self.chunks[0] = handle.read(header.chunksizes[0])
+        if handle is not None or chunks is not None:
             self._nodes = [entry.node for entry in self.simulation.nodes]
         return
 
@@ -274,10 +436,10 @@ class DtkFileV2(DtkFile):
             length = self.__parent__.chunk_count - 1
             return length
 
-    def __init__(self, header=DtkHeader(), filename='', handle=None):
+    def __init__(self, header=DtkHeader(), filename='', handle=None, chunks=None, cache_size=CACHE_SIZE):
         header.version = 2
-        super(DtkFileV2, self).__init__(header)
-        for index, size in enumerate(header.chunksizes):
+        super(DtkFileV2, self).__init__(header, chunks, cache_size)
+        for index, size in enumerate(header.chunksizes if chunks is None else []):
             self.chunks[index] = handle.read(size)
             if len(self.chunks[index]) != size:
                 raise UserWarning(
@@ -287,6 +449,14 @@ class DtkFileV2(DtkFile):
         self._nodes = self.NodesV2(self)
         return
 
+    @staticmethod
+    def _unwrap_node(item):
+        return item.node
+
+    @staticmethod
+    def _wrap_node(node):
+        return {'suid': {'id': node.suid.id}, 'node': node}
+
     @property
     def simulation(self):
         return self.objects[0]['simulation']
@@ -322,16 +492,24 @@ class DtkFileV3(DtkFile):
             length = self.__parent__.chunk_count - 1
             return length
 
-    def __init__(self, header=DtkHeader(), filename='', handle=None):
+    def __init__(self, header=DtkHeader(), filename='', handle=None, chunks=None, cache_size=CACHE_SIZE):
         header.version = 3
-        super(DtkFileV3, self).__init__(header)
-        for index, size in enumerate(header.chunksizes):
+        super(DtkFileV3, self).__init__(header, chunks, cache_size)
+        for index, size in enumerate(header.chunksizes if chunks is None else []):
             self.chunks[index] = handle.read(size)
             if len(self.chunks[index]) != size:
                 raise UserWarning("Only read {0} bytes of {1} for chunk {2} of file '{3}'".format(len(self.chunks[index]), size, index, filename))
         self._nodes = self.NodesV3(self)
         return
 
+    @staticmethod
+    def _unwrap_node(item):
+        return item
+
+    @staticmethod
+    def _wrap_node(node):
+        return node
+
     @property
     def simulation(self):
         return self.objects[0]
@@ -344,34 +522,68 @@ class DtkFileV3(DtkFile):
 
 class DtkFileV4(DtkFileV3):
 
-    def __init__(self, header=DtkHeader(), filename='', handle=None):
-        super(DtkFileV4, self).__init__(header, filename, handle)
+    def __init__(self, header=DtkHeader(), filename='', handle=None, chunks=None, cache_size=CACHE_SIZE):
+        super(DtkFileV4, self).__init__(header, filename, handle, chunks, cache_size)
         header.version = 4
         return
 
 
-def read(filename):
+def _map_node_chunk(task):
+    """
+    Worker of DtkFile.map_nodes: decode a node chunk, apply the function and encode the result.
+    :return: The new chunk or None if the node was not modified
+    """
+    fn, file_class, engine, chunk = task
+    node = file_class._unwrap_node(json.loads(uncompress(chunk, engine), object_hook=support.SerialObject))
+    node = fn(node)
+    if node is None:
+        return None
+    return compress(json.dumps(file_class._wrap_node(node), separators=(',', ':')).encode('utf-8'), engine)
+
+
+def _imap_bounded(pool, fn, tasks, window):
+    """
+    Ordered results of fn applied to the tasks in the pool, with at most window tasks taken from the iterator
+    and not yet returned.
+    """
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= window:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(fn, (task,)))
+    while pending:
+        yield pending.popleft().get()
+
+
+def read(filename, lazy=True, cache_size=CACHE_SIZE):
+    """
+    Read a serialized population file.
+    :param filename: Path of the .dtk file
+    :param lazy: Memory-map the file and only read/decompress the chunks accessed. Otherwise read all the chunks.
+    :param cache_size: Number of decoded objects (simulation, nodes) kept in memory
+    """
+    versions = {1: DtkFileV1, 2: DtkFileV2, 3: DtkFileV3, 4: DtkFileV4}
 
     new_file = None
     with open(filename, 'rb') as handle:
         __check_magic_number__(handle)
         header = __read_header__(handle)
-        if header.version == 1:
-            new_file = DtkFileV1(header, filename=filename, handle=handle)
-        elif header.version == 2:
-            new_file = DtkFileV2(header, filename=filename, handle=handle)
-        elif header.version == 3:
-            new_file = DtkFileV3(header, filename=filename, handle=handle)
-        elif header.version == 4:
-            new_file = DtkFileV4(header, filename=filename, handle=handle)
-        else:
+        if header.version not in versions:
             raise UserWarning('Unknown serialized population file version: {0}'.format(header.version))
 
+        chunks = None
+        if lazy:
+            # Chunk offsets are given by the chunk sizes of the header
+            chunks = MappedChunks(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ), handle.tell(),
+                                  header.chunksizes, filename)
+        new_file = versions[header.version](header, filename=filename, handle=handle, chunks=chunks,
+                                            cache_size=cache_size)
+
     return new_file
 
 
 def __check_magic_number__(handle):
-    magic = handle.read(4)
+    magic = handle.read(4).decode('ascii', errors='replace')
     if magic != IDTK:
         raise UserWarning("File has incorrect magic 'number': '{0}'".format(magic))
     return
@@ -435,11 +647,19 @@ def __check_chunk_sizes__(chunk_sizes):
 
 
 def write(dtk_file, filename):
-
+    """
+    Write a serialized population file.
+    Only the objects modified are encoded, the other chunks are copied as they are (from the map if read lazily).
+    """
     # noinspection PyProtectedMember
     dtk_file._sync_header()
 
-    with open(filename, 'wb') as handle:
+    # Overwriting the mapped file would corrupt the chunks we are copying -> write aside and replace
+    target = filename
+    if dtk_file.mapped and os.path.exists(filename) and os.path.samefile(filename, dtk_file.chunks.filename):
+        target = filename + '.tmp'
+
+    with open(target, 'wb') as handle:
         __write_magic_number__(handle)
         if dtk_file.version <= 3:
             header = json.dumps({ 'metadata': dtk_file.header }, separators=(',', ':'))
@@ -447,24 +667,35 @@ def write(dtk_file, filename):
             header = json.dumps(dtk_file.header, separators=(',', ':'))
         __write_header_size__(len(header), handle)
         __write_header__(header, handle)
+        offset = handle.tell()
         __write_chunks__(dtk_file.chunks, handle)
 
+    if target != filename:
+        # The map has to be released before replacing the file (Windows refuses to replace a mapped file).
+        # The new file is mapped in its place so the chunks stay accessible.
+        dtk_file.close()
+        os.replace(target, filename)
+        with open(filename, 'rb') as handle:
+            # noinspection PyProtectedMember
+            dtk_file._chunks = MappedChunks(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ), offset,
+                                            dtk_file.header.chunksizes, filename)
+
     return
 
 
 def __write_magic_number__(handle):
-    handle.write('IDTK')
+    handle.write(IDTK.encode('ascii'))
     return
 
 
 def __write_header_size__(size, handle):
     size_string = '{:>12}'.format(size)     # decimal value right aligned in 12 character space
-    handle.write(size_string)
+    handle.write(size_string.encode('ascii'))
     return
 
 
 def __write_header__(string, handle):
-    handle.write(string)
+    handle.write(string.encode('utf-8'))
     return
 
 
@@ -6,6 +6,7 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('filename')
     parser.add_argument('-o', '--output', default='output.dtk')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Number of processes (default: all the cores)')
 
     args = parser.parse_args()
-    st.zero_infections(args.filename, args.output)
+    st.zero_infections(args.filename, args.output, workers=args.workers)
@@ -1,3 +1,5 @@
+from functools import partial
+
 from . import dtkFileTools as dtk
 
 STATE_ADULT = 1         # implies female, I believe
@@ -9,26 +11,17 @@ _endings = [ 'th', 'st', 'nd', 'rd', 'th', 'th', 'th', 'th', 'th', 'th' ]
 # functions need comments and/or cleaning.
 
 
-def zero_infections(source_filename, dest_filename, ignore_nodes=[], keep_individuals=[]):
+def zero_infections(source_filename, dest_filename, ignore_nodes=[], keep_individuals=[], workers=1):
     print('Ignoring nodes {0}'.format(ignore_nodes))
     print('Keeping infections in humans {0}'.format(keep_individuals))
 
     print("Reading file: '{0}'".format(source_filename))
     source = dtk.read(source_filename)
 
-    for index in range(0, len(source.nodes)):
-        print('Reading {0}{1} node'.format(index, _endings[index%10]), end='')
-        node = source.nodes[index]
-        print(', externalId = {0}'.format(node.externalId))
-        if node.externalId not in ignore_nodes:
-            print('Zeroing vector infections')
-            zero_vector_infections(node.m_vectorpopulations)
-            print('Zeroing human infections')
-            zero_human_infections(node.individualHumans, keep_individuals)
-            print('Saving updated node')
-            source.nodes[index] = node
-        else:
-            print('Ignoring node {0}'.format(index))
+    # Each node is decoded once and only the modified ones are encoded again, across `workers` processes
+    modified = source.map_nodes(partial(zero_node_infections, ignore_nodes=ignore_nodes,
+                                        keep_individuals=keep_individuals), workers=workers)
+    print('Zeroed infections in {0} of {1} nodes'.format(modified, len(source.nodes)))
 
     print("Writing file: '{0}'".format(dest_filename))
     dtk.write(source, dest_filename)
@@ -36,6 +29,17 @@ def zero_infections(source_filename, dest_filename, ignore_nodes=[], keep_indivi
     return
 
 
+def zero_node_infections(node, ignore_nodes=[], keep_individuals=[]):
+    if node.externalId in ignore_nodes:
+        print('Ignoring node {0}'.format(node.externalId))
+        return None
+
+    print('Zeroing vector and human infections of node {0}'.format(node.externalId))
+    zero_vector_infections(node.m_vectorpopulations)
+    zero_human_infections(node.individualHumans, keep_individuals)
+    return node
+
+
 def zero_vector_infections(vectors, remove=False):
 
     for vector_population in vectors:
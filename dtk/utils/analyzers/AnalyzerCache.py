@@ -0,0 +1,196 @@
+import glob
+import logging
+import os
+import pickle
+import shelve
+import sqlite3
+from threading import RLock
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCache(MutableMapping):
+    """
+    Cache of an analyzer in a SQLite database shared by all the analyzers caching in the same directory.
+    Each analyzer has its own namespace. The database uses the WAL journal so several threads or processes
+    can read and write it at the same time, and the writes are buffered and committed by batches.
+    The content of a former shelve file is migrated to the namespace the first time it is opened.
+    """
+    filename = 'analyzers_cache.sqlite'
+    timeout = 60
+
+    def __init__(self, shelve_file, namespace=None, batch_size=20):
+        """
+        :param shelve_file: Path of the shelve file of the analyzer, the database is created in the same directory
+        :param namespace: Namespace of the analyzer in the database, default to the name of the shelve file
+        :param batch_size: Number of writes to buffer before committing them
+        """
+        self.path = os.path.join(os.path.dirname(shelve_file), self.filename)
+        self.namespace = namespace or os.path.splitext(os.path.basename(shelve_file))[0]
+        self.batch_size = batch_size
+        self.pending = {}
+        self.lock = RLock()
+
+        self.conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS namespaces (namespace TEXT PRIMARY KEY)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS cache '
+                              '(namespace TEXT, key TEXT, value BLOB, PRIMARY KEY (namespace, key))')
+
+        self.migrate(shelve_file)
+
+    def migrate(self, shelve_file):
+        """
+        Copy the content of the shelve file in the namespace, only the first time the namespace is used.
+        """
+        with self.lock, self.conn:
+            registered = self.conn.execute('INSERT OR IGNORE INTO namespaces VALUES (?)', (self.namespace,))
+            if registered.rowcount == 0 or not glob.glob(shelve_file + '*'):
+                return
+
+            try:
+                old = shelve.open(shelve_file, flag='r')
+            except Exception:
+                logger.warning("Unable to open the shelve file %s, its content is not migrated" % shelve_file)
+                return
+
+            try:
+                rows = [(self.namespace, key, self.dumps(old[key])) for key in old.keys()]
+            finally:
+                old.close()
+
+            self.conn.executemany('INSERT OR REPLACE INTO cache VALUES (?, ?, ?)', rows)
+            logger.info("Migrated %d entries from %s to %s" % (len(rows), shelve_file, self.path))
+
+    @staticmethod
+    def dumps(value):
+        return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def __getitem__(self, key):
+        key = str(key)
+        with self.lock:
+            value = self.pending.get(key)
+            if value is None:
+                row = self.conn.execute('SELECT value FROM cache WHERE namespace=? AND key=?',
+                                        (self.namespace, key)).fetchone()
+                if row is None:
+                    raise KeyError(key)
+                value = row[0]
+
+        return pickle.loads(bytes(value))
+
+    def __setitem__(self, key, value):
+        # Pickled right away: later changes to the value are not cached, as with shelve
+        value = self.dumps(value)
+        with self.lock:
+            self.pending[str(key)] = value
+            if len(self.pending) >= self.batch_size:
+                self.sync()
+
+    def __delitem__(self, key):
+        key = str(key)
+        with self.lock:
+            self.sync()
+            with self.conn:
+                deleted = self.conn.execute('DELETE FROM cache WHERE namespace=? AND key=?', (self.namespace, key))
+            if deleted.rowcount == 0:
+                raise KeyError(key)
+
+    def __contains__(self, key):
+        key = str(key)
+        with self.lock:
+            if key in self.pending:
+                return True
+            return self.conn.execute('SELECT 1 FROM cache WHERE namespace=? AND key=?',
+                                     (self.namespace, key)).fetchone() is not None
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        with self.lock:
+            self.sync()
+            rows = self.conn.execute('SELECT key FROM cache WHERE namespace=? ORDER BY rowid', (self.namespace,))
+            return [row[0] for row in rows]
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.pending.clear()
+            self.conn.execute('DELETE FROM cache WHERE namespace=?', (self.namespace,))
+
+    def sync(self):
+        """
+        Commit the buffered writes.
+        """
+        with self.lock:
+            if not self.pending:
+                return
+            with self.conn:
+                self.conn.executemany('INSERT OR REPLACE INTO cache VALUES (?, ?, ?)',
+                                      [(self.namespace, key, value) for key, value in self.pending.items()])
+            self.pending.clear()
+
+    def close(self):
+        with self.lock:
+            self.sync()
+            self.conn.close()
+
+
+class ShelveCache(MutableMapping):
+    """
+    Cache of an analyzer in its own shelve file.
+    Shelve files are not thread safe: each cache has its own lock and every write is synced.
+    """
+
+    def __init__(self, shelve_file, namespace=None, batch_size=1):
+        self.shelve = shelve.open(shelve_file)
+        self.lock = RLock()
+
+    def __getitem__(self, key):
+        with self.lock:
+            return self.shelve[str(key)]
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self.shelve[str(key)] = value
+            self.shelve.sync()
+
+    def __delitem__(self, key):
+        with self.lock:
+            del self.shelve[str(key)]
+
+    def __contains__(self, key):
+        with self.lock:
+            return str(key) in self.shelve
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        with self.lock:
+            return len(self.shelve)
+
+    def keys(self):
+        with self.lock:
+            return list(self.shelve.keys())
+
+    def clear(self):
+        with self.lock:
+            self.shelve.clear()
+
+    def sync(self):
+        with self.lock:
+            self.shelve.sync()
+
+    def close(self):
+        with self.lock:
+            self.shelve.close()
@@ -1,13 +1,18 @@
+from dtk.utils.analyzers.AnalyzerCache import SQLiteCache
 from dtk.utils.analyzers.BaseAnalyzer import BaseAnalyzer
 from threading import Lock
-import shelve
 
 class BaseShelveAnalyzer(BaseAnalyzer):
     """
-    A class that provides caching support via shelve to analyzers.
+    A class that provides caching support to analyzers.
+    The cache (self.shelve) is a thread safe mapping, by default stored in SQLite (see AnalyzerCache).
     """
 
-    # Shelve files are not thread safe, need a common mutex
+    # Backend of the cache and number of writes committed together
+    cache_backend = SQLiteCache
+    cache_batch_size = 20
+
+    # Only guards the opening of the cache, the cache itself is thread safe
     mutex = Lock()
 
 
@@ -58,45 +63,48 @@ class BaseShelveAnalyzer(BaseAnalyzer):
         """
         Call filter on simulations you would like to analyze or retrieve from shelve
 
-        :param shelve_file: the path to the shelve file, typically a *.db file.
+        :param shelve_file: the path to the shelve file, typically a *.db file. Its content is migrated to the cache.
         :param sim_metadata: the metadata passed to the filter function.
         """
 
-        ## LOCK FOR SHELVE ####################################################
-        self.mutex.acquire()
-
         if self.shelve is None:
-            self.shelve_file = shelve_file
-            if self.verbose:
-                print ("Opening shelve file: %s" % self.shelve_file)
-
-            self.shelve = shelve.open(self.shelve_file)
+            self.open_cache(shelve_file)
 
-            if self.force_apply:
+        status = self.shelve.get('status')
+        if status is not None:
+            if status in ['combine', 'finalize'] and not self.force_combine:   # past apply, don't need to download any files
                 if self.verbose:
-                    print ("User set force_apply = True, so clearing the shelve.")
-                self.shelve.clear()
-
-        if 'status' in self.shelve:
-            pass
-            if self.shelve['status'] in ['combine', 'finalize'] and not self.force_combine:   # past apply, don't need to download any files
-                if self.verbose:
-                    print ('shelve status is %s, so returning False from filter' % self.shelve['status'])
-                self.mutex.release()
+                    print ('shelve status is %s, so returning False from filter' % status)
                 return False
         else:
             if self.verbose:
                 print ("Setting shelve status to filter")
-            self.shelve['status'] = 'filter' # Already have lock, don't call shelve_write
+            self.shelve_write('status', 'filter')
 
         sim_id = sim_metadata['sim_id']
-        if str(sim_id) not in self.shelve:
-            self.mutex.release()
-            return True
+        return str(sim_id) not in self.shelve
+
+
+    def open_cache(self, shelve_file):
+        """
+        Open the cache once for all the threads filtering simulations.
+        """
+        with self.mutex:
+            if self.shelve is not None:
+                return
+
+            self.shelve_file = shelve_file
+            if self.verbose:
+                print ("Opening cache for shelve file: %s" % self.shelve_file)
+
+            cache = self.cache_backend(self.shelve_file, batch_size=self.cache_batch_size)
+
+            if self.force_apply:
+                if self.verbose:
+                    print ("User set force_apply = True, so clearing the shelve.")
+                cache.clear()
 
-        self.mutex.release()
-        return False
-        #######################################################################
+            self.shelve = cache
 
 
     def apply(self, parser):
@@ -127,7 +135,7 @@ class BaseShelveAnalyzer(BaseAnalyzer):
     def finalize(self):
         """
         Call this base finalize from your analyzer's finalize.
-        Updates status to finalize and closes the shelve.
+        Updates status to finalize and closes the shelve (committing the pending writes).
         """
 
         self.shelve_write('status', 'finalize')
@@ -138,13 +146,10 @@ class BaseShelveAnalyzer(BaseAnalyzer):
 
     def shelve_write(self, key, value):
         """
-        Helper function to get a lock before modifying the shelve.  Also syncs.
+        Helper function to store in the shelve. The writes are committed by batches of cache_batch_size.
         :param key: the key where the data should be stored
         :param data: the data to store at key
         """
-        self.mutex.acquire()
         self.shelve[key] = value
-        self.shelve.sync()
-        self.mutex.release()
 
 
@@ -17,7 +17,7 @@ class TimeseriesAnalyzer(BaseAnalyzer):
                            'Rainfall', 'Adult Vectors',
                            'Daily EIR', 'Infected',
                            'Air Temperature'), saveOutput=False):
-        super(TimeseriesAnalyzer, self).__init__(filenames=(filename,))
+        super(TimeseriesAnalyzer, self).__init__(filenames=(filename,), channels=channels)
         self.channels = set(channels)
         self.group_function = group_function
         self.filter_function = filter_function
@@ -31,6 +31,7 @@ from dtk.utils.parsers.JSON import json2dict
 from dtk.utils.reports.CustomReport import format as format_reports
 from simtools.AssetManager.SimulationAssets import SimulationAssets
 from simtools.SimConfigBuilder import SimConfigBuilder
+from simtools.Utilities.CopyOnWrite import reading
 from simtools.Utilities.COMPSUtilities import get_asset_collection
 from simtools.Utilities.Encoding import NumpyEncoder
 from simtools.Utilities.General import init_logging
@@ -446,7 +447,8 @@ class DTKConfigBuilder(SimConfigBuilder):
         """
         Returns the custom events listed in the campaign along with user-defined ones in the Listed_Events (config.json)
         """
-        campaign_str = json.dumps(self.campaign, cls=NumpyEncoder)
+        with reading():
+            campaign_str = json.dumps(self.campaign, cls=NumpyEncoder)
 
         # Retrieve all the events in the campaign file
         events_from_campaign = re.findall(r"['\"](?:Broadcast_Event|Event_Trigger|Event_To_Broadcast|Blackout_Event_Trigger|Took_Dose_Event)['\"]:\s['\"](.*?)['\"]", campaign_str, re.DOTALL)
@@ -505,10 +507,12 @@ class DTKConfigBuilder(SimConfigBuilder):
         """
         from simtools.SetupParser import SetupParser
 
-        if self.human_readability:
-            dump = lambda content: json.dumps(content, sort_keys=True, indent=3, cls=NumpyEncoder).strip('"')
-        else:
-            dump = lambda content: json.dumps(content, sort_keys=True, cls=NumpyEncoder).strip('"')
+        indent = 3 if self.human_readability else None
+
+        def dump(content):
+            # Only reading the content: the parts shared with the base builder of a lazy copy are not copied
+            with reading():
+                return json.dumps(content, sort_keys=True, indent=indent, cls=NumpyEncoder).strip('"')
 
         write_fn(self.config['parameters']['Campaign_Filename'], dump(self.campaign))
 
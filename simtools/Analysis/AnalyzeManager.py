@@ -1,6 +1,6 @@
 import collections
-import itertools
 import os
+import queue
 import sys
 import time
 from multiprocessing.pool import Pool
@@ -8,6 +8,8 @@ from multiprocessing.pool import Pool
 from COMPS.Data.Simulation import SimulationState
 
 from simtools.Analysis.DataRetrievalProcess import retrieve_data
+from simtools.Analysis.ResultCache import AnalysisResultCache
+from simtools.Analysis.RetrievalEngine import RetrievalEngine, DOWNLOAD_THREADS
 from simtools.DataAccess.DataStore import DataStore
 from simtools.SetupParser import SetupParser
 from simtools.Utilities import on_off, pluralize, verbose_timedelta
@@ -20,20 +22,46 @@ logger = init_logging('AnalyzeManager')
 
 ANALYZE_TIMEOUT = 3600  # Maximum seconds before timing out - set to 1h
 WAIT_TIME = 1.15        # How much time to wait between check if the analysis is done
+WATCH_INTERVAL = 10     # How much time to wait between simulation status checks in watch mode
 EXCEPTION_KEY = "__EXCEPTION__"
+PARSE_COUNT_KEY = "__PARSE_COUNT__"    # Number of files parsed
+PARSE_REUSE_KEY = "__PARSE_REUSE__"    # Number of times a parsed file was shared instead of parsed again
+PARSE_SAVED_KEY = "__PARSE_SAVED__"    # Parse time saved by the sharing (in ms)
+RESULT_HIT_KEY = "__RESULT_HIT__"      # Number of analyzer results found in the result cache
+RESERVED_KEYS = (EXCEPTION_KEY, PARSE_COUNT_KEY, PARSE_REUSE_KEY, PARSE_SAVED_KEY, RESULT_HIT_KEY)
 
 
 class AnalyzeManager(CacheEnabled):
     def __init__(self, exp_list=None, sim_list=None, analyzers=None, working_dir=None, force_analyze=False,
-                 verbose=True):
+                 verbose=True, result_cache=None, sidecars=None):
+        """
+        :param result_cache: Keep the analyzers results in a persistent store to not re-process the simulations
+        already analyzed with the same analyzers (see AnalysisResultCache). The entries are only invalidated by
+        changes to the analyzers code and attributes, not by external files they read.
+        If None, uses the analysis_result_cache option of the simtools.ini (off by default).
+        :param sidecars: Store the parsed JSON/CSV outputs of the local simulations in columnar sidecars next to them
+        and read them instead of parsing the files again (see simtools.Analysis.Sidecar).
+        If None, uses the parse_sidecars option of the simtools.ini (off by default).
+        """
         super().__init__()
         self.analyzers = []
         self.experiments = set()
         self.simulations = {}
         self.ignored_simulations = {}
+        self.parse_stats = {}
+        self.reduced = {}
 
         with SetupParser.TemporarySetup() as sp:
             self.max_threads = min(os.cpu_count(), int(sp.get('max_threads', 16)))
+            self.max_downloads = int(sp.get('max_download_threads', DOWNLOAD_THREADS))
+            if result_cache is None:
+                result_cache = str(sp.get('analysis_result_cache', '0')).lower() in ('1', 'true', 'on', 'yes')
+            self.result_cache = AnalysisResultCache(directory=sp.get('analysis_cache_dir', None),
+                                                    size_limit=sp.get('analysis_cache_size', None)) \
+                if result_cache else None
+            if sidecars is None:
+                sidecars = str(sp.get('parse_sidecars', '0')).lower() in ('1', 'true', 'on', 'yes')
+        self.sidecars = sidecars
         self.verbose = verbose
         self.force_analyze = force_analyze
         self.working_dir = working_dir or os.getcwd()
@@ -114,15 +142,141 @@ class AnalyzeManager(CacheEnabled):
             print(exception)
             exit()
 
-    def analyze(self):
+    def _collect_parse_stats(self):
+        self.parse_stats = {
+            "parsed": self.cache.get(PARSE_COUNT_KEY, default=0),
+            "reused": self.cache.get(PARSE_REUSE_KEY, default=0),
+            "time_saved": self.cache.get(PARSE_SAVED_KEY, default=0) / 1000,
+            "cached": self.cache.get(RESULT_HIT_KEY, default=0)
+        }
+        return self.parse_stats
+
+    def _watch_simulations(self):
+        """
+        Look for the ignored simulations that reached Succeeded since the last check.
+        The simulations that ended in Failed or Canceled are not watched anymore.
+        :return: List of newly succeeded simulations
+        """
+        from simtools.ExperimentManager.BaseExperimentManager import BaseExperimentManager
+
+        # Make sure somebody is updating the statuses
+        BaseExperimentManager.check_overseer()
+
+        succeeded = []
+        for sid, status in DataStore.get_simulation_states(list(self.ignored_simulations.keys())):
+            if status == SimulationState.Succeeded:
+                del self.ignored_simulations[sid]
+                simulation = DataStore.get_simulation(sid)
+                self.simulations[sid] = simulation
+                succeeded.append(simulation)
+            elif status in (SimulationState.Failed, SimulationState.Canceled):
+                del self.ignored_simulations[sid]
+
+        return succeeded
+
+    def _reduce_simulation(self, sid, streaming_analyzers):
+        """
+        Fold the selected data of a simulation into the streaming analyzers and release it from the cache.
+        The selected data of the non-streaming analyzers stays in the cache until finalize().
+        """
+        if not streaming_analyzers:
+            return
+
+        sim_cache = self.cache.get(sid)
+        if not sim_cache:
+            return
+
+        simulation = self.simulations[sid]
+        for a in streaming_analyzers:
+            if a.uid in sim_cache:
+                self.reduced[a.uid] = a.reduce(self.reduced.get(a.uid), sim_cache.pop(a.uid), simulation)
+
+        if sim_cache:
+            self.cache.set(sid, sim_cache)
+        else:
+            self.cache.delete(sid)
+
+    def _process_simulations(self, pool, streaming_analyzers, start_time, watch):
+        """
+        Submit the simulations to the pool and reduce their selected data as soon as each simulation is done.
+        The files of the HPC simulations are first downloaded by the RetrievalEngine threads.
+        In watch mode, keep polling the ignored simulations and submit them when they reach Succeeded.
+        """
+        done = queue.Queue()
+        pending = set()
+        analyzed = 0
+        last_watch = time.time()
+        engine = None
+
+        def process(simulation):
+            pool.apply_async(retrieve_data, (simulation, self.analyzers, self.cache, self.result_cache, self.sidecars),
+                             callback=done.put, error_callback=done.put)
+
+        def submit(simulations):
+            nonlocal engine
+            for simulation in simulations:
+                pending.add(simulation.id)
+                if simulation.experiment.location == "HPC":
+                    engine = engine or RetrievalEngine(self.analyzers, self.result_cache, self.max_downloads)
+                    engine.submit(simulation, process)
+                else:
+                    process(simulation)
+
+        submit(self.simulations.values())
+
+        while pending or (watch and self.ignored_simulations):
+            self._check_exception()
+
+            try:
+                sid = done.get(timeout=WAIT_TIME)
+            except queue.Empty:
+                sid = None
+
+            if isinstance(sid, BaseException):
+                raise sid
+
+            if sid:
+                pending.discard(sid)
+                self._reduce_simulation(sid, streaming_analyzers)
+                analyzed += 1
+
+            if watch and time.time() - last_watch > WATCH_INTERVAL:
+                submit(self._watch_simulations())
+                last_watch = time.time()
+
+            time_elapsed = time.time() - start_time
+            if self.verbose:
+                sys.stdout.write("\r {} Analyzing {}/{}{}... {} elapsed"
+                                 .format(next(animation), analyzed, len(self.simulations),
+                                         " ({} running)".format(len(self.ignored_simulations)) if watch else "",
+                                         verbose_timedelta(time_elapsed)))
+                sys.stdout.flush()
+
+            # When watching, the experiment duration is not bounded
+            if not watch and time_elapsed > ANALYZE_TIMEOUT:
+                raise Exception("Timeout while waiting the analysis to complete...")
+
+        if engine:
+            engine.shutdown()
+
+    def analyze(self, stream=False, watch=False):
+        """
+        Analyze the simulations.
+        :param stream: Fold the results of the streaming analyzers (see BaseAnalyzer.streaming) as soon as each
+        simulation is done instead of waiting for the whole set. Keeps the memory bounded for large experiments.
+        :param watch: Analyze the simulations as they reach Succeeded while the experiments are still running.
+        Implies stream.
+        """
         # Clear the cache
         self.cache.clear()
+        self.reduced = {}
+        stream = stream or watch
 
         # Start the timer
         start_time = time.time()
 
         # If no analyzers -> quit
-        if not all((self.analyzers, self.simulations)):
+        if not all((self.analyzers, self.simulations or (watch and self.ignored_simulations))):
             print("No analyzers or experiments selected, exiting...")
             return
 
@@ -138,50 +292,55 @@ class AnalyzeManager(CacheEnabled):
             for a in self.analyzers:
                 a.per_experiment(exp)
 
-        scount = len(self.simulations)
+        # Fingerprint the analyzers for the result cache
+        if self.result_cache is not None:
+            self.result_cache.register(self.analyzers)
+
+        scount = len(self.simulations) + (len(self.ignored_simulations) if watch else 0)
         max_threads = min(self.max_threads, scount if scount != 0 else 1)
+        streaming_analyzers = [a for a in self.analyzers if stream and a.streaming]
 
         # Display some info
         if self.verbose:
             print("Analyze Manager")
             print(" | {} simulation{} - {} experiment{}"
                   .format(scount, pluralize(scount), len(self.experiments), pluralize(self.experiments)))
-            print(" | force_analyze is {} and {} simulation{} ignored"
-                  .format(on_off(self.force_analyze), len(self.ignored_simulations), pluralize(self.ignored_simulations)))
+            if watch:
+                print(" | Watch mode: {} simulation{} will be analyzed when succeeded"
+                      .format(len(self.ignored_simulations), pluralize(self.ignored_simulations)))
+            else:
+                print(" | force_analyze is {} and {} simulation{} ignored"
+                      .format(on_off(self.force_analyze), len(self.ignored_simulations), pluralize(self.ignored_simulations)))
             print(" | Analyzer{}: ".format(pluralize(self.analyzers)))
             for a in self.analyzers:
-                print(" |  - {} (Directory map: {} / File parsing: {} / Use cache: {})"
-                      .format(a.uid, on_off(a.need_dir_map), on_off(a.parse), on_off(hasattr(a, "cache"))))
+                print(" |  - {} (Directory map: {} / File parsing: {} / Use cache: {} / Streaming: {})"
+                      .format(a.uid, on_off(a.need_dir_map), on_off(a.parse), on_off(hasattr(a, "cache")),
+                              on_off(a in streaming_analyzers)))
+            if self.result_cache is not None:
+                print(" | Result cache: {} ({} entr{}, {:.1f}/{} MB)"
+                      .format(self.result_cache.directory, len(self.result_cache), "y" if len(self.result_cache) == 1 else "ies",
+                              self.result_cache.volume / 1024 ** 2, self.result_cache.size_limit))
+            if self.sidecars:
+                print(" | Parsed sidecars: on")
             print(" | Pool of {} analyzing processes".format(max_threads))
+            if any(e.location == "HPC" for e in self.experiments):
+                print(" | Pool of {} downloading threads".format(self.max_downloads))
 
         pool = Pool(max_threads)
         if scount == 0 and self.verbose:
             print("No experiments/simulations for analysis.")
         else:
-            results = pool.starmap_async(retrieve_data, itertools.product(self.simulations.values(), (self.analyzers,), (self.cache,)))
-
-            while not results.ready():
-                self._check_exception()
-
-                time_elapsed = time.time()-start_time
-                if self.verbose:
-                    sys.stdout.write("\r {} Analyzing {}/{}... {} elapsed"
-                                     .format(next(animation), len(self.cache), scount, verbose_timedelta(time_elapsed)))
-                    sys.stdout.flush()
-
-                if time_elapsed > ANALYZE_TIMEOUT:
-                    raise Exception("Timeout while waiting the analysis to complete...")
-
-                time.sleep(WAIT_TIME)
-            results.get()
+            self._process_simulations(pool, streaming_analyzers, start_time, watch)
+            scount = len(self.simulations)
 
         # At this point we have all our results
         # Give to the analyzer
         finalize_results = {}
         for a in self.analyzers:
+            if a in streaming_analyzers: continue
             analyzer_data = {}
             for key in self.cache:
-                if key == EXCEPTION_KEY: continue
+                if key in RESERVED_KEYS: continue
                 # Retrieve the cache content and the simulation object
                 sim_cache = self.cache.get(key)
                 simulation_obj = self.simulations[key]
@@ -193,10 +352,22 @@ class AnalyzeManager(CacheEnabled):
         pool.join()
 
         for a in self.analyzers:
-            a.results = finalize_results[a.uid].get()
+            if a in streaming_analyzers:
+                a.results = a.combine(self.reduced.get(a.uid))
+            else:
+                a.results = finalize_results[a.uid].get()
+
+        self._collect_parse_stats()
 
         if self.verbose:
             total_time = time.time() - start_time
             print("\r | Analysis done. Took {} (~ {:.3f} per simulation)"
                   .format(verbose_timedelta(total_time), total_time / scount if scount != 0 else 0))
-
+            if self.parse_stats["reused"]:
+                print(" | {} file{} parsed, {} parse{} shared between analyzers (~ {} saved)"
+                      .format(self.parse_stats["parsed"], pluralize(self.parse_stats["parsed"]),
+                              self.parse_stats["reused"], pluralize(self.parse_stats["reused"]),
+                              verbose_timedelta(self.parse_stats["time_saved"])))
+            if self.parse_stats["cached"]:
+                print(" | {} result{} retrieved from the result cache"
+                      .format(self.parse_stats["cached"], pluralize(self.parse_stats["cached"])))
@@ -5,18 +5,29 @@ class BaseAnalyzer(metaclass=ABCMeta):
     """
     An abstract base class carrying the lowest level analyzer interfaces called by BaseExperimentManager
     """
+    # Set to True by the analyzers implementing reduce() and combine() to support the streaming mode
+    streaming = False
+
     @abstractmethod
-    def __init__(self, uid=None, working_dir=None, parse=True, need_dir_map=False, filenames=None):
+    def __init__(self, uid=None, working_dir=None, parse=True, need_dir_map=False, filenames=None, cache_results=True,
+                 channels=None):
         """
         :param uid: The unique id identifying this analyzer
         :param working_dir: A working directory to dump files
         :param parse: Do we want to leverage the OutputParser or just get the raw data in the select_simulation_data()
         :param need_dir_map: Will we need the path of the simulations eventually?
         :param filenames: Which files the analyzer needs to download
+        :param cache_results: Can the data returned by select_simulation_data() be kept in the AnalyzeManager result
+        cache? Needs to be False if select_simulation_data() has side effects (writing files...)
+        :param channels: For the reports with a Channels section (InsetChart, PropertyReport...), the channels the
+        analyzer needs. Only those are decoded (as numpy arrays) and the rest of the file is skipped.
+        None or empty to get the whole files.
         """
         self.filenames = filenames or []
         self.parse = parse
         self.need_dir_map = need_dir_map
+        self.cache_results = cache_results
+        self.channels = channels
         self.working_dir = working_dir
         self.uid = uid or self.__class__.__name__
         self.results = None  # Store what finalize() is returning
@@ -59,3 +70,22 @@ class BaseAnalyzer(metaclass=ABCMeta):
         """
         pass
 
+    def reduce(self, reduced, selected_data, simulation):
+        """
+        Optional streaming hook, only used if streaming is True. When the AnalyzeManager runs in streaming mode,
+        called on the main process as soon as a simulation is done to fold its selected data. The selected data is
+        then discarded instead of being kept for finalize().
+        :param reduced: value returned by the previous call (None for the first simulation)
+        :param selected_data: data returned by select_simulation_data() for this simulation
+        :param simulation: object representing the simulation
+        :return: the new reduced value
+        """
+        return reduced
+
+    def combine(self, reduced):
+        """
+        Streaming counterpart of finalize(), called once all the simulations have been reduced
+        :param reduced: value returned by the last reduce() call
+        :return: the analyzer results
+        """
+        return reduced
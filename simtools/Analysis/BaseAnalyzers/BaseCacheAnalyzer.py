@@ -3,7 +3,7 @@ from simtools.Analysis.BaseAnalyzers.BaseAnalyzer import BaseAnalyzer
 class BaseCacheAnalyzer(BaseAnalyzer):
 
     def __init__(self, cache_location=None, force=False):
-        super().__init__()
+        super().__init__(cache_results=False)
         self.cache_location = cache_location
         self.cache = None
         self.force = force
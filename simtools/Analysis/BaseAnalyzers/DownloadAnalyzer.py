@@ -33,6 +33,9 @@ class DownloadAnalyzer(BaseAnalyzer):
         # We only want the raw files -> disable parsing
         self.parse = False
 
+        # The files need to be written every time -> do not use the result cache
+        self.cache_results = False
+
         if filenames:
             self.filenames = filenames
 
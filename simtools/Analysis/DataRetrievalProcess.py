@@ -1,68 +1,239 @@
 import itertools
-
+import mmap
 import os
+import time
 import traceback
 
+import numpy as np
+
 from simtools.Analysis.OutputParser import SimulationOutputParser
 from simtools.Utilities.COMPSCache import COMPSCache
+from simtools.Utilities.COMPSFileCache import COMPSFileCache
 from simtools.Utilities.COMPSUtilities import COMPS_login, get_asset_files_for_simulation_id
 
 
-def retrieve_data(simulation, analyzers, cache):
-    from simtools.Analysis.AnalyzeManager import EXCEPTION_KEY
+class ParsedFileMemo:
+    """
+    Parse each output file of a simulation at most once and share the parsed object across the analyzers.
+    Keeps track of how many parses were avoided and the parse time it saved.
+
+    Note: the parsed objects are shared between analyzers, select_simulation_data() should not modify them in place.
+
+    The content given to an analyzer only depends on its own channels: an analyzer declaring channels gets only
+    these channels with their Data as numpy arrays, even if the file was fully loaded for another analyzer.
+    """
+    def __init__(self, byte_arrays, channels=None, paths=None):
+        """
+        :param byte_arrays: Dictionary associating filename with content
+        :param channels: Dictionary associating filename with the channels to load (see file_channels)
+        :param paths: Dictionary associating filename with its location on disk to use the parsed sidecars
+        """
+        self.byte_arrays = byte_arrays
+        self.channels = channels or {}
+        self.paths = paths or {}
+        self.parsed = {}
+        self.parse_times = {}
+        self.channel_arrays = {}
+        self.parse_count = 0
+        self.reuse_count = 0
+        self.saved_time = 0
+
+    def get(self, filename, channels=None):
+        """
+        :param channels: The channels requested by the analyzer, None for the whole file
+        """
+        if filename in self.parsed:
+            self.reuse_count += 1
+            self.saved_time += self.parse_times[filename]
+        else:
+            start = time.time()
+            self.parsed[filename] = SimulationOutputParser.parse(filename, self.byte_arrays[filename],
+                                                                   channels=self.channels.get(filename),
+                                                                   path=self.paths.get(filename))
+            self.parse_times[filename] = time.time() - start
+            self.parse_count += 1
+
+        parsed = self.parsed[filename]
+        if not channels or not isinstance(parsed, dict) or not isinstance(parsed.get('Channels'), dict):
+            return parsed
+
+        # Only the requested channels, their Data converted once and shared
+        selected = {}
+        for name in channels:
+            if name not in parsed['Channels']:
+                continue
+            if (filename, name) not in self.channel_arrays:
+                channel = parsed['Channels'][name]
+                self.channel_arrays[(filename, name)] = \
+                    dict(channel, Data=np.asarray(channel['Data'])) if 'Data' in channel else channel
+            selected[name] = self.channel_arrays[(filename, name)]
+        return dict(parsed, Channels=selected)
+
+    def select(self, filenames, channels=None):
+        """
+        Returns the parsed content for the given filenames only
+        :param filenames: List of filenames an analyzer requested
+        :param channels: The channels requested by the analyzer (see BaseAnalyzer.channels)
+        :return: Dictionary associating filename with parsed content
+        """
+        return {filename: self.get(filename, channels) for filename in filenames}
+
+
+def file_channels(analyzers):
+    """
+    Union of the channels requested for each file by the parsing analyzers.
+    A file is fully loaded (None) as soon as one analyzer needs all its channels.
+    :return: Dictionary associating filename with a set of channels or None
+    """
+    channels = {}
+    for analyzer in analyzers:
+        if not analyzer.parse:
+            continue
+        for filename in analyzer.filenames:
+            wanted = getattr(analyzer, 'channels', None)
+            if not wanted or (filename in channels and channels[filename] is None):
+                channels[filename] = None
+            else:
+                channels[filename] = channels.get(filename, set()) | set(wanted)
+    return channels
+
+
+def map_file(path):
+    """
+    Memory-map a local file (read-only) to let the parsers consume it without copying it in memory.
+    Empty files cannot be mapped and are simply read.
+    """
+    with open(path, 'rb') as output_file:
+        try:
+            return mmap.mmap(output_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return output_file.read()
+
+
+def raw_data(byte_arrays):
+    """
+    Analyzers not parsing the files expect bytes -> materialize the mapped files
+    """
+    return {filename: content[:] if isinstance(content, mmap.mmap) else content
+            for filename, content in byte_arrays.items()}
+
+
+def close_files(byte_arrays):
+    """
+    Release the files mapped by map_file
+    """
+    for content in byte_arrays.values():
+        if isinstance(content, mmap.mmap):
+            try:
+                content.close()
+            except BufferError:
+                # Still viewed by some data kept by an analyzer, unmapped when this data is released
+                pass
 
-    # Filter first and get the filenames from filtered analysis
+
+def retrieve_data(simulation, analyzers, cache, result_cache=None, sidecars=False):
+    """
+    Retrieve the files of a simulation, let the analyzers select their data and store it in the cache.
+    :param result_cache: Optional AnalysisResultCache holding the results of previous analysis
+    :param sidecars: For local simulations, read the parsed files from their columnar sidecars (created if missing)
+    :return: The id of the processed simulation
+    """
+    from simtools.Analysis.AnalyzeManager import EXCEPTION_KEY, RESULT_HIT_KEY
+    from simtools.Analysis.ResultCache import MISS
+
+    # Filter first
     filtered_analysis = [a for a in analyzers if a.filter(simulation)]
+
+    # Selected data will be a dict with analyzer.uid => data
+    selected_data = {}
+
+    # Get what we already know from the result cache
+    if result_cache is not None:
+        for analyzer in filtered_analysis:
+            data = result_cache.get(simulation, analyzer)
+            if data is not MISS:
+                selected_data[analyzer.uid] = data
+
+        if selected_data:
+            cache.incr(RESULT_HIT_KEY, len(selected_data), retry=True)
+            filtered_analysis = [a for a in filtered_analysis if a.uid not in selected_data]
+
+    # Get the filenames from filtered analysis
     filenames = set(itertools.chain(*(a.filenames for a in filtered_analysis)))
 
     # We dont have anything to do :)
     if not filenames or not filtered_analysis:
-        cache.set(simulation.id, None)
-        return
+        cache.set(simulation.id, selected_data or None)
+        return simulation.id
 
     # The byte_arrays will associate filename with content
     byte_arrays = {}
+    paths = {}
 
     try:
         if simulation.experiment.location == "HPC":
-            COMPS_login(simulation.experiment.endpoint)
-            COMPS_simulation = COMPSCache.simulation(simulation.id)
-            assets = [path for path in filenames if path.lower().startswith("assets")]
-            transient = [path for path in filenames if not path.lower().startswith("assets")]
-            if transient:
-                byte_arrays.update(dict(zip(transient, COMPS_simulation.retrieve_output_files(paths=transient))))
-            if assets:
-                byte_arrays.update(get_asset_files_for_simulation_id(simulation.id, paths=assets, remove_prefix='Assets'))
+            # The files may have been prefetched by the RetrievalEngine
+            byte_arrays = COMPSFileCache.cached_files(simulation.id, filenames) or {}
+            missing = [path for path in filenames if path not in byte_arrays]
+
+            if missing:
+                COMPS_login(simulation.experiment.endpoint)
+                COMPS_simulation = COMPSCache.simulation(simulation.id)
+                assets = [path for path in missing if path.lower().startswith("assets")]
+                transient = [path for path in missing if not path.lower().startswith("assets")]
+                if transient:
+                    byte_arrays.update(dict(zip(transient, COMPSFileCache.retrieve_output_files(COMPS_simulation, transient))))
+                if assets:
+                    byte_arrays.update(get_asset_files_for_simulation_id(simulation.id, paths=assets, remove_prefix='Assets'))
 
         else:
-            byte_arrays = []
             for filename in filenames:
-                path = os.path.join(simulation.get_path(), filename)
-                with open(path, 'rb') as output_file:
-                    byte_arrays[filename] = output_file.read()
+                paths[filename] = os.path.join(simulation.get_path(), filename)
+                byte_arrays[filename] = map_file(paths[filename])
     except:
+        close_files(byte_arrays)
         tb = traceback.format_exc()
         cache.set(EXCEPTION_KEY, "An exception has been raised during data retrieval.\n"
                                  "Simulation: {} \n"
                                  "Analyzers: {}\n"
                                  "Files: {}\n"
-                                 "\n{}".format(simulation, ", ".join(analyzers), ", ".join(filenames), tb))
-        return
+                                 "\n{}".format(simulation, ", ".join(a.uid for a in analyzers), ", ".join(filenames), tb))
+        return simulation.id
 
-    # Selected data will be a dict with analyzer.uid => data
-    selected_data = {}
-    for analyzer in filtered_analysis:
-        # If the analyzer needs the parsed data, parse
-        if analyzer.parse:
-            data = {filename:SimulationOutputParser.parse(filename, content)
-                    for filename, content in byte_arrays.items()}
-        else:
-            # If the analyzer doesnt wish to parse, give the raw data
-            data = byte_arrays
+    try:
+        select_data(simulation, filtered_analysis, byte_arrays, paths if sidecars else None, selected_data, cache,
+                    result_cache)
+    finally:
+        # The parsed files are released at this point
+        close_files(byte_arrays)
+
+    return simulation.id
 
+
+def select_data(simulation, analyzers, byte_arrays, paths, selected_data, cache, result_cache):
+    """
+    Let the analyzers select their data from the files of a simulation and store it in the cache.
+    """
+    from simtools.Analysis.AnalyzeManager import EXCEPTION_KEY, PARSE_COUNT_KEY, PARSE_REUSE_KEY, PARSE_SAVED_KEY
+
+    # Parsed files are shared by all the analyzers of this simulation
+    memo = ParsedFileMemo(byte_arrays, file_channels(analyzers), paths)
+    raw = None
+
+    for analyzer in analyzers:
         # Retrieve the selected data for the given analyzer
         try:
+            # If the analyzer needs the parsed data, parse only its own files (once per simulation)
+            # If the analyzer doesnt wish to parse, give the raw data (materialized once per simulation)
+            if analyzer.parse:
+                data = memo.select(analyzer.filenames, getattr(analyzer, 'channels', None))
+            else:
+                if raw is None:
+                    raw = raw_data(byte_arrays)
+                data = dict(raw)
             selected_data[analyzer.uid] = analyzer.select_simulation_data(data, simulation)
+            if result_cache is not None:
+                result_cache.set(simulation, analyzer, selected_data[analyzer.uid])
         except:
             tb = traceback.format_exc()
             cache.set(EXCEPTION_KEY, "An exception has been raised during data processing.\n"
@@ -71,5 +242,12 @@ def retrieve_data(simulation, analyzers, cache):
                                      "\n{}".format(simulation, analyzer, tb))
             return
 
+    # Report the parsing statistics
+    if memo.parse_count:
+        cache.incr(PARSE_COUNT_KEY, memo.parse_count, retry=True)
+    if memo.reuse_count:
+        cache.incr(PARSE_REUSE_KEY, memo.reuse_count, retry=True)
+        cache.incr(PARSE_SAVED_KEY, int(memo.saved_time * 1000), retry=True)
+
     # Store in the cache
     cache.set(simulation.id, selected_data)
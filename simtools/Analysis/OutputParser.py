@@ -1,15 +1,136 @@
 import json
+import mmap
 import os
+import re
 from io import StringIO, BytesIO
 
+import numpy as np
 import pandas as pd
 
+from simtools.Analysis import Sidecar
+
+JSON_TOKEN = re.compile(rb'[{}\[\]"]')
+JSON_STRING = re.compile(rb'"(?:[^"\\]|\\.)*"', re.DOTALL)
+JSON_SCALAR = re.compile(rb'[^,}\]\s]*')
+JSON_SPACE = re.compile(rb'\s*')
+
+
+def skip_json_array(buffer, pos):
+    """
+    Fast path for the arrays of numbers: find the closing bracket and make sure there is nothing nested in between.
+    :param buffer: bytes-like object containing the JSON document
+    :param pos: Position of the opening bracket
+    :return: Position right after the array or None if the array is not flat
+    """
+    if not hasattr(buffer, 'find'):
+        return None
+
+    end = buffer.find(b']', pos)
+    if end < 0 or any(buffer.find(token, pos + 1, end) >= 0 for token in (b'[', b'{', b'"')):
+        return None
+    return end + 1
+
+
+def skip_json_value(buffer, pos):
+    """
+    Find the end of a JSON value without decoding it.
+    :param buffer: bytes-like object containing the JSON document
+    :param pos: Position of the first character of the value
+    :return: Position right after the value
+    """
+    first = bytes(buffer[pos:pos + 1])
+    if first == b'"':
+        return JSON_STRING.match(buffer, pos).end()
+    if first not in (b'{', b'['):
+        return JSON_SCALAR.match(buffer, pos).end()
+
+    depth = 0
+    while True:
+        token = JSON_TOKEN.search(buffer, pos)
+        if token is None:
+            raise ValueError("Unterminated JSON value starting at position {}".format(pos))
+
+        if token.group() == b'"':
+            pos = JSON_STRING.match(buffer, token.start()).end()
+            continue
+
+        if token.group() == b'[':
+            end = skip_json_array(buffer, token.start())
+            if end is not None:
+                pos = end
+                if depth == 0:
+                    return pos
+                continue
+
+        pos = token.end()
+        depth += 1 if token.group() in (b'{', b'[') else -1
+        if depth == 0:
+            return pos
+
+
+def iter_json_members(buffer, pos=0):
+    """
+    Iterate over the members of a JSON object without decoding their values.
+    :param buffer: bytes-like object containing the JSON document
+    :param pos: Position of the object
+    :return: Generator of (key, value start, value end)
+    """
+    pos = JSON_SPACE.match(buffer, pos).end()
+    if bytes(buffer[pos:pos + 1]) != b'{':
+        raise ValueError("Expecting a JSON object at position {}".format(pos))
+    pos += 1
+
+    while True:
+        pos = JSON_SPACE.match(buffer, pos).end()
+        char = bytes(buffer[pos:pos + 1])
+        if char == b'}':
+            return
+        if char == b',':
+            pos += 1
+            continue
+
+        key = JSON_STRING.match(buffer, pos)
+        if key is None:
+            raise ValueError("Expecting a JSON key at position {}".format(pos))
+
+        # Skip the colon
+        pos = JSON_SPACE.match(buffer, key.end()).end() + 1
+        pos = JSON_SPACE.match(buffer, pos).end()
+        end = skip_json_value(buffer, pos)
+        yield json.loads(bytes(key.group()).decode('utf-8')), pos, end
+        pos = end
+
 
 class SimulationOutputParser:
+    """
+    Parse the simulation output files.
+    The content can be bytes, a file object or any object exposing the buffer protocol (memoryview, mmap...).
+    Buffers are consumed in place whenever the format allows it.
+    """
     @classmethod
-    def parse(cls, filename, content=None):
+    def parse(cls, filename, content=None, channels=None, path=None):
+        """
+        :param filename: Name of the file (used to find the format)
+        :param content: Content of the file
+        :param channels: For the reports with a Channels section (InsetChart, PropertyReport...), only load these
+        channels. None to load the whole file.
+        :param path: Location of the file on disk. If given, JSON and CSV files are read from their columnar sidecar
+        (see simtools.Analysis.Sidecar) which is created the first time the file is parsed.
+        """
+        if path and Sidecar.supports(filename):
+            data = Sidecar.read_sidecar(path, channels)
+            if data is None:
+                data = cls.parse(filename, content)
+                Sidecar.write_sidecar(path, data)
+                if channels and isinstance(data, dict) and isinstance(data.get('Channels'), dict):
+                    data['Channels'] = {name: dict(channel, Data=np.asarray(channel['Data'])) if 'Data' in channel
+                                        else channel for name, channel in data['Channels'].items() if name in channels}
+            return data
+
         file_extension = os.path.splitext(filename)[1][1:].lower()
-        content = BytesIO(content)
+
+        if file_extension == 'json' and channels:
+            return cls.load_json_channels(filename, content, channels)
 
         if file_extension == 'json':
             return cls.load_json_file(filename, content)
@@ -30,32 +151,78 @@ class SimulationOutputParser:
 
     @classmethod
     def load_json_file(cls, filename, content):
+        if isinstance(content, (bytes, bytearray)):
+            return json.loads(content)
+
+        if isinstance(content, BytesIO):
+            return json.loads(content.getvalue())
+
+        # json only accepts bytes -> decode the other buffers (mmap, memoryview) directly
+        if isinstance(content, (memoryview, mmap.mmap)):
+            return json.loads(str(content, 'utf-8'))
+
         return json.load(content)
 
+    @classmethod
+    def load_json_channels(cls, filename, content, channels):
+        """
+        Decode only the requested channels of a report. The other channels are skipped without being decoded.
+        The Data of the loaded channels is returned as numpy arrays.
+        """
+        if isinstance(content, BytesIO):
+            content = content.getbuffer()
+
+        channels = set(channels)
+        data = {}
+        for key, start, end in iter_json_members(content):
+            if key != 'Channels':
+                data[key] = json.loads(bytes(content[start:end]))
+                continue
+
+            data[key] = {}
+            for channel, channel_start, channel_end in iter_json_members(content, start):
+                if channel not in channels:
+                    continue
+                data[key][channel] = json.loads(bytes(content[channel_start:channel_end]))
+                if 'Data' in data[key][channel]:
+                    data[key][channel]['Data'] = np.asarray(data[key][channel]['Data'])
+
+        return data
+
     @classmethod
     def load_raw_file(self, filename, content):
-        return content
+        return content if hasattr(content, 'read') else BytesIO(content)
 
     @classmethod
     def load_csv_file(cls, filename, content):
-        if not isinstance(content, StringIO) and not isinstance(content, BytesIO):
+        if isinstance(content, str):
             content = StringIO(content)
+        elif not hasattr(content, 'read'):
+            content = BytesIO(content)
 
         csv_read = pd.read_csv(content, skipinitialspace=True)
         return csv_read
 
     @classmethod
     def load_xlsx_file(cls, filename, content):
+        if not hasattr(content, 'read'):
+            content = BytesIO(content)
+
         excel_file = pd.ExcelFile(content)
         return {sheet_name: excel_file.parse(sheet_name)
                                    for sheet_name in excel_file.sheet_names}
 
     @classmethod
     def load_txt_file(cls, filename, content):
-        return str(content.getvalue().decode())
+        if hasattr(content, 'getvalue'):
+            content = content.getvalue()
+        return str(content, 'utf-8')
 
     @classmethod
     def load_bin_file(cls, filename, content):
         from dtk.tools.output.SpatialOutput import SpatialOutput
-        so = SpatialOutput.from_bytes(content.read(), 'Filtered' in filename)
+        # SpatialOutput reads the buffer directly, without an intermediate bytes copy
+        if isinstance(content, BytesIO):
+            content = content.getbuffer()
+        so = SpatialOutput.from_bytes(content, 'Filtered' in filename)
         return so.to_dict()
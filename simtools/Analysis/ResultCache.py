@@ -0,0 +1,163 @@
+import hashlib
+import inspect
+import json
+import os
+
+from simtools.Utilities.Encoding import GeneralEncoder
+from simtools.Utilities.General import init_logging
+
+logger = init_logging('ResultCache')
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+DEFAULT_DIRECTORY = os.path.join(current_dir, '..', 'DataAccess', 'cache', 'analysis')
+DEFAULT_SIZE_LIMIT = 2048   # In MB
+
+# Attributes of an analyzer that do not influence what select_simulation_data() returns
+VOLATILE_ATTRIBUTES = ('results', 'working_dir', 'uid', 'reduced')
+
+MISS = object()
+
+
+class FingerprintEncoder(GeneralEncoder):
+    """
+    Encoder giving a stable representation of the analyzer parameters.
+    Functions are represented by their source and pandas objects by their full content.
+    """
+    def default(self, obj):
+        if callable(obj):
+            return describe_code(obj)
+        if hasattr(obj, 'to_json'):
+            return obj.to_json()
+        return super(FingerprintEncoder, self).default(obj)
+
+
+def describe_code(obj):
+    """
+    Returns a string representing the code of a function or a class.
+    Falls back to the qualified name if the source is not available.
+    """
+    name = "{}.{}".format(getattr(obj, '__module__', ''), getattr(obj, '__qualname__', type(obj).__name__))
+    try:
+        return name + inspect.getsource(obj)
+    except (TypeError, OSError):
+        return name
+
+
+class AnalysisResultCache:
+    """
+    Persistent on-disk store for the data returned by the analyzers select_simulation_data().
+
+    Each entry is keyed by:
+     - the simulation id
+     - the analyzer uid
+     - a fingerprint of the analyzer code and parameters
+     - the requested filenames (with their size and modification time for local simulations)
+
+    Changing an analyzer (code or parameters) or re-running a local simulation therefore invalidates its entries.
+    The store is bounded in size and evicts the least recently used entries.
+    Analyzers with side effects in select_simulation_data() should set cache_results to False.
+    """
+    def __init__(self, directory=None, size_limit=None):
+        """
+        :param directory: Where to store the results
+        :param size_limit: Maximum size of the store in MB
+        """
+        from diskcache import Cache
+        self.directory = os.path.abspath(directory or DEFAULT_DIRECTORY)
+        self.size_limit = int(size_limit or DEFAULT_SIZE_LIMIT)
+        self.cache = Cache(self.directory, size_limit=self.size_limit * 1024 ** 2,
+                           eviction_policy='least-recently-used')
+        self.fingerprints = {}
+
+    @staticmethod
+    def fingerprint(analyzer):
+        """
+        Hash the code of the analyzer class hierarchy along with its parameters.
+        :param analyzer: The analyzer to fingerprint
+        :return: hex digest
+        """
+        code = [describe_code(cls) for cls in type(analyzer).__mro__ if cls is not object]
+        parameters = {k: v for k, v in vars(analyzer).items() if k not in VOLATILE_ATTRIBUTES}
+        try:
+            parameters = json.dumps(parameters, cls=FingerprintEncoder, sort_keys=True)
+        except (TypeError, ValueError):
+            parameters = repr(sorted(parameters.items()))
+
+        return hashlib.sha256("".join(code + [parameters]).encode('utf-8')).hexdigest()
+
+    def register(self, analyzers):
+        """
+        Compute the fingerprints of the analyzers.
+        Needs to be called on the main process before handing the cache to the workers.
+        """
+        self.fingerprints = {a.uid: self.fingerprint(a) for a in analyzers if a.cache_results}
+
+    @staticmethod
+    def files_signature(simulation, filenames):
+        """
+        Identify the content of the files without reading them.
+        HPC simulation outputs do not change once succeeded, for local ones use the size and modification time.
+        """
+        filenames = sorted(filenames)
+        if simulation.experiment.location == "HPC":
+            return filenames
+
+        signature = []
+        for filename in filenames:
+            stat = os.stat(os.path.join(simulation.get_path(), filename))
+            signature.append((filename, stat.st_size, stat.st_mtime_ns))
+        return signature
+
+    def key(self, simulation, analyzer):
+        if analyzer.uid not in self.fingerprints:
+            return None
+
+        try:
+            files = self.files_signature(simulation, analyzer.filenames)
+        except OSError:
+            return None
+
+        content = json.dumps([simulation.id, analyzer.uid, self.fingerprints[analyzer.uid], files])
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def get(self, simulation, analyzer):
+        """
+        :return: The stored selected data or MISS if not present
+        """
+        key = self.key(simulation, analyzer)
+        if key is None:
+            return MISS
+        return self.cache.get(key, default=MISS)
+
+    def contains(self, simulation, analyzer):
+        """
+        Whether data is stored for this simulation and analyzer, without loading it
+        """
+        key = self.key(simulation, analyzer)
+        return key is not None and key in self.cache
+
+    def set(self, simulation, analyzer, data):
+        key = self.key(simulation, analyzer)
+        if key is None:
+            return
+
+        try:
+            self.cache.set(key, data)
+        except Exception as e:
+            logger.debug("Could not store the results of {} for simulation {}: {}".format(analyzer.uid, simulation.id, e))
+
+    def clear(self):
+        self.cache.clear()
+
+    def close(self):
+        self.cache.close()
+
+    def __len__(self):
+        return len(self.cache)
+
+    @property
+    def volume(self):
+        """
+        Size of the store on disk in bytes
+        """
+        return self.cache.volume()
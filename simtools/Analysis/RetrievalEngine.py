@@ -0,0 +1,68 @@
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from simtools.Utilities.COMPSCache import COMPSCache
+from simtools.Utilities.COMPSFileCache import COMPSFileCache
+from simtools.Utilities.COMPSUtilities import COMPS_login, get_asset_files_for_simulation_id
+from simtools.Utilities.General import init_logging
+
+logger = init_logging('RetrievalEngine')
+
+DOWNLOAD_THREADS = 16   # Default number of concurrent downloads
+
+
+class RetrievalEngine:
+    """
+    Download the files of HPC simulations into the COMPSFileCache with a bounded pool of I/O threads.
+
+    Runs on the main process where the COMPSCache already holds the experiments metadata, separately from the
+    processes parsing the files. Once the files of a simulation are downloaded, the callback hands the simulation to
+    the analysis pool which then reads them from the local cache: the network latency is overlapped with the parsing
+    instead of being serialized in each worker.
+    """
+    def __init__(self, analyzers, result_cache=None, max_workers=DOWNLOAD_THREADS):
+        self.analyzers = analyzers
+        self.result_cache = result_cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.endpoints = set()
+
+    def needed_files(self, simulation):
+        """
+        The files the analyzers will ask for this simulation (ignoring the results already in the result cache)
+        """
+        analyzers = [a for a in self.analyzers if a.filter(simulation)]
+        if self.result_cache is not None:
+            analyzers = [a for a in analyzers if not self.result_cache.contains(simulation, a)]
+        return set(itertools.chain(*(a.filenames for a in analyzers)))
+
+    def prefetch(self, simulation, filenames):
+        try:
+            COMPS_simulation = COMPSCache.simulation(simulation.id)
+            assets = [path for path in filenames if path.lower().startswith("assets")]
+            transient = [path for path in filenames if not path.lower().startswith("assets")]
+            if transient:
+                COMPSFileCache.retrieve_output_files(COMPS_simulation, transient)
+            if assets:
+                get_asset_files_for_simulation_id(simulation.id, paths=assets, remove_prefix='Assets')
+        except Exception as e:
+            # The analysis process will try again and report the error
+            logger.debug("Could not prefetch the files of simulation {}: {}".format(simulation.id, e))
+
+    def submit(self, simulation, callback):
+        """
+        Download the files of the simulation in the background then call callback(simulation).
+        """
+        filenames = self.needed_files(simulation)
+        if not filenames:
+            callback(simulation)
+            return
+
+        if simulation.experiment.endpoint not in self.endpoints:
+            COMPS_login(simulation.experiment.endpoint)
+            self.endpoints.add(simulation.experiment.endpoint)
+
+        future = self.executor.submit(self.prefetch, simulation, filenames)
+        future.add_done_callback(lambda _: callback(simulation))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
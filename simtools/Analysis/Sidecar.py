@@ -0,0 +1,152 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from simtools.Utilities.General import init_logging
+
+logger = init_logging('Sidecar')
+
+SIDECAR_EXTENSION = '.npz'
+SIDECAR_VERSION = 1
+ARRAY_KEY = "__sidecar_array__"     # Placeholder replacing the extracted arrays in the JSON document
+MIN_ARRAY_SIZE = 16                 # Smaller lists stay in the JSON document
+SUPPORTED_EXTENSIONS = ('json', 'csv')
+
+
+def sidecar_path(path):
+    return path + SIDECAR_EXTENSION
+
+
+def source_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def supports(filename):
+    return os.path.splitext(filename)[1][1:].lower() in SUPPORTED_EXTENSIONS
+
+
+def extract_arrays(document, arrays):
+    """
+    Replace the numeric lists of a JSON document by placeholders and collect them as numpy arrays
+    :param document: The decoded JSON document
+    :param arrays: List receiving the extracted arrays
+    :return: The document with the placeholders
+    """
+    if isinstance(document, dict):
+        return {key: extract_arrays(value, arrays) for key, value in document.items()}
+
+    if isinstance(document, list):
+        if len(document) >= MIN_ARRAY_SIZE:
+            try:
+                array = np.asarray(document)
+            except ValueError:
+                array = None    # Ragged lists
+            if array is not None and array.dtype.kind in 'biuf':
+                arrays.append(array)
+                return {ARRAY_KEY: len(arrays) - 1}
+        return [extract_arrays(value, arrays) for value in document]
+
+    return document
+
+
+def restore_arrays(document, npz, as_list=True):
+    """
+    Inverse of extract_arrays: put back the arrays in the document
+    :param as_list: Restore the arrays as lists (like json would return them) or leave them as numpy arrays
+    """
+    if isinstance(document, dict):
+        if ARRAY_KEY in document and len(document) == 1:
+            array = npz['array_{}'.format(document[ARRAY_KEY])]
+            return array.tolist() if as_list else array
+        return {key: restore_arrays(value, npz, as_list) for key, value in document.items()}
+
+    if isinstance(document, list):
+        return [restore_arrays(value, npz, as_list) for value in document]
+
+    return document
+
+
+def write_sidecar(path, data):
+    """
+    Store the parsed content of a file in a columnar .npz next to it.
+    Supports the JSON documents (numeric lists stored as arrays) and the DataFrames read from CSV.
+    Nothing is written if the data cannot be represented without pickling.
+    :param path: Path of the source file on disk
+    :param data: The parsed content
+    """
+    meta = {"version": SIDECAR_VERSION, "source": source_stamp(path)}
+    arrays = []
+
+    if isinstance(data, pd.DataFrame):
+        if not isinstance(data.index, pd.RangeIndex):
+            return
+        meta["columns"] = [str(column) for column in data.columns]
+        meta["dtypes"] = [str(dtype) for dtype in data.dtypes]
+        for column in data.columns:
+            values = np.asarray(data[column])
+            if values.dtype.kind == 'O':
+                # Only pure string columns can be stored without pickling
+                if not all(isinstance(v, str) for v in values):
+                    return
+                values = values.astype(str)
+            elif values.dtype.kind not in 'biuf':
+                return
+            arrays.append(values)
+    elif isinstance(data, (dict, list)):
+        meta["document"] = extract_arrays(data, arrays)
+    else:
+        return
+
+    members = {'array_{}'.format(i): array for i, array in enumerate(arrays)}
+    members['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+
+    # Write in a temporary file first so that a concurrent reader never sees a partial sidecar
+    temporary = "{}.{}.tmp".format(sidecar_path(path), os.getpid())
+    try:
+        with open(temporary, 'wb') as sidecar_file:
+            np.savez(sidecar_file, **members)
+        os.replace(temporary, sidecar_path(path))
+    except OSError as e:
+        logger.debug("Could not write the sidecar of {}: {}".format(path, e))
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def read_sidecar(path, channels=None):
+    """
+    Load the parsed content of a file from its sidecar.
+    :param path: Path of the source file on disk
+    :param channels: For the reports with a Channels section, only load these channels (as numpy arrays)
+    :return: The parsed content or None if there is no sidecar or if it is outdated
+    """
+    try:
+        npz = np.load(sidecar_path(path), allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+
+    with npz:
+        meta = json.loads(npz['meta'].tobytes().decode('utf-8'))
+        if meta.get("version") != SIDECAR_VERSION or meta.get("source") != source_stamp(path):
+            return None
+
+        if "columns" in meta:
+            columns = {}
+            for i, (column, dtype) in enumerate(zip(meta["columns"], meta["dtypes"])):
+                values = npz['array_{}'.format(i)]
+                columns[column] = pd.Series(values.astype(object)).astype(dtype) if values.dtype.kind == 'U' else values
+            return pd.DataFrame(columns, columns=meta["columns"])
+
+        document = meta["document"]
+        if not channels or not isinstance(document, dict) or not isinstance(document.get("Channels"), dict):
+            return restore_arrays(document, npz)
+
+        selected = {name: channel for name, channel in document.pop("Channels").items() if name in channels}
+        document = restore_arrays(document, npz)
+        document["Channels"] = {name: restore_arrays(channel, npz, as_list=False) for name, channel in selected.items()}
+        for channel in document["Channels"].values():
+            if 'Data' in channel:
+                channel['Data'] = np.asarray(channel['Data'])
+        return document
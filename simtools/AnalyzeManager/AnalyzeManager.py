@@ -26,6 +26,9 @@ class AnalyzeManager:
         self.parsers = []
         self.analyzers = []
         self.experiments_simulations = {}
+        self.started_parsers = {}
+        self.waiting_parsers = collections.deque()  # Parsers created by parse_simulations() waiting for a thread
+        self.prepared_experiments = {}
 
         self.verbose = verbose
         self.force_analyze = force_analyze
@@ -82,13 +85,17 @@ class AnalyzeManager:
 
         self.analyzers.append(analyzer)
 
-    def create_parsers_for_experiment(self, experiment):
+    def prepare_experiment(self, experiment):
+        """
+        Get the manager of the experiment, set up its output retrieval and call the analyzers
+        per experiment function. Done once per experiment.
+        """
+        if experiment.exp_id in self.prepared_experiments:
+            return self.prepared_experiments[experiment.exp_id]
+
         # Create a manager for the current experiment
         exp_manager = ExperimentManagerFactory.from_experiment(experiment)
 
-        # Refresh the experiment just to be sure to have latest info
-        exp_manager.refresh_experiment()
-
         if exp_manager.location == 'HPC':
             # Get the sim map no matter what
             if self.create_dir_map:
@@ -104,6 +111,15 @@ class AnalyzeManager:
         for analyzer in self.analyzers:
             analyzer.per_experiment(experiment)
 
+        self.prepared_experiments[experiment.exp_id] = exp_manager
+        return exp_manager
+
+    def create_parsers_for_experiment(self, experiment):
+        exp_manager = self.prepare_experiment(experiment)
+
+        # Refresh the experiment just to be sure to have latest info
+        exp_manager.refresh_experiment()
+
         # Create the thread pool to create the parsers
         p = ThreadPool()
 
@@ -115,6 +131,9 @@ class AnalyzeManager:
         else:
             simulations = exp_manager.experiment.simulations
 
+        # The simulations given to parse_simulations() are already being parsed
+        simulations = [s for s in simulations if s.id not in self.started_parsers]
+
         results = [p.apply_async(self.parser_for_simulation, args=(s, experiment, exp_manager)) for s in simulations]
 
         p.close()
@@ -157,6 +176,47 @@ class AnalyzeManager:
             from simtools.OutputParser import SimulationOutputParser
             return SimulationOutputParser(simulation, filtered_analyses, self.maxThreadSemaphore, self.parse)
 
+    def parse_simulations(self, simulations):
+        """
+        Start parsing the given simulations right away, for example as soon as they succeed while the rest of
+        their experiment is still running. analyze() waits for these parsers instead of parsing the simulations again.
+        Never blocks: the parsers exceeding max_threads wait for a free thread and are started by the next calls.
+        Only the old-style analyzers are parsed right away, the new BaseAnalyzers are only analyzed by analyze().
+        """
+        from simtools.Analysis.BaseAnalyzers.BaseAnalyzer import BaseAnalyzer
+        simulations = [s for s in simulations if s.id not in self.started_parsers]
+
+        # The new analyzers are handled by the new AnalyzeManager at analyze() time
+        if self.analyzers and isinstance(self.analyzers[0], BaseAnalyzer):
+            if simulations and not self.started_parsers:
+                logger.warning("The simulations are only analyzed once all of them are done: parsing them as they "
+                               "complete requires analyzers deriving from dtk.utils.analyzers.BaseAnalyzer")
+            for simulation in simulations:
+                self.started_parsers[simulation.id] = None
+                self.add_simulation(simulation)
+            return
+
+        self.parse = any([a.parse for a in self.analyzers if hasattr(a, 'parse')])
+
+        for simulation in simulations:
+            experiment = simulation.experiment
+            parser = self.parser_for_simulation(simulation, experiment, self.prepare_experiment(experiment))
+            self.started_parsers[simulation.id] = parser
+            if parser:
+                self.waiting_parsers.append(parser)
+
+        self.start_waiting_parsers(block=False)
+
+    def start_waiting_parsers(self, block=True):
+        """
+        Start the waiting parsers as threads become available.
+        :param block: Wait for a thread for each parser. If False, only start the parsers for which a thread is free.
+        """
+        while self.waiting_parsers:
+            if not self.maxThreadSemaphore.acquire(block):
+                return
+            self.waiting_parsers.popleft().start()
+
     def analyze(self):
         # If no analyzers -> quit
         if len(self.analyzers) == 0:
@@ -173,8 +233,9 @@ class AnalyzeManager:
         # print("Please update your analyzers to use the new simtools.Analysis.BaseAnalyzers.BaseAnalyzer")
         # print("Also use the new AnalyzeManager found at simtools.Analysis.AnalyzeManager")
 
-        # Empty the parsers
-        self.parsers = []
+        # Empty the parsers, keeping the ones started by parse_simulations()
+        self.parsers = list(filter(None, self.started_parsers.values()))
+        started = len(self.parsers)
 
         # If all the analyzers present call for deactivating the parsing -> do it
         self.parse = any([a.parse for a in self.analyzers if hasattr(a, 'parse')])
@@ -190,9 +251,9 @@ class AnalyzeManager:
         if len(self.parsers) == 0 and self.verbose:
             print("No experiments/simulations for analysis.")
 
-        for parser in self.parsers:
-            self.maxThreadSemaphore.acquire()
-            parser.start()
+        # Start the new parsers after the ones still waiting from parse_simulations()
+        self.waiting_parsers.extend(self.parsers[started:])
+        self.start_waiting_parsers()
 
         # We are all done, finish analyzing
         for parser in self.parsers:
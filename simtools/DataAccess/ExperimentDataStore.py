@@ -81,6 +81,22 @@ class ExperimentDataStore:
             session.expunge_all()
         return experiments
 
+    @classmethod
+    def get_active_experiment_ids(cls, location=None):
+        """
+        Lightweight version of get_active_experiments only returning the ids (no simulations loaded)
+        """
+        logger.debug("Get active experiment ids")
+        with session_scope() as session:
+            exp_ids = session.query(Simulation.experiment_id).distinct() \
+                .filter(~Simulation.status_s.in_((SimulationState.Succeeded.name, SimulationState.Failed.name, SimulationState.Canceled.name)))
+            if location:
+                exp_ids = exp_ids.join(Experiment, Experiment.exp_id == Simulation.experiment_id)\
+                    .filter(Experiment.location == location)
+
+            exp_ids = [exp_id for exp_id, in exp_ids.all()]
+        return exp_ids
+
     @classmethod
     def get_experiments(cls, id_or_name=None, current_dir=None):
         logger.debug("Get experiments")
@@ -4,7 +4,6 @@ from simtools.DataAccess import session_scope
 from simtools.DataAccess.Schema import Simulation
 from sqlalchemy import and_
 from sqlalchemy import bindparam
-from sqlalchemy import not_
 from sqlalchemy import update
 
 from simtools.Utilities.General import init_logging
@@ -27,16 +26,29 @@ class SimulationDataStore:
             {'sid':'simid', "status": 'simstatus'},
             {'sid':'simid', "status": 'simstatus'}
         ]
+        The status can be a SimulationState or its name. The message and pid can also be updated by adding the
+        'message' and 'pid' keys to all the elements of the batch.
+        Simulations already in a final state (Succeeded, Failed, Canceled) are not updated.
 
         Args:
             batch: Batch of simulations to save
         """
         if len(simulation_batch) == 0: return
 
+        values = {'status_s': bindparam("status")}
+        for column in ('message', 'pid'):
+            if all(column in sim for sim in simulation_batch):
+                values[column] = bindparam(column)
+
+        simulation_batch = [dict(sim, status=sim['status'].name if isinstance(sim['status'], SimulationState) else sim['status'])
+                            for sim in simulation_batch]
+
+        # Core statement on the table -> executed as a single executemany
+        table = Simulation.__table__
         with session_scope() as session:
-            stmt = update(Simulation).where(and_(Simulation.id == bindparam("sid"),
-                                                 not_(Simulation.status in (SimulationState.Succeeded, SimulationState.Failed, SimulationState.Canceled))))\
-                .values(status_s=bindparam("status"))
+            stmt = update(table).where(and_(table.c.id == bindparam("sid"),
+                                            *(table.c.status_s != state.name for state in (SimulationState.Succeeded, SimulationState.Failed, SimulationState.Canceled))))\
+                .values(**values)
             session.execute(stmt, simulation_batch)
 
     @classmethod
@@ -51,9 +63,24 @@ class SimulationDataStore:
         from simtools.DataAccess.DataStore import batch
         for ids in batch(simids, 50):
             with session_scope() as session:
-                states = session.query(Simulation.id, Simulation.status).filter(Simulation.id.in_(ids)).all()
+                states = session.query(Simulation.id, Simulation.status_s).filter(Simulation.id.in_(ids)).all()
                 session.expunge_all()
-            states_ret.extend(states)
+            states_ret.extend((sid, SimulationState[status]) for sid, status in states)
+        return states_ret
+
+    @classmethod
+    def get_simulation_runtime_states(cls, simids):
+        """
+        Get the state and pid of the given simulations without loading the whole objects.
+        :return: Dictionary associating simulation id with (SimulationState, pid)
+        """
+        logger.debug("Get simulation runtime states")
+        states_ret = {}
+        from simtools.DataAccess.DataStore import batch
+        for ids in batch(simids, 50):
+            with session_scope() as session:
+                states = session.query(Simulation.id, Simulation.status_s, Simulation.pid).filter(Simulation.id.in_(ids)).all()
+            states_ret.update({sid: (SimulationState[status], pid) for sid, status, pid in states})
         return states_ret
 
     @classmethod
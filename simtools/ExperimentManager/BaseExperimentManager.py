@@ -43,6 +43,7 @@ class BaseExperimentManager(CacheEnabled):
         self.experiment_tags = {}
         self.asset_service = None
         self.assets = None
+        self.new_runners = []   # Runner processes started since the last pop_runners()
         self.cache = self.initialize_cache(queue=True)
 
     @abstractmethod
@@ -116,6 +117,25 @@ class BaseExperimentManager(CacheEnabled):
             # Save the pid in the settings
             DataStore.save_setting(DataStore.create_setting(key='overseer_pid', value=str(p.pid)))
 
+    @staticmethod
+    def notify_overseer(exp_id):
+        """
+        Tell the Overseer that the experiment has new simulations to commission so it does not wait for its next scan.
+        The Overseer address is stored in the settings when it starts. Failures are ignored as the Overseer will find
+        the experiment during its periodic scan anyway.
+        """
+        setting = DataStore.get_setting('overseer_address')
+        if not setting:
+            return
+
+        from multiprocessing.connection import Client
+        try:
+            host, port, authkey = setting.value.split(':')
+            with Client((host, int(port)), authkey=bytes.fromhex(authkey)) as connection:
+                connection.send_bytes(exp_id.encode('utf-8'))
+        except Exception as e:
+            logger.debug("Could not notify the Overseer of experiment %s: %s" % (exp_id, e))
+
     def get_simulation_status(self):
         """
         Query the status of simulations in the currently managed experiment.
@@ -161,8 +181,9 @@ class BaseExperimentManager(CacheEnabled):
         # Create the simulations
         self.create_simulations(exp_name=exp_name, exp_builder=exp_builder, suite_id=suite_id, verbose=not quiet)
 
-        # Make sure overseer is running
+        # Make sure overseer is running and aware of the new experiment
         self.check_overseer()
+        self.notify_overseer(self.experiment.exp_id)
 
         if blocking:
             self.wait_for_finished(verbose=not quiet)
@@ -274,6 +295,20 @@ class BaseExperimentManager(CacheEnabled):
         # Refresh the experiment
         self.experiment = DataStore.get_experiment(self.experiment.exp_id)
 
+    def refresh_simulations(self):
+        """
+        Refresh the status of the simulations on behalf of the Overseer.
+        Reloads the whole experiment by default, managers can do it incrementally.
+        """
+        self.experiment = DataStore.get_experiment(self.experiment.exp_id)
+
+    def pop_runners(self):
+        """
+        Returns the runner processes started since the last call, for the Overseer to wait on their exit.
+        """
+        runners, self.new_runners = self.new_runners, []
+        return runners
+
     def print_status(self, states=None, msgs=None, verbose=True):
         if not states:
             states, msgs = self.get_simulation_status()
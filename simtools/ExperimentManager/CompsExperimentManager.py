@@ -124,6 +124,7 @@ class CompsExperimentManager(BaseExperimentManager):
             self.runner_thread = Process(target=COMPSSimulationRunner, args=(self.experiment, self.comps_experiment))
             self.runner_thread.daemon = True
             self.runner_thread.start()
+            self.new_runners.append(self.runner_thread)
             return len(self.experiment.simulations)
         else:
             return 0
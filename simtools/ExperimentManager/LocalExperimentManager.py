@@ -1,4 +1,3 @@
-from multiprocessing import Process
 
 from simtools.Utilities.General import init_logging
 
@@ -9,10 +8,9 @@ import re
 import shutil
 import signal
 from datetime import datetime
+from simtools.DataAccess.DataStore import DataStore
 from simtools.ExperimentManager.BaseExperimentManager import BaseExperimentManager
 from simtools.SimulationCreator.LocalSimulationCreator import LocalSimulationCreator
-from simtools.SimulationRunner.LocalRunner import LocalSimulationRunner
-from simtools.Utilities.General import is_running
 
 from COMPS.Data.Simulation import SimulationState
 
@@ -35,13 +33,13 @@ class LocalExperimentManager(BaseExperimentManager):
         self._experiment = experiment
         if experiment:
             if hasattr(experiment, 'simulations'):
-                for sim in experiment.simulations:
-                    if sim.status not in [SimulationState.Failed, SimulationState.Succeeded, SimulationState.Canceled]:
-                        if sim.id not in self.unfinished_simulations:
-                            self.unfinished_simulations[sim.id] = sim
+                # Track the new objects so that refresh_simulations() updates the simulations of this experiment
+                self.unfinished_simulations = {
+                    sim.id: sim for sim in experiment.simulations
+                    if sim.status not in [SimulationState.Failed, SimulationState.Succeeded, SimulationState.Canceled]}
 
     def __init__(self, experiment, config_builder):
-        self.local_queue = None
+        self.supervisor = None
         self.simulations_commissioned = 0
         self.unfinished_simulations = {}
         self._experiment = None
@@ -51,45 +49,62 @@ class LocalExperimentManager(BaseExperimentManager):
 
     def commission_simulations(self):
         """
-         Commissions all simulations that need to (and can be) commissioned.
-        :param states: a multiprocessing.Queue for simulations to use to update their status.
+        Commissions all simulations that need to (and can be) commissioned.
+        The simulations are run by the LocalSimulationSupervisor shared with the Overseer.
         :return: The number of simulations commissioned.
         """
         to_commission = self.needs_commissioning()
         commissioned = []
         for simulation in to_commission:
-            if self.local_queue.full():
-                break
+            if simulation.status == SimulationState.Running:
+                # Started by a previous Overseer, just follow it
+                self.supervisor.adopt(simulation, self.experiment)
+            elif self.supervisor.full():
+                # Keep going: the simulations still running need to be followed even without free slots
+                continue
             else:
                 logger.debug("Commissioning simulation: %s, its status was: %s" % (simulation.id, simulation.status.name))
-                t1 = Process(target=LocalSimulationRunner,
-                             args=(simulation, self.experiment, self.local_queue))
-                t1.daemon = True
-                t1.start()
-                self.local_queue.put('run 1')
+                self.supervisor.run(simulation, self.experiment)
                 commissioned.append(simulation)
         return len(commissioned)
 
     def needs_commissioning(self):
         """
-        Determines which simulations need to be (re)started.
+        Determines which simulations need to be started or followed by the supervisor.
         :return: A list of Simulation objects
         """
         simulations = []
         # get the latest status information for all potentially unfinished simulations first
         if not len(self.unfinished_simulations) == 0:
             logger.debug("There are %d unfinished_simulation_ids to check." % len(self.unfinished_simulations))
-            for sim in self.unfinished_simulations.values():
-                if sim.status == SimulationState.Created or\
-                        (sim.status == SimulationState.Running and not is_running(sim.pid, name_part=self.experiment.exe_name)):
-                    logger.debug("Detected sim potentially in need of commissioning. sim id: %s sim status: %s sim pid: %s is_running? %s" %
-                                 (sim.id, sim.status, sim.pid, is_running(sim.pid, name_part=self.experiment.exe_name)))
+            for sim in list(self.unfinished_simulations.values()):
+                if sim.status in [SimulationState.Created, SimulationState.Running] and not self.supervisor.supervises(sim.id):
+                    logger.debug("Detected sim potentially in need of commissioning. sim id: %s sim status: %s sim pid: %s" %
+                                 (sim.id, sim.status, sim.pid))
                     simulations.append(sim)
                 elif sim.status in [SimulationState.Failed, SimulationState.Succeeded, SimulationState.Canceled]:
                     del self.unfinished_simulations[sim.id]
                     logger.debug("Choosing to NOT relaunch a sim: id: %s status: %s" % (sim.id, sim.status))
         return simulations
 
+    def refresh_simulations(self):
+        """
+        Only query the state of the unfinished simulations (the others cannot change anymore) and update them in place.
+        Falls back to reloading the whole experiment if some simulations disappeared.
+        """
+        if not self.unfinished_simulations:
+            return
+
+        states = DataStore.get_simulation_runtime_states(list(self.unfinished_simulations.keys()))
+        if len(states) != len(self.unfinished_simulations):
+            self.experiment = DataStore.get_experiment(self.experiment.exp_id)
+            return
+
+        for sim_id, (state, pid) in states.items():
+            simulation = self.unfinished_simulations[sim_id]
+            simulation.status = state
+            simulation.pid = pid
+
     def create_experiment(self, experiment_name, experiment_id=None, suite_id=None):
         experiment_name = self.clean_experiment_name(experiment_name)
 
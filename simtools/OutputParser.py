@@ -9,6 +9,7 @@ import pandas as pd  # for reading csv files
 from simtools.Utilities.COMPSUtilities import workdirs_from_experiment_id, get_simulation_by_id, \
     get_asset_files_for_simulation_id
 from simtools.Utilities.COMPSUtilities import workdirs_from_suite_id
+from simtools.Utilities.COMPSFileCache import COMPSFileCache
 
 logging.basicConfig(level=logging.DEBUG, format='(%(threadName)-10s) %(message)s')
 
@@ -74,6 +75,12 @@ class SimulationOutputParser(threading.Thread):
     def load_single_file(self, filename, content=None):
         file_extension = os.path.splitext(filename)[1][1:].lower()
 
+        if content is None and self.parse and file_extension == 'bin' and 'SpatialReport' in filename:
+            # Memory-map the spatial reports instead of reading them
+            from dtk.tools.output.SpatialOutput import SpatialOutput
+            self.raw_data[filename] = SpatialOutput.from_file(self.get_path(filename), 'Filtered' in filename).to_dict()
+            return
+
         if content is not None:
             content = BytesIO(content)
         else:
@@ -123,7 +130,7 @@ class SimulationOutputParser(threading.Thread):
     def load_bin_file(self, filename, content):
         from dtk.tools.output.SpatialOutput import SpatialOutput
         if isinstance(content, BytesIO):
-            so = SpatialOutput.from_bytes(content.read(), 'Filtered' in filename)
+            so = SpatialOutput.from_bytes(content.getbuffer(), 'Filtered' in filename)
         else:
             so = SpatialOutput.from_bytes(content, 'Filtered' in filename)
         self.raw_data[filename] = so.to_dict()
@@ -171,7 +178,7 @@ class CompsDTKOutputParser(SimulationOutputParser):
 
         if transient:
             try:
-                byte_arrays.update(dict(zip(transient, self.COMPS_simulation.retrieve_output_files(paths=transient))))
+                byte_arrays.update(dict(zip(transient, COMPSFileCache.retrieve_output_files(self.COMPS_simulation, transient))))
             except Exception as e:
                 print("Could not retrieve requested file(s) for simulation {} - Requested files: {}. Parser exiting..."
                       .format(self.sim_id, transient))
@@ -1,9 +1,12 @@
+import heapq
+import itertools
 import multiprocessing
 import os
+import queue
 import sys
-# Add the tools to the path
-from multiprocessing import Manager
+from multiprocessing.connection import Client, Listener, wait
 
+# Add the tools to the path
 sys.path.append(os.path.abspath('..'))
 import threading
 import time
@@ -14,10 +17,17 @@ from datetime import datetime
 from simtools.DataAccess.DataStore import DataStore
 from simtools.ExperimentManager.ExperimentManagerFactory import ExperimentManagerFactory
 from simtools.SetupParser import SetupParser
+from simtools.SimulationRunner.LocalRunner import LocalSimulationSupervisor
 from simtools.Utilities.General import init_logging
 
 logger = init_logging('Overseer')
 
+RESCAN_INTERVAL = 60    # Safety net: how often the database is scanned for active experiments not notified
+REFRESH_INTERVAL = 10   # How often the experiments without runner processes to wait on (HPC) are refreshed
+
+# Task priorities (lower runs first when several tasks are due)
+SUBMITTED, EXITED, REFRESH, RESCAN = range(4)
+
 
 def LogCleaner():
     # Get the last time a cleanup happened
@@ -29,88 +39,230 @@ def LogCleaner():
         DataStore.save_setting(DataStore.create_setting(key='last_log_cleanup', value=datetime.today()))
 
 
-if __name__ == "__main__":
+class Overseer:
+    """
+    Event-driven scheduler commissioning the simulations of the active experiments.
 
-    logger.debug('Start Overseer pid: %d' % os.getpid())
-    
-    # we technically don't care about full consistency of SetupParser with the original dtk command, as experiments
-    # have all been created. We can grab 'generic' max_local_sims / max_threads
-    SetupParser.init() # default block
-    max_local_sims = int(SetupParser.get('max_local_sims'))
+    Instead of reloading all the active experiments at a fixed interval, the Overseer sleeps until:
+     - a local simulation exits: the LocalSimulationSupervisor runs them as children and exposes their pid descriptors
+     - a runner process exits: the process table maps the process sentinels to their experiment
+     - an experiment is submitted: BaseExperimentManager.notify_overseer() connects to the Overseer listener
+     - a task of the priority queue is due (periodic refresh of the HPC experiments, rescan of the database)
+    and then only refreshes the experiments concerned. The local managers only query the state of their unfinished
+    simulations (see LocalExperimentManager.refresh_simulations).
+    """
+    def __init__(self, max_local_sims):
+        self.supervisor = LocalSimulationSupervisor(max_local_sims)
+        self.managers = OrderedDict()
+        self.processes = {}             # Process table: sentinel -> (experiment id, process)
+        self.tasks = []                 # Priority queue of (due time, priority, sequence, experiment id)
+        self.scheduled = {}             # experiment id -> (due time, priority) of its next task
+        self.sequence = itertools.count()
+        self.notifications = queue.Queue()
+        self.wake_receiver, self.wake_sender = multiprocessing.Pipe(duplex=False)
+        self.listener = None
+        self.listener_thread = None
+        self.authkey = None
+        self.stop_listening = threading.Event()
 
-    # Create the queue
-    local_queue = multiprocessing.Queue(max_local_sims)
+    def schedule(self, exp_id, priority, delay=None):
+        """
+        Schedule a refresh of the experiment (or a rescan of the database if exp_id is None).
+        An experiment has at most one pending task: the earliest wins.
+        :param delay: Seconds to wait before running the task. None to run it as soon as possible.
+        """
+        key = (0 if delay is None else time.time() + delay, priority)
+        if exp_id in self.scheduled and self.scheduled[exp_id] <= key:
+            return
+        self.scheduled[exp_id] = key
+        heapq.heappush(self.tasks, key + (next(self.sequence), exp_id))
 
-    managers = OrderedDict()
-
-    # Queue to be shared among all runners in order to update the individual simulation states in the DB
-    manager = Manager()
-
-    # Take this opportunity to cleanup the logs
-    lc = threading.Thread(target=LogCleaner)
-    lc.start()
+    def start_listener(self):
+        """
+        Listen for the experiment submissions and store our address in the settings for the clients to find us.
+        """
+        self.authkey = os.urandom(16)
+        self.listener = Listener(('localhost', 0), authkey=self.authkey)
+        self.stop_listening.clear()
+        host, port = self.listener.address
+        DataStore.save_setting(DataStore.create_setting(key='overseer_address',
+                                                        value='{}:{}:{}'.format(host, port, self.authkey.hex())))
 
-    count = 0
-
-    while True:
-        # Retrieve the active LOCAL experiments
-        active_experiments = DataStore.get_active_experiments()
-        logger.debug('Waiting loop pass number %d, pid %d' % (count, os.getpid()))
-        logger.debug('Active experiments')
-        logger.debug(active_experiments)
-        logger.debug('Managers')
-        logger.debug(managers.keys())
-
-        # Create all the managers
-        for experiment in active_experiments:
-            logger.debug("Looking for manager for experiment %s" % experiment.id)
-            if experiment.id not in managers:
-                logger.debug('Creating manager for experiment id: %s' % experiment.id)
-                manager = None
+        def listen():
+            while not self.stop_listening.is_set():
                 try:
-                    sys.path.append(experiment.working_directory)
-                    manager = ExperimentManagerFactory.from_experiment(experiment)
+                    with self.listener.accept() as connection:
+                        message = connection.recv_bytes().decode('utf-8')
+                    if self.stop_listening.is_set():
+                        break
+                    self.notifications.put(message)
+                    self.wake_sender.send_bytes(b'1')
                 except Exception as e:
-                    logger.debug('Exception in creation manager for experiment %s' % experiment.id)
-                    logger.debug(e)
-                    logger.debug(traceback.format_exc())
+                    logger.debug('Error while receiving a notification: %s' % e)
 
-                if manager:
-                    if manager.location == "LOCAL": manager.local_queue = local_queue
-                    managers[experiment.id] = manager
+        self.listener_thread = threading.Thread(target=listen, daemon=True)
+        self.listener_thread.start()
 
+    def stop_listener(self):
+        """
+        Clear our address from the settings and release the listening socket.
+        """
+        DataStore.save_setting(DataStore.create_setting(key='overseer_address', value=''))
+        if self.listener is None:
+            return
+
+        # The listening thread is blocked in accept(): connect once to let it see it has to stop
+        self.stop_listening.set()
+        try:
+            with Client(self.listener.address, authkey=self.authkey) as connection:
+                connection.send_bytes(b'')
+        except Exception as e:
+            logger.debug('Could not wake up the listener: %s' % e)
+        self.listener_thread.join(timeout=5)
+
+        self.listener.close()
+        self.listener = None
+        self.listener_thread = None
+
+    def rescan(self):
+        """
+        Look for the active experiments we do not manage yet (only queries their ids).
+        """
+        for exp_id in DataStore.get_active_experiment_ids():
+            if exp_id not in self.managers:
+                self.schedule(exp_id, SUBMITTED)
+        self.schedule(None, RESCAN, RESCAN_INTERVAL)
+
+    def create_manager(self, exp_id):
+        logger.debug('Creating manager for experiment id: %s' % exp_id)
+        experiment = DataStore.get_experiment(exp_id)
+        if not experiment:
+            return None
+
+        try:
+            sys.path.append(experiment.working_directory)
+            manager = ExperimentManagerFactory.from_experiment(experiment)
+        except Exception as e:
+            logger.debug('Exception in creation manager for experiment %s' % exp_id)
+            logger.debug(e)
+            logger.debug(traceback.format_exc())
+            return None
+
+        if manager.location == "LOCAL": manager.supervisor = self.supervisor
+        self.managers[exp_id] = manager
+        return manager
+
+    def process(self, exp_id, priority):
+        """
+        Refresh an experiment and commission its simulations as needed.
+        """
+        manager = self.managers.get(exp_id)
+        if not manager:
+            manager = self.create_manager(exp_id)
+            if not manager: return
+        elif priority == SUBMITTED:
+            # New simulations may have been added to the experiment -> full reload
+            manager.experiment = DataStore.get_experiment(exp_id)
+        else:
+            manager.refresh_simulations()
+
+        # Manager experiment is gone or done, we dont need it anymore
+        if not manager.experiment or manager.finished():
+            logger.debug('Manager for experiment id: %s is done' % exp_id)
+            del self.managers[exp_id]
+            return
+
+        logger.debug('Commission simulations as needed for experiment id: %s' % exp_id)
+        n_commissioned_sims = manager.commission_simulations()
+        logger.debug('Experiment done (re)commissioning %d simulation(s)' % n_commissioned_sims)
+
+        for runner in manager.pop_runners():
+            self.processes[runner.sentinel] = (exp_id, runner)
+
+        # Local experiments are refreshed when their runners exit, the others need to be polled
+        if manager.location == "LOCAL":
+            self.schedule(exp_id, REFRESH, RESCAN_INTERVAL)
+        else:
+            self.schedule(exp_id, REFRESH, REFRESH_INTERVAL)
+
+    def run_due_tasks(self):
+        while self.tasks and self.tasks[0][0] <= time.time():
+            due, priority, _, exp_id = heapq.heappop(self.tasks)
+
+            # Skip the tasks superseded by an earlier one
+            if self.scheduled.get(exp_id) != (due, priority):
+                continue
+            del self.scheduled[exp_id]
+
+            if exp_id is None:
+                self.rescan()
             else:
-                # Refresh the experiment
-                logger.debug("Found manager for experiment %s" % experiment.id)
-                managers[experiment.id].experiment = experiment
-
-        # Check every one of them
-        logger.debug("Checking experiment managers. There are %d of them. pid: %d" % (len(managers), os.getpid()))
-        managers_to_delete = []
-        for exp_id, manager in managers.items():
-            # Refresh the experiment first
-            manager.refresh_experiment()
-
-            # Manager experiment is gone, we dont need it anymore
-            if not manager.experiment:
-                managers_to_delete.append(exp_id)
-            elif manager.finished():
-                logger.debug('Manager for experiment id: %s is done' % exp_id)
-                managers_to_delete.append(exp_id)
-            else:
-                logger.debug('Commission simulations as needed for experiment id: %s' % exp_id)
-                n_commissioned_sims = manager.commission_simulations()
-                logger.debug('Experiment done (re)commissioning %d simulation(s)' % n_commissioned_sims)
+                self.process(exp_id, priority)
+
+    def handle_events(self, ready):
+        for event in ready:
+            if event is self.wake_receiver:
+                self.wake_receiver.recv_bytes()
+                while not self.notifications.empty():
+                    self.schedule(self.notifications.get(), SUBMITTED)
+                continue
+
+            # The local simulations are handled by the supervisor
+            if event not in self.processes:
+                continue
+
+            exp_id, runner = self.processes.pop(event)
+            runner.join()
+            logger.debug('Runner process %s of experiment %s exited' % (runner.pid, exp_id))
+            if exp_id in self.managers:
+                self.schedule(exp_id, EXITED)
+
+        # Reap the local simulations and save their status
+        if self.supervisor.monitor():
+            # Slots are now free -> every local experiment may have something to commission
+            for manager_id, manager in self.managers.items():
+                if manager.location == "LOCAL":
+                    self.schedule(manager_id, EXITED)
+
+    def run(self):
+        self.start_listener()
+        self.schedule(None, RESCAN)
+
+        try:
+            while True:
+                self.run_due_tasks()
+
+                # No more active managers and runners -> Exit
+                if not any((self.managers, self.processes, self.supervisor.children)) and self.notifications.empty():
+                    break
+
+                timeout = max(self.tasks[0][0] - time.time(), 0) if self.tasks else RESCAN_INTERVAL
+                # Also wake up regularly to follow the status of the running simulations
+                if self.supervisor.children:
+                    timeout = min(timeout, self.supervisor.MONITOR_SLEEP)
+
+                logger.debug('Waiting for events (%d managers, %d runners, %d local simulations), pid %d'
+                             % (len(self.managers), len(self.processes), len(self.supervisor.children), os.getpid()))
+                self.supervisor.flush()
+                self.handle_events(wait(list(self.processes.keys()) + self.supervisor.waitables() + [self.wake_receiver],
+                                        timeout))
+        finally:
+            self.stop_listener()
 
-        # Delete the managers that needs to be deleted
-        for exp_id in managers_to_delete:
-            del managers[exp_id]
 
-        # No more active managers -> Exit if our analyzer threads are done
-        # Do not use len() to not block anything
-        if not managers: break
+if __name__ == "__main__":
+
+    logger.debug('Start Overseer pid: %d' % os.getpid())
+
+    # we technically don't care about full consistency of SetupParser with the original dtk command, as experiments
+    # have all been created. We can grab 'generic' max_local_sims / max_threads
+    SetupParser.init() # default block
+    max_local_sims = int(SetupParser.get('max_local_sims'))
+
+    # Take this opportunity to cleanup the logs
+    lc = threading.Thread(target=LogCleaner)
+    lc.start()
 
-        time.sleep(10)
-        count += 1
+    Overseer(max_local_sims).run()
 
 logger.debug('No more work to do, Overseer pid: %d exiting...' % os.getpid())
@@ -4,6 +4,7 @@ from abc import abstractmethod, ABCMeta
 
 from simtools.AssetManager.SimulationAssets import SimulationAssets
 from simtools.Utilities.COMPSUtilities import stage_file
+from simtools.Utilities.CopyOnWrite import copy_on_write
 from simtools.Utilities.General import CommandlineGenerator
 
 logger = logging.getLogger(__name__)
@@ -25,6 +26,16 @@ class SimConfigBuilder(metaclass=ABCMeta):
     def copy_from(self, other):
         self.__dict__ = other.__dict__.copy()
 
+    def lazy_copy(self):
+        """
+        Copy of the builder sharing its content with this one: only what is modified (or read) through the copy
+        is copied, so the cost of a copy depends on the changes made to it and not on the size of the configuration.
+        This builder must not be modified while its copies are in use (see simtools.Utilities.CopyOnWrite).
+        """
+        cb = self.__class__.__new__(self.__class__)
+        cb.__dict__ = {name: copy_on_write(value) for name, value in self.__dict__.items()}
+        return cb
+
     @property
     def params(self):
         return self.config
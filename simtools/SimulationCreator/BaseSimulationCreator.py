@@ -1,9 +1,9 @@
-import copy
 from abc import abstractmethod, ABCMeta
 from multiprocessing import Process
 
 from simtools.DataAccess.DataStore import DataStore
 from simtools.SetupParser import SetupParser
+from simtools.Utilities.CopyOnWrite import copy_on_write
 
 
 class BaseSimulationCreator(Process):
@@ -38,11 +38,12 @@ class BaseSimulationCreator(Process):
 
         while self.function_set:
             mod_fn_list = self.function_set.pop()
-            cb = copy.deepcopy(self.config_builder)
+            # Copy only the parts of the config builder modified for this simulation
+            cb = self.config_builder.lazy_copy()
 
             # modify next simulation according to experiment builder
             # also retrieve the returned metadata
-            tags = copy.deepcopy(self.initial_tags) if self.initial_tags else {}
+            tags = copy_on_write(self.initial_tags) if self.initial_tags else {}
             for func in mod_fn_list:
                 md = func(cb)
                 tags.update(md)
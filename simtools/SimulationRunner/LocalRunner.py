@@ -1,7 +1,6 @@
 import os
 import shlex
 import subprocess
-import time
 
 from simtools.DataAccess.DataStore import DataStore
 from simtools.SimulationRunner.BaseSimulationRunner import BaseSimulationRunner
@@ -10,104 +9,167 @@ logger = init_logging("LocalRunner")
 from COMPS.Data.Simulation import SimulationState
 
 
-class LocalSimulationRunner(BaseSimulationRunner):
+class SupervisedSimulation:
     """
-    Run one simulation.
+    A local simulation process followed by the LocalSimulationSupervisor.
     """
-    def __init__(self, simulation, experiment, thread_queue):
-        super(LocalSimulationRunner, self).__init__(experiment)
-        self.queue = thread_queue # used to limit the number of concurrently running simulations
-        self.simulation = simulation
-        self.sim_dir = self.simulation.get_path()
-
-        if self.check_state() == SimulationState.Created:
-            self.run()
-        else:
-            self.queue.get()
-            if self.simulation.status not in (SimulationState.Failed, SimulationState.Succeeded, SimulationState.Canceled):
-                self.monitor()
-
-    def run(self):
+    def __init__(self, simulation, experiment, process=None):
+        self.id = simulation.id
+        self.sim_dir = simulation.get_path()
+        self.exe_name = experiment.exe_name
+        self.process = process  # Popen object if we started the simulation, None if adopted
+        self.pid = process.pid if process else int(simulation.pid or 0)
+        self.status_offset = 0
+        self.last_line = ""
+        self.waitable = None
+
+        # On Linux, a pid file descriptor becomes readable when the process exits (works for adopted processes too)
+        if self.pid and hasattr(os, 'pidfd_open'):
+            try:
+                self.waitable = os.pidfd_open(self.pid)
+            except OSError:
+                pass
+
+    def exited(self):
+        if self.process:
+            return self.process.poll() is not None
+        return not is_running(self.pid, name_part=self.exe_name)
+
+    def read_status(self, final=False):
+        """
+        Read the lines appended to status.txt since the last call and keep the last one.
+        :param final: The process is done, also consider the last line even without end of line
+        :return: True if the last line changed
+        """
+        status_path = os.path.join(self.sim_dir, 'status.txt')
         try:
-            with open(os.path.join(self.sim_dir, "StdOut.txt"), "w") as out, open(os.path.join(self.sim_dir, "StdErr.txt"), "w") as err:
+            with open(status_path, 'rb') as status_file:
+                status_file.seek(0, os.SEEK_END)
+                # The file was rewritten -> start over
+                if status_file.tell() < self.status_offset:
+                    self.status_offset = 0
+                status_file.seek(self.status_offset)
+                content = status_file.read()
+        except OSError:
+            return False
+
+        end = len(content) if final else content.rfind(b'\n') + 1
+        lines = [line for line in content[:end].decode('utf-8', errors='replace').splitlines() if line.strip()]
+        self.status_offset += end
+        if not lines or lines[-1] == self.last_line:
+            return False
+
+        self.last_line = lines[-1]
+        return True
+
+    def final_state(self):
+        if "Done" in self.last_line or os.path.exists(os.path.join(self.sim_dir, 'trajectories.csv')):
+            return SimulationState.Succeeded
+        return SimulationState.Failed
+
+    def close(self):
+        if self.waitable is not None:
+            os.close(self.waitable)
+            self.waitable = None
+
+
+class LocalSimulationSupervisor(BaseSimulationRunner):
+    """
+    Run the local simulations as children of the Overseer and supervise all of them from the Overseer loop.
+
+    Instead of one monitoring process per simulation polling its pid and saving the simulation every MONITOR_SLEEP:
+     - the Overseer waits on the waitables() (pid file descriptors) and calls monitor() when one of them exits
+       or every MONITOR_SLEEP seconds
+     - status.txt is tailed from the last offset read
+     - the changes (state, last status line, pid) are written in a single DataStore.batch_simulations_update()
+    """
+    def __init__(self, max_local_sims):
+        super(LocalSimulationSupervisor, self).__init__(None)
+        self.max_local_sims = max_local_sims
+        self.children = {}      # Simulation id -> SupervisedSimulation
+        self.updates = {}       # Simulation id -> pending update
+
+    def full(self):
+        return len(self.children) >= self.max_local_sims
+
+    def supervises(self, sim_id):
+        return sim_id in self.children
+
+    def queue_update(self, child, status=None, pid=None):
+        self.updates[child.id] = {'sid': child.id, 'status': status or SimulationState.Running, 'message': child.last_line,
+                                  'pid': str(pid) if pid else None}
+
+    def run(self, simulation, experiment):
+        """
+        Start a simulation.
+        """
+        if self.supervises(simulation.id):
+            return
+
+        sim_dir = simulation.get_path()
+        try:
+            with open(os.path.join(sim_dir, "StdOut.txt"), "w") as out, open(os.path.join(sim_dir, "StdErr.txt"), "w") as err:
                 # On windows we want to pass the command to popen as a string
                 # On Unix, we want to pass it as a sequence
                 # See: https://docs.python.org/2/library/subprocess.html#subprocess.Popen
                 if os.name == "nt":
-                    command = self.experiment.command_line
+                    command = experiment.command_line
                 else:
-                    command = shlex.split(self.experiment.command_line)
+                    command = shlex.split(experiment.command_line)
 
                 # Launch the command
-                p = subprocess.Popen(command, cwd=self.sim_dir, shell=False, stdout=out, stderr=err)
-
-                # We are now running
-                self.simulation.pid = p.pid
-                self.simulation.status = SimulationState.Running
-                self.update_status()
-
-            self.monitor()
+                process = subprocess.Popen(command, cwd=sim_dir, shell=False, stdout=out, stderr=err)
         except Exception as e:
             print("Error encountered while running the simulation.")
             print(e)
-        finally:
-            # Allow another different thread to run now that this one is done.
-            self.queue.get()
-
-    def monitor(self):
+            DataStore.batch_simulations_update([{'sid': simulation.id, 'status': SimulationState.Failed,
+                                                 'message': str(e), 'pid': None}])
+            simulation.status = SimulationState.Failed
+            return
+
+        # We are now running
+        child = SupervisedSimulation(simulation, experiment, process)
+        self.children[simulation.id] = child
+        self.queue_update(child, pid=process.pid)
+        simulation.pid = str(process.pid)
+        simulation.status = SimulationState.Running
+
+    def adopt(self, simulation, experiment):
         """
-        Monitors the simulation process and update its status.
+        Supervise a simulation marked as Running but started by a previous Overseer.
+        If it is not running anymore, its final state is set at the next monitor().
         """
-        sim_pid = self.simulation.pid
-
-        while is_running(sim_pid, name_part=self.experiment.exe_name) and self.simulation.status != "Cancelled":
-            logger.debug("monitor: waiting on pid: %s" % sim_pid)
-            self.simulation.message = self.last_status_line()
-            self.update_status()
-            time.sleep(self.MONITOR_SLEEP)
-
-        logger.debug("monitor: done waiting on pid: %s" % sim_pid)
-
-        # When poll returns None, the process is done, test if succeeded or failed
-        last_message = self.last_status_line()
-        last_state = self.check_state()
-
-        if "Done" in last_message or os.path.exists(os.path.join(self.sim_dir, 'trajectories.csv')):
-            self.simulation.status = SimulationState.Succeeded
-        else:
-            # If we exited with a Canceled status, don't update to Failed
-            if last_state != SimulationState.Canceled:
-                self.simulation.status = SimulationState.Failed
-
-        # Set the final simulation state
-        logger.debug("monitor: Updating sim: %s with pid: %s to status: %s" % (self.simulation.id, sim_pid, self.simulation.status.name))
-        self.simulation.message = last_message
-        self.simulation.pid = None
-        self.update_status()
-
-    def update_status(self):
-        # For local sim, we save the object so we have the info we need
-        DataStore.save_simulation(self.simulation)
-
-    def last_status_line(self):
-        """
-        Returns the last line of the status.txt file for the simulation.
-        None if the file doesnt exist or is empty
-        :return:
-        """
-        status_path = os.path.join(self.sim_dir, 'status.txt')
-        msg = None
-        if os.path.exists(status_path) and os.stat(status_path).st_size != 0:
-            with open(status_path, 'r') as status_file:
-                msg = list(status_file)[-1]
+        if not self.supervises(simulation.id):
+            self.children[simulation.id] = SupervisedSimulation(simulation, experiment)
 
-        return msg.strip('\n') if msg else ""
+    def waitables(self):
+        return [child.waitable for child in self.children.values() if child.waitable is not None]
 
-    def check_state(self):
+    def monitor(self):
         """
-        Update the simulation and check its state
-        Returns: state of the simulation or None
+        Check all the simulations: reap the exited ones, read the new status lines and save the changes.
+        :return: The ids of the simulations which exited
         """
-        self.simulation = DataStore.get_simulation(self.simulation.id)
-        return self.simulation.status
-
+        exited = []
+        for child in list(self.children.values()):
+            if not child.exited():
+                if child.read_status():
+                    self.queue_update(child, pid=child.pid)
+                continue
+
+            # The process is done, test if succeeded or failed
+            # If it was canceled, the DataStore keeps the Canceled state
+            child.read_status(final=True)
+            logger.debug("monitor: Updating sim: %s with pid: %s to status: %s" % (child.id, child.pid, child.final_state().name))
+            self.queue_update(child, status=child.final_state())
+            child.close()
+            del self.children[child.id]
+            exited.append(child.id)
+
+        self.flush()
+        return exited
+
+    def flush(self):
+        if self.updates:
+            DataStore.batch_simulations_update(list(self.updates.values()))
+            self.updates = {}
@@ -0,0 +1,203 @@
+import os
+from io import BytesIO
+
+from simtools.Utilities.General import init_logging
+
+logger = init_logging('COMPSFileCache')
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+DEFAULT_DIRECTORY = os.path.join(current_dir, '..', 'DataAccess', 'cache', 'files')
+DEFAULT_SIZE_LIMIT = 10240  # In MB
+
+
+def normalize_path(path):
+    return path.replace('\\', '/').strip('/').lower()
+
+
+class COMPSFileCache:
+    """
+    Local, size-capped cache for the files downloaded from COMPS.
+
+    Simulation output files are keyed by simulation id, path and the size/checksum reported by the server.
+    Asset files are keyed by their checksum only so identical assets shared by several simulations are downloaded
+    and stored once.
+
+    The cache is shared by all the processes and evicts the least recently used files when full.
+    Location and size (in MB) can be set with the file_cache_dir and file_cache_size options of the simtools.ini.
+    """
+    _cache = None
+
+    @classmethod
+    def cache(cls):
+        if cls._cache is None:
+            from diskcache import Cache
+            from simtools.SetupParser import SetupParser
+
+            directory, size_limit = DEFAULT_DIRECTORY, DEFAULT_SIZE_LIMIT
+            if SetupParser.initialized:
+                directory = SetupParser.get('file_cache_dir', None) or directory
+                size_limit = SetupParser.get('file_cache_size', None) or size_limit
+
+            cls.configure(directory, size_limit)
+        return cls._cache
+
+    @classmethod
+    def configure(cls, directory=None, size_limit=None):
+        """
+        (Re)create the cache in the given directory
+        :param directory: Where to store the files
+        :param size_limit: Maximum size of the cache in MB
+        """
+        from diskcache import Cache
+        if cls._cache is not None:
+            cls._cache.close()
+
+        cls._cache = Cache(os.path.abspath(directory or DEFAULT_DIRECTORY),
+                           size_limit=int(size_limit or DEFAULT_SIZE_LIMIT) * 1024 ** 2,
+                           eviction_policy='least-recently-used')
+
+    @staticmethod
+    def output_key(sim_id, path, length, checksum):
+        return "output:{}:{}:{}:{}".format(sim_id, normalize_path(path), length, checksum)
+
+    @staticmethod
+    def asset_key(length, checksum):
+        return "asset:{}:{}".format(checksum, length)
+
+    @staticmethod
+    def manifest_key(sim_id):
+        return "manifest:{}".format(sim_id)
+
+    @classmethod
+    def record(cls, sim_id, keys):
+        """
+        Remember which cache entries hold the files of a simulation
+        :param sim_id: The simulation id
+        :param keys: Dictionary associating the file path with its cache key
+        """
+        cache = cls.cache()
+        manifest_key = cls.manifest_key(sim_id)
+        try:
+            # The read-modify-write is done in a transaction: the downloading threads and processes may record
+            # different files of the same simulation at the same time
+            with cache.transact():
+                manifest = cache.get(manifest_key) or {}
+                manifest.update({normalize_path(path): key for path, key in keys.items()})
+                cache.set(manifest_key, manifest)
+        except Exception as e:
+            logger.debug("Could not record the files of simulation {} in the file cache: {}".format(sim_id, e))
+
+    @classmethod
+    def cached_files(cls, sim_id, paths):
+        """
+        Retrieve the files of a simulation from the cache only, without contacting COMPS.
+        :param sim_id: The simulation id
+        :param paths: The files paths (output files or Assets)
+        :return: Dictionary associating path and content or None if one of the files is not in the cache
+        """
+        manifest = cls.get(cls.manifest_key(sim_id))
+        if not manifest:
+            return None
+
+        contents = {}
+        for path in paths:
+            key = manifest.get(normalize_path(path))
+            content = cls.get(key) if key else None
+            if content is None:
+                return None
+            contents[path] = content
+        return contents
+
+    @classmethod
+    def get(cls, key):
+        return cls.cache().get(key)
+
+    @classmethod
+    def set(cls, key, content):
+        try:
+            cls.cache().set(key, content)
+        except Exception as e:
+            logger.debug("Could not store {} in the file cache: {}".format(key, e))
+
+    @classmethod
+    def read(cls, key, offset=0, length=None):
+        """
+        Read a byte range of a cached file without loading the rest of it.
+        :param key: The key of the file
+        :param offset: Where to start reading (negative to start from the end)
+        :param length: How many bytes to read (everything if None)
+        :return: The bytes read or None if the file is not in the cache
+        """
+        handle = cls.cache().get(key, read=True)
+        if handle is None:
+            return None
+
+        # Small files are kept in the cache database and returned as bytes
+        if isinstance(handle, bytes):
+            handle = BytesIO(handle)
+
+        with handle:
+            if offset >= 0:
+                handle.seek(offset)
+            else:
+                handle.seek(0, os.SEEK_END)
+                handle.seek(max(handle.tell() + offset, 0))
+            return handle.read() if length is None else handle.read(length)
+
+    @classmethod
+    def retrieve_output_files(cls, COMPS_simulation, paths):
+        """
+        Drop-in replacement for COMPS_simulation.retrieve_output_files(paths) going through the cache.
+        Only the files missing from the cache (or changed on the server) are downloaded.
+        :param COMPS_simulation: The COMPS simulation object
+        :param paths: The output files paths
+        :return: List of file contents in the same order as paths
+        """
+        sim_id = str(COMPS_simulation.id)
+        try:
+            infos = {normalize_path(os.path.join(info.path_from_root or '', info.friendly_name)): info
+                     for info in COMPS_simulation.retrieve_output_file_info(paths=paths)}
+        except Exception as e:
+            # Without the server size/checksum we cannot trust the cache -> download everything
+            logger.debug("Could not retrieve the output files info for simulation {}: {}".format(sim_id, e))
+            infos = {}
+
+        contents = {}
+        keys = {}
+        for path in paths:
+            info = infos.get(normalize_path(path))
+            if info is None:
+                continue
+            keys[path] = cls.output_key(sim_id, path, info.length, info.md5_checksum)
+            content = cls.get(keys[path])
+            if content is not None:
+                contents[path] = content
+
+        missing = [path for path in paths if path not in contents]
+        if missing:
+            for path, content in zip(missing, COMPS_simulation.retrieve_output_files(paths=missing)):
+                contents[path] = content
+                if path in keys:
+                    cls.set(keys[path], content)
+
+        if keys:
+            cls.record(sim_id, keys)
+
+        return [contents[path] for path in paths]
+
+    @classmethod
+    def retrieve_asset_file(cls, asset_file, sim_id=None, path=None):
+        """
+        Retrieve the content of a COMPS AssetCollectionFile going through the cache.
+        :param sim_id: If given with path, the asset is recorded in the simulation manifest (see cached_files)
+        :param path: The path of the asset as requested for the simulation
+        """
+        key = cls.asset_key(asset_file.length, asset_file.md5_checksum)
+        content = cls.get(key)
+        if content is None:
+            content = asset_file.retrieve()
+            cls.set(key, content)
+
+        if sim_id and path:
+            cls.record(sim_id, {path: key})
+        return content
@@ -1,4 +1,5 @@
 import zipfile
+from functools import lru_cache
 
 from simtools.Utilities.General import init_logging, get_md5, retry_function
 
@@ -142,7 +143,17 @@ def pretty_display_assets_from_collection(assets):
         str += "- {}{}\n".format(relative_path, asset.file_name)
     return str
 
-def get_asset_files_for_simulation_id(sim_id, paths, output_directory=None, flatten=False, remove_prefix=None):
+@lru_cache(maxsize=32)
+def get_asset_collection_with_assets(collection_id):
+    """
+    Retrieve an asset collection with the list of its assets.
+    The most recent collections are kept, the simulations of an experiment usually sharing the same one.
+    """
+    return AssetCollection.get(id=collection_id, query_criteria=QueryCriteria().select_children('assets'))
+
+
+def get_asset_files_for_simulation_id(sim_id, paths, output_directory=None, flatten=False, remove_prefix=None,
+                                      use_cache=True):
     """
     Obtains AssetManager-contained files from a given simulation.
     :param sim_id: A simulation id to retrieve files from
@@ -150,14 +161,16 @@ def get_asset_files_for_simulation_id(sim_id, paths, output_directory=None, flat
     :param remove_prefix: if a prefix is given, will remove it from the paths
     :param output_directory: Write requested files into this directory if specified
     :param flatten: If true, all the files will be written to the root of output_directory. If false, dir structure will be kept
+    :param use_cache: Go through the COMPSFileCache. Identical assets of different simulations are downloaded once.
     :return: Dictionary associating filename and content
     """
+    from simtools.Utilities.COMPSFileCache import COMPSFileCache
+
     # Get the collection_id from the simulation
     collection_id = get_asset_collection_id_for_simulation_id(sim_id=sim_id)
 
     # Retrieve the asset collection
-    query_criteria = QueryCriteria().select_children('assets')
-    asset_collection = AssetCollection.get(id=collection_id, query_criteria=query_criteria)
+    asset_collection = get_asset_collection_with_assets(collection_id)
 
     # Return dictionary
     ret = {}
@@ -186,7 +199,7 @@ def get_asset_files_for_simulation_id(sim_id, paths, output_directory=None, flat
                             (relative_path, file_name, pretty_display_assets_from_collection(asset_collection.assets)))
 
         # Retrieve the file
-        result = af.retrieve()
+        result = COMPSFileCache.retrieve_asset_file(af, sim_id, rpath) if use_cache else af.retrieve()
 
         # write the file - result is written as output_directory/file_name, where file_name (with no pathing)
         if output_directory:
@@ -0,0 +1,186 @@
+import copy
+import numbers
+import threading
+from contextlib import contextmanager
+
+immutable_types = (type(None), numbers.Number, str, bytes)
+
+
+_state = threading.local()
+
+
+@contextmanager
+def reading():
+    """
+    Within this context, the copy-on-write containers are only read (e.g. serialized) and their content is not copied.
+    """
+    depth = getattr(_state, 'depth', 0)
+    _state.depth = depth + 1
+    try:
+        yield
+    finally:
+        _state.depth = depth
+
+
+def is_reading():
+    return getattr(_state, 'depth', 0) > 0
+
+
+def copy_on_write(value):
+    """
+    Return a private version of value sharing its content with value until modified:
+    dicts and lists are copied shallowly (see CowDict and CowList), immutable values are returned as is
+    and other objects are deep copied.
+    """
+    if isinstance(value, immutable_types):
+        return value
+    if isinstance(value, dict):
+        return CowDict(value)
+    if isinstance(value, list):
+        return CowList(value)
+    return copy.deepcopy(value)
+
+
+def shared_ids(values):
+    return set(id(v) for v in values if not isinstance(v, immutable_types))
+
+
+class CowDict(dict):
+    """
+    Shallow copy of a dictionary whose nested containers are still shared with the original one.
+    A shared value is replaced by a private copy (itself copy-on-write) the first time it is read from the dictionary,
+    so modifying what is read never changes the original. The original must not be modified in the meantime.
+    Serializing the content within the reading() context does not copy anything.
+    """
+
+    def __init__(self, base=(), **kwargs):
+        super(CowDict, self).__init__(base, **kwargs)
+        self._shared = shared_ids(dict.values(self))
+
+    def _own(self, key, value):
+        if id(value) in getattr(self, '_shared', ()) and not is_reading():
+            value = copy_on_write(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def _own_all(self):
+        if is_reading():
+            return
+        for key, value in list(dict.items(self)):
+            self._own(key, value)
+
+    def __getitem__(self, key):
+        return self._own(key, dict.__getitem__(self, key))
+
+    # Overriding __iter__ and keys makes dict(), ** unpacking and update() read the values through __getitem__
+    # instead of the raw shared values
+    def __iter__(self):
+        return dict.__iter__(self)
+
+    def keys(self):
+        return dict.keys(self)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            self[key]
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        return key, (copy_on_write(value) if id(value) in getattr(self, '_shared', ()) else value)
+
+    def values(self):
+        self._own_all()
+        return dict.values(self)
+
+    def items(self):
+        self._own_all()
+        return dict.items(self)
+
+    def copy(self):
+        self._own_all()
+        return dict(self)
+
+    __copy__ = copy
+
+    def __reduce__(self):
+        # Pickled and deep copied as a plain dictionary
+        return dict, (dict(self),)
+
+
+class CowList(list):
+    """
+    Shallow copy of a list whose nested containers are still shared with the original one, see CowDict.
+    """
+
+    def __init__(self, base=()):
+        super(CowList, self).__init__(base)
+        self._shared = shared_ids(list.__iter__(self))
+
+    def _own(self, index):
+        value = list.__getitem__(self, index)
+        if id(value) in getattr(self, '_shared', ()) and not is_reading():
+            value = copy_on_write(value)
+            list.__setitem__(self, index, value)
+        return value
+
+    def _own_all(self):
+        if is_reading():
+            return
+        for index in range(len(self)):
+            self._own(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            for i in range(*index.indices(len(self))):
+                self._own(i)
+            return list.__getitem__(self, index)
+        return self._own(index)
+
+    def __iter__(self):
+        self._own_all()
+        return list.__iter__(self)
+
+    def __reversed__(self):
+        self._own_all()
+        return list.__reversed__(self)
+
+    def pop(self, index=-1):
+        self._own(index)
+        return list.pop(self, index)
+
+    def __add__(self, other):
+        self._own_all()
+        return list.__add__(self, other)
+
+    # plain + cow and n * cow would otherwise use the methods of list and copy the raw shared items.
+    # Python calls the reflected method of a subclass of list on the right first.
+    def __radd__(self, other):
+        if not isinstance(other, list):
+            return NotImplemented
+        self._own_all()
+        return list.__add__(other, self)
+
+    def __mul__(self, n):
+        self._own_all()
+        return list.__mul__(self, n)
+
+    __rmul__ = __mul__
+
+    def copy(self):
+        self._own_all()
+        return list(list.__iter__(self))
+
+    __copy__ = copy
+
+    def __reduce__(self):
+        # Pickled and deep copied as a plain list
+        return list, (list(list.__iter__(self)),)
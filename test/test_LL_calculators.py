@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from calibtool import LL_calculators
+
+
+class TestBatchedLikelihoods(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.n_samples = 5
+
+        index = pd.MultiIndex.from_product([['DRY', 'WET'], [1, 5, 15], [0, 50, 500]],
+                                           names=['Season', 'Age Bin', 'PfPR Bin'])
+        self.ref_counts = pd.DataFrame({'Counts': rng.randint(0, 30, len(index)).astype(float)}, index=index)
+        columns = pd.MultiIndex.from_product([range(self.n_samples), ['Counts']], names=['sample', 'channel'])
+        self.sim_counts = pd.DataFrame(rng.rand(len(index), self.n_samples) * 100, index=index, columns=columns)
+
+        index = pd.Index([0.5, 1, 2, 4], name='Age Bin')
+        self.ref_trials = pd.DataFrame({'Observations': [10., 0, 20, 30], 'Trials': [50., 0, 70, 80]}, index=index)
+        columns = pd.MultiIndex.from_product([range(self.n_samples), ['Observations', 'Trials']],
+                                             names=['sample', 'channel'])
+        values = rng.rand(len(index), 2 * self.n_samples) * 100
+        values[:, 1::2] += values[:, 0::2]
+        self.sim_trials = pd.DataFrame(values, index=index, columns=columns)
+
+    def assertSameAsPerSample(self, compare_fn, data, ref):
+        samples, stacked_ref, sims = LL_calculators.stack_samples(data, ref)
+        batched = LL_calculators.BATCHED[compare_fn](stacked_ref, sims)
+
+        self.assertListEqual(samples, list(range(self.n_samples)))
+        for sample in samples:
+            joined = pd.concat({'sim': data[sample], 'ref': ref}, axis=1).dropna()
+            self.assertAlmostEqual(batched[sample], compare_fn(joined))
+
+    def test_batched_pandas(self):
+        self.assertSameAsPerSample(LL_calculators.dirichlet_multinomial_pandas, self.sim_counts, self.ref_counts)
+        self.assertSameAsPerSample(LL_calculators.euclidean_distance_pandas, self.sim_counts, self.ref_counts)
+        self.assertSameAsPerSample(LL_calculators.gamma_poisson_pandas, self.sim_trials, self.ref_trials)
+        self.assertSameAsPerSample(LL_calculators.beta_binomial_pandas, self.sim_trials, self.ref_trials)
+
+    def test_missing_values(self):
+        self.sim_trials.iloc[1, 2] = np.nan
+        self.assertIsNone(LL_calculators.stack_samples(self.sim_trials, self.ref_trials))
+
+    def test_stacked_kernels(self):
+        raw = self.ref_counts.Counts.values.reshape(6, 3)
+        sims = self.sim_counts.values.T.reshape(self.n_samples, 6, 3)
+        stacked = LL_calculators.dirichlet_multinomial(raw, sims)
+        self.assertEqual(stacked.shape, (self.n_samples,))
+        for i in range(self.n_samples):
+            self.assertAlmostEqual(stacked[i], LL_calculators.dirichlet_multinomial(raw, sims[i]))
+
+
+if __name__ == '__main__':
+    unittest.main()
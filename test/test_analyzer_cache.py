@@ -0,0 +1,86 @@
+import os
+import shelve
+import shutil
+import tempfile
+import threading
+import unittest
+
+from dtk.utils.analyzers.AnalyzerCache import SQLiteCache
+
+
+class TestSQLiteCache(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.shelve_file = os.path.join(self.output_dir, 'SeasonalityAnalyzer.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_batched_namespaces(self):
+        cache = SQLiteCache(self.shelve_file, batch_size=3)
+        other = SQLiteCache(os.path.join(self.output_dir, 'TotalCasesAnalyzer.db'))
+        self.assertEqual(cache.path, other.path)
+
+        cache['status'] = 'apply'
+        cache['sim'] = {'Data': [1, 2]}
+        self.assertDictEqual(cache['sim'], {'Data': [1, 2]})
+        self.assertEqual(len(cache.pending), 2)
+        cache['other_sim'] = None
+        self.assertEqual(len(cache.pending), 0)
+
+        other['sim'] = 'other'
+        other.close()
+        self.assertListEqual(cache.keys(), ['status', 'sim', 'other_sim'])
+        self.assertEqual(cache['sim'], {'Data': [1, 2]})
+        self.assertNotIn('missing', cache)
+        self.assertIsNone(cache.get('missing'))
+
+        del cache['other_sim']
+        self.assertRaises(KeyError, cache.__getitem__, 'other_sim')
+        cache.close()
+
+        reopened = SQLiteCache(os.path.join(self.output_dir, 'TotalCasesAnalyzer.db'))
+        self.assertListEqual(reopened.keys(), ['sim'])
+        reopened.close()
+
+    def test_migrate_shelve(self):
+        old = shelve.open(self.shelve_file)
+        old['status'] = 'combine'
+        old['combine'] = {'Data': 'combined'}
+        old.close()
+
+        cache = SQLiteCache(self.shelve_file)
+        self.assertEqual(cache['status'], 'combine')
+        self.assertEqual(cache['combine'], {'Data': 'combined'})
+        cache.clear()
+        cache.close()
+
+        # Only migrated the first time, a cleared cache stays cleared
+        cache = SQLiteCache(self.shelve_file)
+        self.assertEqual(len(cache), 0)
+        cache.close()
+
+    def test_concurrent_writes(self):
+        caches = [SQLiteCache(self.shelve_file, batch_size=7) for _ in range(2)]
+
+        def write(cache, start):
+            for i in range(start, start + 50):
+                cache[i] = i
+
+        threads = [threading.Thread(target=write, args=(cache, start))
+                   for cache in caches for start in (0, 50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for cache in caches:
+            cache.close()
+
+        cache = SQLiteCache(self.shelve_file)
+        self.assertListEqual(sorted(int(k) for k in cache), list(range(100)))
+        self.assertEqual(cache['42'], 42)
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,15 @@
 import glob
+import importlib.util
+import itertools
 import json
 import os
+import sqlite3
+import threading
 import unittest
 from argparse import Namespace
+from contextlib import closing
+from datetime import datetime
+from unittest import mock
 from subprocess import Popen, PIPE, STDOUT
 
 import copy
@@ -12,7 +19,11 @@ import pandas as pd
 import shutil
 from configparser import ConfigParser
 from scipy.stats import norm, uniform, multivariate_normal
+from calibtool.CalibManager import CalibManager
 from calibtool.IterationState import IterationState
+from calibtool.ResultsStore import ResultsStore
+from calibtool.utils import StatusPoint
+from calibtool.plotters.PlottingQueue import PlottingQueue
 from calibtool.Prior import MultiVariatePrior, SampleRange, SampleFunctionContainer
 from calibtool.algorithms.IMIS import IMIS
 from calibtool.commands import get_calib_manager
@@ -387,20 +398,17 @@ class TestCommands(unittest.TestCase):
         ctool = Popen(['calibtool', 'run', 'dummy_calib.py'], stdout=PIPE, stderr=STDOUT)
         ctool.communicate()
 
-        # Open the CalibManager.json and save the values
-        with open('test_dummy_calibration/CalibManager.json', 'r') as fp:
-            cm = json.load(fp)
-            self.totals = cm['results']['total']
+        # Read the results and save the values
+        self.totals = ResultsStore('test_dummy_calibration').read().total.tolist()
 
         # Now reanalyze
         ctool = Popen(['calibtool', 'reanalyze', 'dummy_calib.py'], stdout=PIPE, stderr=STDOUT)
         ctool.communicate()
 
         # After reanalyze compare the totals
-        with open('test_dummy_calibration/CalibManager.json', 'r') as fp:
-            cm = json.load(fp)
-            for i in range(len(self.totals)):
-                self.assertAlmostEqual(cm['results']['total'][i], self.totals[i])
+        totals = ResultsStore('test_dummy_calibration').read().total.tolist()
+        for i in range(len(self.totals)):
+            self.assertAlmostEqual(totals[i], self.totals[i])
 
     def test_cleanup(self):
         ctool = Popen(['calibtool', 'run', 'dummy_calib.py'], stdout=PIPE, stderr=STDOUT)
@@ -651,6 +659,169 @@ class TestIterationState(unittest.TestCase):
         os.remove('tmp.json')
 
 
+class TestAsynchronousIteration(unittest.TestCase):
+    class ExperimentManager:
+        """
+        Experiment manager whose simulations go through the given steps of statuses at each refresh.
+        """
+        def __init__(self, steps):
+            self.steps = steps
+            self.refreshes = 0
+            self.cancelled = []
+            self.experiment = Namespace(simulations=[Namespace(id='sim%d_%d' % (sample, i), status=status,
+                                                               tags={'__sample_index__': sample})
+                                                     for sample, statuses in enumerate(steps[0])
+                                                     for i, status in enumerate(statuses)])
+
+        def refresh_experiment(self):
+            step = self.steps[min(self.refreshes, len(self.steps) - 1)]
+            for simulation, status in zip(self.experiment.simulations, itertools.chain(*step)):
+                simulation.status = status
+            self.refreshes += 1
+
+        def print_status(self):
+            pass
+
+        def any_failed_or_cancelled(self):
+            return False
+
+        def cancel_simulations(self, simulations):
+            self.cancelled.extend(simulations)
+
+    class AnalyzeManager:
+        def __init__(self, analyzers=None, working_dir=None):
+            self.analyzers = analyzers or []
+            self.parsed = []
+
+        def parse_simulations(self, simulations):
+            self.parsed.append([s.id for s in simulations])
+
+        def analyze(self):
+            pass
+
+    def setUp(self):
+        from COMPS.Data.Simulation import SimulationState
+        self.succeeded, self.running, self.canceled = \
+            SimulationState.Succeeded, SimulationState.Running, SimulationState.Canceled
+        self.state = IterationState(calibration_name='test_async_calibration', asynchronous=True,
+                                    calibration_start=datetime.now(), iteration_start=datetime.now())
+
+    def tearDown(self):
+        shutil.rmtree('test_async_calibration')
+
+    def wait_for_samples(self, steps, cancel_last_samples, supports_partial_results=True):
+        self.state.exp_manager = self.ExperimentManager(steps)
+        self.state.cancel_last_samples = cancel_last_samples
+        self.state.next_point_algo = Namespace(supports_partial_results=supports_partial_results)
+        with mock.patch('calibtool.IterationState.AnalyzeManager', self.AnalyzeManager):
+            self.state.wait_for_samples(verbose=False, init_sleep=0, sleep_time=0)
+        return self.state.exp_manager, self.state.analyze_manager
+
+    def test_wait_for_samples_cancel_last(self):
+        s, r = self.succeeded, self.running
+        steps = [[[s, s], [s, r], [r, r], [r, r]],
+                 [[s, s], [s, s], [s, r], [r, r]],
+                 [[s, s], [s, s], [s, s], [s, s]]]
+
+        # The samples are parsed as soon as all their simulations succeeded
+        # and the two samples still running are cancelled
+        exp_manager, analyze_manager = self.wait_for_samples(steps, cancel_last_samples=2)
+        self.assertEqual(exp_manager.refreshes, 2)
+        self.assertListEqual(analyze_manager.parsed, [['sim0_0', 'sim0_1'], ['sim0_0', 'sim0_1', 'sim1_0', 'sim1_1']])
+        self.assertListEqual([sim.id for sim in exp_manager.cancelled], ['sim2_0', 'sim2_1', 'sim3_0', 'sim3_1'])
+
+        # Without partial results support, wait for all the samples
+        exp_manager, analyze_manager = self.wait_for_samples(steps, cancel_last_samples=2, supports_partial_results=False)
+        self.assertEqual(exp_manager.refreshes, 3)
+        self.assertListEqual(exp_manager.cancelled, [])
+        self.assertEqual(len(analyze_manager.parsed[-1]), 8)
+
+    def test_analyze_iteration_cancelled_samples(self):
+        s, c = self.succeeded, self.canceled
+        self.state.exp_manager = self.ExperimentManager([[[s, s], [s, c], [s, s]]])
+        analyzer = Namespace(uid='a1', result=pd.Series({0: -1., 2: -2.}), cache=lambda: {})
+        analyze_manager = self.state.analyze_manager = self.AnalyzeManager([analyzer])
+
+        set_results = {}
+        self.state.next_point_algo = Namespace(
+            get_results_to_cache=lambda results: {'total': results.a1.tolist()},
+            set_results_for_iteration=lambda iteration, results: set_results.update(results=results),
+            update_summary_table=lambda state, all_results: (None, None))
+        self.state.analyze_iteration()
+
+        # Only the completed samples are analyzed, the cancelled one has no result
+        self.assertListEqual(analyze_manager.parsed, [['sim0_0', 'sim0_1', 'sim2_0', 'sim2_1']])
+        self.assertIsNone(self.state.analyze_manager)
+        results = set_results['results']
+        self.assertListEqual(results.index.tolist(), [0, 1, 2])
+        self.assertListEqual(results.a1.tolist()[::2], [-1., -2.])
+        self.assertTrue(np.isnan(results.a1[1]))
+        self.assertTrue(np.isnan(self.state.results['total'][1]))
+
+    def test_parse_simulations_does_not_block(self):
+        from simtools.AnalyzeManager.AnalyzeManager import AnalyzeManager
+
+        class Parser:
+            def __init__(self, simulation):
+                self.started = False
+
+            def start(self):
+                self.started = True
+
+        analyze_manager = AnalyzeManager()
+        analyze_manager.maxThreadSemaphore = threading.Semaphore(1)
+        analyze_manager.prepare_experiment = lambda experiment: None
+        analyze_manager.parser_for_simulation = lambda simulation, experiment, manager: Parser(simulation)
+        simulations = [Namespace(id=i, experiment=None) for i in range(3)]
+
+        # Only one thread available: the other parsers wait without blocking the caller
+        analyze_manager.parse_simulations(simulations[:2])
+        parsers = list(analyze_manager.started_parsers.values())
+        self.assertListEqual([p.started for p in parsers], [True, False])
+
+        analyze_manager.maxThreadSemaphore.release()
+        analyze_manager.parse_simulations(simulations)
+        parsers = list(analyze_manager.started_parsers.values())
+        self.assertListEqual([p.started for p in parsers], [True, True, False])
+        self.assertEqual(len(analyze_manager.waiting_parsers), 1)
+
+    @unittest.skipUnless(importlib.util.find_spec('statsmodels'), 'statsmodels is not installed')
+    def test_optimtool_regression_without_missing_samples(self):
+        from calibtool.algorithms.OptimTool import OptimTool
+        params = [{'Name': name, 'Dynamic': True, 'Guess': 0.5, 'Min': 0, 'Max': 1} for name in ('x', 'y')]
+        optimtool = OptimTool(params, samples_per_iteration=20, center_repeats=0)
+        samples = pd.DataFrame(optimtool.get_samples_for_iteration(0))
+
+        # Linear results, a third of the samples cancelled
+        results = (2 * samples.x + samples.y).to_numpy(dtype=float, copy=True)
+        results[::3] = np.nan
+        optimtool.set_results_for_iteration(0, pd.DataFrame({'total': results}))
+        optimtool.get_samples_for_iteration(1)
+
+        fitted = optimtool.data.set_index('Iteration').loc[0, 'Fitted'].values.astype(float)
+        self.assertTrue(np.isnan(fitted[::3]).all())
+        np.testing.assert_allclose(fitted[~np.isnan(results)], results[~np.isnan(results)])
+        rsquared = optimtool.regression.set_index('Parameter').Value['Rsquared']
+        self.assertAlmostEqual(float(rsquared), 1)
+
+    def test_completed_simulations(self):
+        from COMPS.Data.Simulation import SimulationState
+        simulation = lambda sample, status: Namespace(tags={'__sample_index__': sample}, status=status)
+        samples = {0: [simulation(0, SimulationState.Succeeded), simulation(0, SimulationState.Succeeded)],
+                   1: [simulation(1, SimulationState.Succeeded), simulation(1, SimulationState.Running)],
+                   2: [simulation(2, SimulationState.Succeeded)]}
+        self.assertListEqual(IterationState.completed_simulations(samples), samples[0] + samples[2])
+
+    def test_partial_results(self):
+        self.assertTrue(IMIS.supports_partial_results)
+
+        # Sample 1 was cancelled
+        results = pd.DataFrame({'a1': [-1., -2.], 'a2': [-3., -4.]}, index=[0, 2]).reindex(range(3))
+        cached = IMIS.get_results_to_cache(None, results)
+        self.assertListEqual(cached['total'][::2], [-4., -6.])
+        self.assertTrue(np.isnan(cached['total'][1]))
+
+
 class TestNumpyDecoder(unittest.TestCase):
     """
     This was discovered in caching CalibAnalyzer array with np.int64
@@ -674,7 +845,92 @@ class TestNumpyDecoder(unittest.TestCase):
 
 
 class TestCalibManager(unittest.TestCase):
-    pass
+    def setUp(self):
+        self.name = 'test_calib_resume'
+        os.makedirs(os.path.join(self.name, 'iter0'))
+        with open(os.path.join(self.name, 'CalibManager.json'), 'w') as f:
+            json.dump({'name': self.name, 'location': 'LOCAL', 'suites': [], 'iteration': 0}, f)
+        # Interrupted while commissioning the first iteration
+        with open(os.path.join(self.name, 'iter0', 'IterationState.json'), 'w') as f:
+            json.dump({'status': 'commission', 'iteration': 0, 'calibration_name': self.name, 'experiment_id': None,
+                       'results': {}, 'simulations': {}, 'next_point': {}}, f)
+        self.manager = CalibManager(None, lambda cb, sample: {}, [], mock.Mock(), name=self.name)
+
+    def tearDown(self):
+        shutil.rmtree(self.name)
+
+    def test_resume_first_iteration(self):
+        # No results store, results store without table, results table without rows
+        for statement in (None, '', 'CREATE TABLE results (sample INTEGER, iteration INTEGER, total REAL)'):
+            if statement is not None:
+                with closing(sqlite3.connect(self.manager.results_store.path)) as conn:
+                    conn.execute(statement)
+                    conn.commit()
+            self.assertEqual(len(self.manager.load_results(0)), 0)
+
+            with mock.patch('calibtool.CalibManager.CalibManager.check_location'):
+                self.manager.load_calibration(0, 'commission')
+            self.assertIsNone(self.manager.current_iteration.all_results)
+            self.assertEqual(self.manager.current_iteration.status, StatusPoint.iteration_start)
+
+
+class TestPlottingQueue(unittest.TestCase):
+    class FilePlotter:
+        def __init__(self, filename):
+            self.filename = filename
+
+        def visualize(self, iteration_state):
+            if iteration_state.iteration < 0:
+                raise ValueError('Nothing to plot')
+            with open(self.filename, 'w') as f:
+                f.write(str(iteration_state.iteration))
+
+    def tearDown(self):
+        for filename in glob.glob('test_plot_*.txt'):
+            os.remove(filename)
+
+    def test_submit(self):
+        queue = PlottingQueue(max_processes=2)
+        queue.submit([self.FilePlotter('test_plot_failing.txt')], Namespace(iteration=-1))
+        queue.submit([self.FilePlotter('test_plot_%d.txt' % i) for i in range(3)], Namespace(iteration=4))
+        queue.wait()
+
+        self.assertListEqual(queue.processes, [])
+        self.assertFalse(os.path.exists('test_plot_failing.txt'))
+        for i in range(3):
+            with open('test_plot_%d.txt' % i) as f:
+                self.assertEqual(f.read(), '4')
+
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self):
+        os.mkdir('test_results_store')
+        self.store = ResultsStore('test_results_store')
+
+    def tearDown(self):
+        shutil.rmtree('test_results_store')
+
+    def iteration_results(self, iteration, **columns):
+        results = pd.DataFrame({'total': [-10. - iteration, -20.], 'x': [1., 2.], **columns})
+        results['iteration'] = iteration
+        return results
+
+    def test_append(self):
+        self.assertIsNone(self.store.read())
+        self.store.append(self.iteration_results(0))
+        self.store.append(self.iteration_results(1, y=['a', 'b']))
+        self.store.append(self.iteration_results(2))
+
+        results = self.store.read()
+        self.assertListEqual(results['iteration'].tolist(), [0, 0, 1, 1, 2, 2])
+        self.assertListEqual(results['sample'].tolist(), [0, 1] * 3)
+        self.assertListEqual(results['y'].tolist()[2:4], ['a', 'b'])
+        self.assertListEqual(self.store.read(max_iteration=1, columns=['total']).columns.tolist(),
+                             ['sample', 'iteration', 'total'])
+
+        # Resuming from iteration 1 replaces the following iterations
+        self.store.append(self.iteration_results(1))
+        self.assertListEqual(self.store.read()['total'].tolist(), [-10., -20., -11., -20.])
 
 
 if __name__ == '__main__':
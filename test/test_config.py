@@ -1,6 +1,10 @@
+import copy
+import json
 import unittest
 
 from dtk.utils.core.DTKConfigBuilder import DTKConfigBuilder
+from dtk.vector.species import set_species_param
+from simtools.Utilities.CopyOnWrite import CowDict, reading
 
 
 class TestConfigBuilder(unittest.TestCase):
@@ -17,6 +21,77 @@ class TestConfigBuilder(unittest.TestCase):
         self.cb.enable('Demographics_Birth')
         self.assertEqual(self.cb.get_param('Enable_Demographics_Birth'), 1)
 
+
+class TestLazyCopy(unittest.TestCase):
+
+    def setUp(self):
+        self.cb = DTKConfigBuilder.from_defaults('VECTOR_SIM')
+        self.cb.add_input_file('input.json', {'Values': [1, 2]})
+        self.base = copy.deepcopy(self.cb)
+
+    def modify(self, cb):
+        cb.set_param('Simulation_Duration', 100)
+        set_species_param(cb, 'gambiae', 'Required_Habitat_Factor', [10, 20])
+        cb.add_event({'Event_Name': 'Outbreak', 'Start_Day': 5})
+        for event in cb.campaign['Events']:
+            event['Start_Day'] += 1
+        cb.input_files['input.json']['Values'].append(3)
+        cb.dlls.add(('reporter_plugins', 'report.dll'))
+
+    def test_same_as_deepcopy(self):
+        expected = copy.deepcopy(self.cb)
+        self.modify(expected)
+
+        for _ in range(2):
+            cb = self.cb.lazy_copy()
+            self.modify(cb)
+            for name in ('config', 'campaign', 'input_files', 'emodules_map'):
+                with reading():
+                    self.assertEqual(json.dumps(getattr(cb, name), sort_keys=True),
+                                     json.dumps(getattr(expected, name), sort_keys=True))
+            self.assertSetEqual(cb.dlls, expected.dlls)
+
+        # The base builder is left unchanged
+        for name in ('config', 'campaign', 'input_files', 'dlls'):
+            self.assertEqual(getattr(self.cb, name), getattr(self.base, name))
+
+    def test_shared_content(self):
+        for builder in (self.cb, self.base):
+            builder.add_event({'Event_Name': 'Outbreak', 'Start_Day': 5})
+        cb = self.cb.lazy_copy()
+        self.assertIsInstance(cb.config, CowDict)
+        cb.set_param('Simulation_Duration', 100)
+        self.assertIs(dict.__getitem__(cb.config['parameters'], 'Vector_Species_Params'),
+                      self.cb.params['Vector_Species_Params'])
+
+        # Plain copies of a lazy copy do not share their content with the base builder
+        plain = {}
+        plain.update(cb.params)
+        for params in (dict(cb.params), {**cb.params}, plain):
+            params['Vector_Species_Params']['gambiae']['Anthropophily'] = -1
+            self.assertEqual(self.cb.params['Vector_Species_Params']['gambiae']['Anthropophily'],
+                             self.base.params['Vector_Species_Params']['gambiae']['Anthropophily'])
+
+        # Nor the plain lists built from a lazy copy
+        events = cb.campaign['Events']
+        for plain in ([{'Start_Day': 0}] + events, 2 * events, events * 2, events[:], [*events], list(events)):
+            for event in plain:
+                event['Start_Day'] = -1
+        plain = []
+        plain[0:0] = events
+        plain.extend(events)
+        plain += events
+        for event in plain:
+            event['Start_Day'] = -1
+        self.assertEqual(self.cb.campaign, self.base.campaign)
+        with self.assertRaises(TypeError):
+            (0,) + events
+
+        # Deep copies are independent plain containers
+        deep = copy.deepcopy(cb.config)
+        self.assertIs(type(deep), dict)
+        self.assertIsNot(deep['parameters']['Vector_Species_Params'], self.cb.params['Vector_Species_Params'])
+
 class TestConfigExceptions(unittest.TestCase):
 
     def test_bad_kwargs(self):
@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from calibtool.analyzers.ChannelBySeasonAgeDensityCohortAnalyzer import ChannelBySeasonAgeDensityCohortAnalyzer
+from calibtool.analyzers.Helpers import \
+    ReferenceBinning, aggregate_on_index, convert_to_counts, age_from_birth_cohort, season_from_time
+from dtk.utils.parsers.malaria_summary import summary_channel_to_pandas
+
+
+class DensitySite(object):
+    def __init__(self, reference):
+        self.reference = reference
+
+    def get_reference_data(self, reference_type):
+        return self.reference
+
+
+class SummaryParser(object):
+    def __init__(self, data):
+        self.raw_data = {ChannelBySeasonAgeDensityCohortAnalyzer.filenames[0]: data}
+        self.sim_data = {'__sample_index__': 3}
+        self.sim_id = 'sim'
+
+
+class TestReferenceBinning(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.channel = 'PfPR by Parasitemia and Age Bin'
+        self.seasons = {'January': 'DRY', 'February': 'DRY', 'August': 'WET', 'September': 'WET'}
+
+        index = pd.MultiIndex.from_product([[self.channel], ['DRY', 'WET'], [1, 2, 3], [0, 500, 5000]],
+                                           names=['Channel', 'Season', 'Age Bin', 'PfPR Bin'])
+        self.reference = pd.DataFrame({'Counts': rng.randint(0, 30, len(index)).astype(float)}, index=index)
+
+        time = [31 * (i + 1) for i in range(40)]
+        pfpr_bins, age_bins = [0, 50, 500, 5000, 50000], [5, 15, 100]
+        prevalence = rng.rand(len(time), len(pfpr_bins), len(age_bins))
+        prevalence[3, 1, 2] = np.nan
+        self.data = {
+            'Metadata': {'Parasitemia Bins': pfpr_bins, 'Age Bins': age_bins},
+            'DataByTime': {'Time Of Report': time},
+            'DataByTimeAndAgeBins': {'Average Population by Age Bin': (rng.rand(len(time), len(age_bins)) * 100).tolist()},
+            'DataByTimeAndPfPRBinsAndAgeBins': {self.channel: prevalence.tolist()}
+        }
+
+    def test_same_as_aggregate_on_index(self):
+        df = pd.DataFrame({'Season': ['DRY', 'WET', 'RAINY', 'DRY', 'DRY'], 'Age Bin': [0.5, 1, 1.5, 2.5, 4],
+                           'Counts': [1., 2., 4., 8., 16.]})
+        index = pd.MultiIndex.from_product([['DRY', 'WET'], [1, 2, 3]], names=['Season', 'Age Bin'])
+
+        # Unknown season and ages beyond the last bin edge are dropped, right-bin-edges are inclusive
+        rebinned = ReferenceBinning(index).aggregate(df, 'Counts')
+        self.assertListEqual(rebinned.index.tolist(), index.tolist())
+        self.assertListEqual(rebinned.tolist(), [1, 0, 8, 2, 0, 0])
+
+    def test_density_analyzer(self):
+        analyzer = ChannelBySeasonAgeDensityCohortAnalyzer(DensitySite(self.reference), seasons=self.seasons)
+        sim_data = analyzer.apply(SummaryParser(self.data))
+        self.assertEqual(sim_data.sample, 3)
+        self.assertEqual(len(analyzer.flat_codes), 1)
+
+        # Former implementation: pandas re-binning of the prevalence converted to counts
+        channel_data = summary_channel_to_pandas(self.data, self.channel)
+        population = summary_channel_to_pandas(self.data, analyzer.population_channel)
+        df = convert_to_counts(channel_data, population).reset_index()
+        df = season_from_time(age_from_birth_cohort(df), seasons=self.seasons)
+        expected = aggregate_on_index(df, self.reference.loc[self.channel].index, keep=[self.channel])
+
+        joined = pd.concat({'sim': sim_data.loc[self.channel].Counts, 'expected': expected[self.channel]}, axis=1)
+        self.assertEqual(len(joined.dropna()), len(expected))
+        np.testing.assert_allclose(joined.dropna().sim, joined.dropna().expected)
+        self.assertEqual(len(sim_data), len(self.reference))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from calibtool.analyzers.Helpers import DistanceNeighbors, get_risk_by_distance
+
+
+class TestRiskByDistance(unittest.TestCase):
+    def setUp(self):
+        # 4 households on a line, 10 apart
+        self.nodes = [1, 2, 3, 4]
+        self.x = [0, 10, 20, 30]
+        node1, node2 = np.meshgrid(self.nodes, self.nodes)
+        self.ddf = pd.DataFrame({'node1': node1.ravel(), 'node2': node2.ravel(),
+                                 'dist': 10 * np.abs(node1 - node2).ravel()})
+        self.df = pd.DataFrame({'node': self.nodes, 'pos': [2., 0., 1., 0.5], 'pop': [4., 3., 1., 2.]})
+
+    def test_risk(self):
+        # hh: (2-1)*2 / ((4-1)*2) from household 1, household 3 has a single person -> no neighbor at distance 0
+        # 10: household 1 -> 2, household 3 -> 2 and 4
+        # 20: household 1 -> 3, household 3 -> 1
+        expected = [2. / 6, (0 + 0 + 0.5) / (3 + 3 + 2), (1 + 2) / (1 + 4)]
+        np.testing.assert_allclose(get_risk_by_distance(self.df, [0, 10, 20], self.ddf), expected)
+
+    def test_neighbor_index(self):
+        from_matrix = DistanceNeighbors.from_distance_matrix(self.ddf, max_distance=20)
+        from_coordinates = DistanceNeighbors.from_coordinates(self.nodes, self.x, [0] * 4, max_distance=20)
+        self.assertEqual(len(from_matrix.dist), 10)
+        self.assertEqual(len(from_coordinates.dist), 10)
+        self.assertListEqual(get_risk_by_distance(self.df, [0, 10, 20], from_matrix),
+                             get_risk_by_distance(self.df, [0, 10, 20], from_coordinates))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+"""
+Local stand-ins for the experiments and simulations of the DataStore, shared by the tests.
+"""
+from COMPS.Data.Simulation import SimulationState
+
+
+class LocalExperiment:
+    location = "LOCAL"
+    exp_id = 'local_experiment'
+    exe_name = 'python'
+
+    def __init__(self, simulations=(), command_line=''):
+        self.simulations = list(simulations)
+        self.command_line = command_line
+
+
+class LocalSimulation:
+    def __init__(self, sim_id, path, status=SimulationState.Succeeded, pid=None):
+        self.id = sim_id
+        self.path = path
+        self.status = status
+        self.pid = pid
+        self.experiment = LocalExperiment()
+
+    def get_path(self):
+        return self.path
@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from COMPS.Data.Simulation import SimulationState
+
+from simtools.Analysis.AnalyzeManager import AnalyzeManager
+from simtools.Analysis.BaseAnalyzers import BaseAnalyzer
+from simtools.DataAccess.DataStore import DataStore
+
+from .local_objects import LocalSimulation
+
+
+class TotalAnalyzer(BaseAnalyzer):
+    """
+    Streaming analyzer summing the Infected channel of all the simulations
+    """
+    streaming = True
+
+    def __init__(self):
+        super().__init__(filenames=['output/InsetChart.json'], channels=['Infected'])
+
+    def select_simulation_data(self, data, simulation):
+        return float(data[self.filenames[0]]['Channels']['Infected']['Data'].sum())
+
+    def reduce(self, reduced, selected_data, simulation):
+        return (reduced or 0) + selected_data
+
+    def combine(self, reduced):
+        return {'total': reduced}
+
+    def finalize(self, all_data):
+        return {'total': sum(all_data.values())}
+
+
+class ByIdAnalyzer(TotalAnalyzer):
+    streaming = False
+
+    def finalize(self, all_data):
+        return {simulation.id: data for simulation, data in all_data.items()}
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        self.sims_dir = tempfile.mkdtemp()
+        self.simulations = {}
+        for i in range(4):
+            sim_dir = os.path.join(self.sims_dir, 'sim%d' % i)
+            os.makedirs(os.path.join(sim_dir, 'output'))
+            with open(os.path.join(sim_dir, 'output', 'InsetChart.json'), 'w') as f:
+                json.dump({'Channels': {'Infected': {'Data': [i, 10 * i]}}}, f)
+            self.simulations['sim%d' % i] = LocalSimulation('sim%d' % i, sim_dir)
+
+        self.manager = AnalyzeManager(analyzers=[TotalAnalyzer(), ByIdAnalyzer()], verbose=False, result_cache=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.sims_dir)
+
+    def test_reduce_simulation(self):
+        total, by_id = self.manager.analyzers
+        self.manager.simulations = self.simulations
+        self.manager.cache.set('sim1', {total.uid: 11., by_id.uid: 11.})
+        self.manager.cache.set('sim2', {total.uid: 22.})
+
+        for sid in ('sim1', 'sim2', 'sim3'):
+            self.manager._reduce_simulation(sid, [total])
+        self.assertDictEqual(self.manager.reduced, {total.uid: 33.})
+
+        # The data of the non-streaming analyzers stays for finalize()
+        self.assertDictEqual(self.manager.cache.get('sim1'), {by_id.uid: 11.})
+        self.assertNotIn('sim2', self.manager.cache)
+
+    def test_stream(self):
+        total, by_id = self.manager.analyzers
+        for stream in (False, True):
+            self.manager.simulations = dict(self.simulations)
+            self.manager.analyze(stream=stream)
+            self.assertDictEqual(total.results, {'total': 66.})
+            self.assertDictEqual(by_id.results, {'sim%d' % i: 11. * i for i in range(4)})
+
+        # Only the selected data of the non-streaming analyzer was kept until the end
+        self.assertSetEqual(set(self.manager.cache.get('sim1')), {by_id.uid})
+
+    def test_watch_simulations(self):
+        succeeded, failed, running = (LocalSimulation(sid, '', SimulationState.Running) for sid in ('a', 'b', 'c'))
+        self.manager.ignored_simulations = {s.id: s for s in (succeeded, failed, running)}
+        states = [('a', SimulationState.Succeeded), ('b', SimulationState.Failed), ('c', SimulationState.Running)]
+
+        with mock.patch('simtools.ExperimentManager.BaseExperimentManager.BaseExperimentManager.check_overseer'), \
+                mock.patch.object(DataStore, 'get_simulation_states', return_value=states), \
+                mock.patch.object(DataStore, 'get_simulation', return_value=succeeded):
+            self.assertListEqual(self.manager._watch_simulations(), [succeeded])
+
+        self.assertListEqual(list(self.manager.ignored_simulations), ['c'])
+        self.assertIs(self.manager.simulations['a'], succeeded)
+
+    def test_watch(self):
+        # sim0 and sim1 are done, sim2 succeeds while watching and sim3 fails
+        total, by_id = self.manager.analyzers
+        self.manager.simulations = {sid: self.simulations[sid] for sid in ('sim0', 'sim1')}
+        self.manager.ignored_simulations = {sid: self.simulations[sid] for sid in ('sim2', 'sim3')}
+        polls = [{'sim2': SimulationState.Running, 'sim3': SimulationState.Running},
+                 {'sim2': SimulationState.Succeeded, 'sim3': SimulationState.Failed}]
+
+        def get_simulation_states(sim_ids):
+            states = polls[0] if len(polls) == 1 else polls.pop(0)
+            return [(sid, states[sid]) for sid in sim_ids]
+
+        with mock.patch('simtools.ExperimentManager.BaseExperimentManager.BaseExperimentManager.check_overseer'), \
+                mock.patch('simtools.Analysis.AnalyzeManager.WATCH_INTERVAL', 0), \
+                mock.patch.object(DataStore, 'get_simulation_states', side_effect=get_simulation_states), \
+                mock.patch.object(DataStore, 'get_simulation', side_effect=lambda sid: self.simulations[sid]):
+            self.manager.analyze(watch=True)
+
+        self.assertDictEqual(total.results, {'total': 33.})
+        self.assertDictEqual(by_id.results, {'sim0': 0., 'sim1': 11., 'sim2': 22.})
+        self.assertDictEqual(self.manager.ignored_simulations, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
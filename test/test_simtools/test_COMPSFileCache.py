@@ -0,0 +1,217 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from argparse import Namespace
+from unittest import mock
+
+from simtools.Analysis.RetrievalEngine import RetrievalEngine
+from simtools.Utilities import COMPSUtilities
+from simtools.Utilities.COMPSFileCache import COMPSFileCache
+
+
+class LocalOutputFileInfo:
+    def __init__(self, path, content):
+        self.path_from_root, self.friendly_name = os.path.split(path)
+        self.length = len(content)
+        self.md5_checksum = hashlib.md5(content).hexdigest()
+
+
+class LocalSimulation:
+    """
+    Local stand-in for a COMPS simulation counting the files downloaded
+    """
+    def __init__(self, sim_id, files):
+        self.id = sim_id
+        self.files = files
+        self.downloaded = []
+
+    def retrieve_output_file_info(self, paths):
+        return [LocalOutputFileInfo(path, self.files[path]) for path in paths]
+
+    def retrieve_output_files(self, paths):
+        self.downloaded.extend(paths)
+        return [self.files[path] for path in paths]
+
+
+class LocalAssetFile:
+    def __init__(self, content):
+        self.content = content
+        self.length = len(content)
+        self.md5_checksum = hashlib.md5(content).hexdigest()
+        self.retrieved = 0
+
+    def retrieve(self):
+        self.retrieved += 1
+        return self.content
+
+
+class TestCOMPSFileCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        COMPSFileCache.configure(self.cache_dir, 10)
+
+    def tearDown(self):
+        COMPSFileCache.cache().close()
+        COMPSFileCache._cache = None
+        shutil.rmtree(self.cache_dir)
+
+    def test_output_files_downloaded_once(self):
+        files = {'output/InsetChart.json': b'{"Channels": {}}', 'output/ReportMalariaFilter.json': b'x' * 100000}
+        simulation = LocalSimulation('sim1', files)
+
+        first = COMPSFileCache.retrieve_output_files(simulation, list(files.keys()))
+        second = COMPSFileCache.retrieve_output_files(simulation, list(files.keys()))
+
+        self.assertListEqual(first, list(files.values()))
+        self.assertListEqual(second, list(files.values()))
+        self.assertListEqual(simulation.downloaded, list(files.keys()))
+
+    def test_changed_output_file_downloaded_again(self):
+        simulation = LocalSimulation('sim1', {'output/InsetChart.json': b'old'})
+        COMPSFileCache.retrieve_output_files(simulation, ['output/InsetChart.json'])
+
+        simulation.files['output/InsetChart.json'] = b'new content'
+        content = COMPSFileCache.retrieve_output_files(simulation, ['output/InsetChart.json'])
+
+        self.assertEqual(content, [b'new content'])
+        self.assertEqual(len(simulation.downloaded), 2)
+
+    def test_identical_assets_deduplicated(self):
+        asset1 = LocalAssetFile(b'demographics' * 1000)
+        asset2 = LocalAssetFile(b'demographics' * 1000)
+
+        self.assertEqual(COMPSFileCache.retrieve_asset_file(asset1), asset1.content)
+        self.assertEqual(COMPSFileCache.retrieve_asset_file(asset2), asset2.content)
+        self.assertEqual(asset1.retrieved + asset2.retrieved, 1)
+
+    def test_byte_range(self):
+        content = bytes(range(256)) * 1000
+        simulation = LocalSimulation('sim1', {'output/SpatialReport_Population.bin': content})
+        COMPSFileCache.retrieve_output_files(simulation, ['output/SpatialReport_Population.bin'])
+
+        info = LocalOutputFileInfo('output/SpatialReport_Population.bin', content)
+        key = COMPSFileCache.output_key('sim1', 'output/SpatialReport_Population.bin', info.length, info.md5_checksum)
+
+        self.assertEqual(COMPSFileCache.read(key, 8, 16), content[8:24])
+        self.assertEqual(COMPSFileCache.read(key, -10), content[-10:])
+        self.assertIsNone(COMPSFileCache.read('missing'))
+
+    def test_cached_files(self):
+        files = {'output/InsetChart.json': b'inset', 'output/BinnedReport.json': b'binned'}
+        simulation = LocalSimulation('sim1', files)
+        self.assertIsNone(COMPSFileCache.cached_files('sim1', list(files)))
+
+        COMPSFileCache.retrieve_output_files(simulation, ['output/InsetChart.json'])
+        self.assertDictEqual(COMPSFileCache.cached_files('sim1', ['Output\\InsetChart.json']),
+                             {'Output\\InsetChart.json': b'inset'})
+        self.assertIsNone(COMPSFileCache.cached_files('sim1', list(files)))
+
+        # The manifest accumulates the files of the simulation, assets included
+        COMPSFileCache.retrieve_output_files(simulation, ['output/BinnedReport.json'])
+        asset = LocalAssetFile(b'climate')
+        COMPSFileCache.retrieve_asset_file(asset, sim_id='sim1', path='Assets/climate.bin')
+        self.assertDictEqual(COMPSFileCache.cached_files('sim1', list(files) + ['Assets/climate.bin']),
+                             dict(files, **{'Assets/climate.bin': b'climate'}))
+        self.assertIsNone(COMPSFileCache.cached_files('sim2', list(files)))
+
+    def test_concurrent_record(self):
+        def record(start):
+            for i in range(start, start + 25):
+                COMPSFileCache.record('sim1', {'output/file_{}.json'.format(i): 'key{}'.format(i)})
+
+        threads = [threading.Thread(target=record, args=(start,)) for start in range(0, 100, 25)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        manifest = COMPSFileCache.get(COMPSFileCache.manifest_key('sim1'))
+        self.assertDictEqual(manifest, {'output/file_{}.json'.format(i): 'key{}'.format(i) for i in range(100)})
+
+
+class LocalAnalyzer:
+    def __init__(self, filenames, sim_ids=None):
+        self.filenames = filenames
+        self.sim_ids = sim_ids
+
+    def filter(self, simulation):
+        return self.sim_ids is None or simulation.id in self.sim_ids
+
+
+class TestRetrievalEngine(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        COMPSFileCache.configure(self.cache_dir, 10)
+        experiment = Namespace(endpoint='https://comps.idmod.org')
+        self.files = {'output/InsetChart.json': b'inset', 'output/BinnedReport.json': b'binned'}
+        self.simulations = {sim_id: Namespace(id=sim_id, experiment=experiment) for sim_id in ('sim1', 'sim2')}
+        self.COMPS_simulations = {sim_id: LocalSimulation(sim_id, self.files) for sim_id in self.simulations}
+
+        patches = [mock.patch('simtools.Analysis.RetrievalEngine.COMPS_login'),
+                   mock.patch('simtools.Analysis.RetrievalEngine.COMPSCache.simulation',
+                              side_effect=lambda sim_id: self.COMPS_simulations[sim_id])]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        COMPSFileCache.cache().close()
+        COMPSFileCache._cache = None
+        shutil.rmtree(self.cache_dir)
+
+    def retrieve(self, analyzers, result_cache=None):
+        done = []
+        engine = RetrievalEngine(analyzers, result_cache, max_workers=2)
+        for simulation in self.simulations.values():
+            engine.submit(simulation, done.append)
+        engine.shutdown()
+        return sorted(simulation.id for simulation in done)
+
+    def test_prefetch(self):
+        analyzers = [LocalAnalyzer(['output/InsetChart.json']),
+                     LocalAnalyzer(['output/InsetChart.json', 'output/BinnedReport.json'], sim_ids=['sim2'])]
+        self.assertListEqual(self.retrieve(analyzers), ['sim1', 'sim2'])
+
+        # Only the files needed by the analyzers of each simulation are downloaded, then read from the cache only
+        self.assertListEqual(self.COMPS_simulations['sim1'].downloaded, ['output/InsetChart.json'])
+        self.assertListEqual(sorted(self.COMPS_simulations['sim2'].downloaded), sorted(self.files))
+        self.assertDictEqual(COMPSFileCache.cached_files('sim2', list(self.files)), self.files)
+        self.assertIsNone(COMPSFileCache.cached_files('sim1', list(self.files)))
+
+    def test_results_already_cached(self):
+        # All the results of sim1 are in the result cache: nothing to download
+        result_cache = Namespace(contains=lambda simulation, analyzer: simulation.id == 'sim1')
+        self.assertListEqual(self.retrieve([LocalAnalyzer(['output/InsetChart.json'])], result_cache), ['sim1', 'sim2'])
+        self.assertListEqual(self.COMPS_simulations['sim1'].downloaded, [])
+        self.assertListEqual(self.COMPS_simulations['sim2'].downloaded, ['output/InsetChart.json'])
+
+    def test_failed_download(self):
+        # The simulation is still handed to the analysis which reports the error
+        self.COMPS_simulations['sim1'].files = {}
+        self.assertListEqual(self.retrieve([LocalAnalyzer(['output/InsetChart.json'])]), ['sim1', 'sim2'])
+        self.assertIsNone(COMPSFileCache.cached_files('sim1', ['output/InsetChart.json']))
+
+
+
+class TestAssetCollections(unittest.TestCase):
+    def setUp(self):
+        COMPSUtilities.get_asset_collection_with_assets.cache_clear()
+        self.addCleanup(COMPSUtilities.get_asset_collection_with_assets.cache_clear)
+
+    def test_bounded_cache(self):
+        with mock.patch('simtools.Utilities.COMPSUtilities.AssetCollection') as AssetCollection:
+            AssetCollection.get.side_effect = lambda id, query_criteria: Namespace(id=id)
+            for collection_id in list(range(100)) + [99, 99]:
+                self.assertEqual(COMPSUtilities.get_asset_collection_with_assets(collection_id).id, collection_id)
+
+        self.assertEqual(AssetCollection.get.call_count, 100)
+        cache_info = COMPSUtilities.get_asset_collection_with_assets.cache_info()
+        self.assertEqual(cache_info.currsize, cache_info.maxsize)
+        self.assertLess(cache_info.maxsize, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import mmap
+import tempfile
+import unittest
+from unittest import mock
+
+from diskcache import Cache
+
+from simtools.Analysis.BaseAnalyzers import BaseAnalyzer
+from simtools.Analysis import DataRetrievalProcess
+from simtools.Analysis.DataRetrievalProcess import retrieve_data
+
+from .local_objects import LocalSimulation
+
+
+class ChannelsAnalyzer(BaseAnalyzer):
+    def __init__(self, uid, channels=None):
+        super().__init__(filenames=['output/InsetChart.json'], channels=channels)
+        self.uid = uid
+
+    def select_simulation_data(self, data, simulation):
+        channels = data[self.filenames[0]]['Channels']
+        return {name: type(channel['Data']).__name__ for name, channel in channels.items()}
+
+
+class RawAnalyzer(BaseAnalyzer):
+    def __init__(self, uid):
+        super().__init__(filenames=['output/InsetChart.json'], parse=False)
+        self.uid = uid
+        self.raw = None
+
+    def select_simulation_data(self, data, simulation):
+        self.raw = data[self.filenames[0]]
+        return len(self.raw)
+
+
+class TestRetrieveData(unittest.TestCase):
+    def setUp(self):
+        self.sim_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.sim_dir, 'output'))
+        with open(os.path.join(self.sim_dir, 'output', 'InsetChart.json'), 'w') as f:
+            json.dump({'Header': {'Timesteps': 2},
+                       'Channels': {'Infected': {'Data': [1, 2]}, 'Births': {'Data': [3, 4]}}}, f)
+
+        self.simulation = LocalSimulation('sim1', self.sim_dir)
+        self.cache = Cache(self.cache_dir)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.cache_dir)
+        shutil.rmtree(self.sim_dir)
+
+    def selected(self, analyzers, sidecars=False):
+        retrieve_data(self.simulation, analyzers, self.cache, sidecars=sidecars)
+        self.assertIsNone(self.cache.get('__EXCEPTION__'))
+        return self.cache.get(self.simulation.id)
+
+    def test_channels_independent_of_other_analyzers(self):
+        alone = self.selected([ChannelsAnalyzer('channels', channels=['Infected'])])
+        self.assertDictEqual(alone, {'channels': {'Infected': 'ndarray'}})
+        self.cache.clear()
+
+        # The file is fully loaded for the analyzer without channels
+        # but the analyzer with channels still only gets its channels as numpy arrays
+        for sidecars in (False, True, True):
+            shared = self.selected([ChannelsAnalyzer('channels', channels=['Infected']), ChannelsAnalyzer('all')],
+                                   sidecars=sidecars)
+            self.assertDictEqual(shared['channels'], alone['channels'])
+            self.assertDictEqual(shared['all'], {'Infected': 'list', 'Births': 'list'})
+            self.assertEqual(self.cache.get('__PARSE_COUNT__'), 1)
+            self.cache.clear()
+
+        partial = self.selected([ChannelsAnalyzer('channels', channels=['Infected']),
+                                 ChannelsAnalyzer('other', channels=['Births', 'Missing'])])
+        self.assertDictEqual(partial, {'channels': {'Infected': 'ndarray'}, 'other': {'Births': 'ndarray'}})
+
+    def test_raw_data_shared(self):
+        analyzers = [RawAnalyzer('raw1'), RawAnalyzer('raw2'), ChannelsAnalyzer('parsed')]
+        selected = self.selected(analyzers)
+        self.assertIsInstance(analyzers[0].raw, bytes)
+        self.assertIs(analyzers[0].raw, analyzers[1].raw)
+        self.assertEqual(selected['raw1'], selected['raw2'])
+
+    def test_mapped_files_closed(self):
+        mapped = []
+        original_map_file = DataRetrievalProcess.map_file
+
+        def map_file(path):
+            mapped.append(original_map_file(path))
+            return mapped[-1]
+
+        with mock.patch('simtools.Analysis.DataRetrievalProcess.map_file', side_effect=map_file):
+            self.selected([RawAnalyzer('raw'), ChannelsAnalyzer('parsed', channels=['Births'])])
+
+            # Also when an analyzer fails
+            failing = ChannelsAnalyzer('failing', channels=['Births'])
+            failing.select_simulation_data = lambda data, simulation: 1 / 0
+            retrieve_data(self.simulation, [failing], self.cache)
+            self.assertIn('ZeroDivisionError', self.cache.get('__EXCEPTION__'))
+
+        self.assertEqual(len(mapped), 2)
+        for content in mapped:
+            self.assertIsInstance(content, mmap.mmap)
+            self.assertTrue(content.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
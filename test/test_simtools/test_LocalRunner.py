@@ -0,0 +1,193 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+
+from COMPS.Data.Simulation import SimulationState
+
+from simtools.DataAccess.DataStore import DataStore
+from simtools.ExperimentManager.LocalExperimentManager import LocalExperimentManager
+from simtools.SimulationRunner.LocalRunner import SupervisedSimulation, LocalSimulationSupervisor
+
+from .local_objects import LocalExperiment, LocalSimulation
+
+
+def new_simulation(path, status=SimulationState.Created, pid=None):
+    return LocalSimulation(str(uuid.uuid4()), path, status, pid)
+
+
+class RecordingSupervisor:
+    def __init__(self, max_local_sims):
+        self.max_local_sims = max_local_sims
+        self.started = []
+        self.adopted = []
+
+    def full(self):
+        return len(self.started) >= self.max_local_sims
+
+    def supervises(self, sim_id):
+        return sim_id in self.started or sim_id in self.adopted
+
+    def run(self, simulation, experiment):
+        self.started.append(simulation.id)
+
+    def adopt(self, simulation, experiment):
+        self.adopted.append(simulation.id)
+
+
+class TestSupervisedSimulation(unittest.TestCase):
+    def setUp(self):
+        self.sim_dir = tempfile.mkdtemp()
+        self.status = os.path.join(self.sim_dir, 'status.txt')
+        self.child = SupervisedSimulation(new_simulation(self.sim_dir), LocalExperiment())
+
+    def tearDown(self):
+        shutil.rmtree(self.sim_dir)
+
+    def write_status(self, content, mode='a'):
+        with open(self.status, mode) as f:
+            f.write(content)
+
+    def test_read_status(self):
+        self.assertFalse(self.child.read_status())
+
+        # Only the complete lines are read, the offset stays at the beginning of the partial line
+        self.write_status('00:00:01 1 of 10\n00:00:02 2 of 10\n00:00:03 3 of')
+        self.assertTrue(self.child.read_status())
+        self.assertEqual(self.child.last_line, '00:00:02 2 of 10')
+        self.assertEqual(self.child.status_offset, 34)
+        self.assertFalse(self.child.read_status())
+
+        self.write_status(' 10\n')
+        self.assertTrue(self.child.read_status())
+        self.assertEqual(self.child.last_line, '00:00:03 3 of 10')
+        self.assertEqual(self.child.status_offset, os.path.getsize(self.status))
+
+        # The final read also considers the last line without end of line
+        self.write_status('Done')
+        self.assertFalse(self.child.read_status())
+        self.assertTrue(self.child.read_status(final=True))
+        self.assertEqual(self.child.last_line, 'Done')
+        self.assertEqual(self.child.final_state(), SimulationState.Succeeded)
+
+    def test_read_rewritten_status(self):
+        self.write_status('00:00:01 1 of 10\n00:00:02 2 of 10\n')
+        self.child.read_status()
+
+        self.write_status('Error\n', mode='w')
+        self.assertTrue(self.child.read_status())
+        self.assertEqual(self.child.last_line, 'Error')
+        self.assertEqual(self.child.final_state(), SimulationState.Failed)
+
+
+class TestLocalSimulationSupervisor(unittest.TestCase):
+    def setUp(self):
+        self.sim_dirs = []
+        self.supervisor = LocalSimulationSupervisor(max_local_sims=1)
+
+    def tearDown(self):
+        for child in self.supervisor.children.values():
+            child.close()
+        for sim_dir in self.sim_dirs:
+            shutil.rmtree(sim_dir)
+
+    def create_simulation(self, status=SimulationState.Created, pid=None):
+        self.sim_dirs.append(tempfile.mkdtemp())
+        simulation = new_simulation(self.sim_dirs[-1], status, pid)
+        DataStore.save_simulation(DataStore.create_simulation(id=simulation.id, status=status, pid=pid))
+        self.addCleanup(DataStore.delete_simulation, simulation)
+        return simulation
+
+    def saved_states(self, *simulations):
+        return DataStore.get_simulation_runtime_states([sim.id for sim in simulations])
+
+    def test_run(self):
+        simulation = self.create_simulation()
+        script = "open('status.txt', 'w').write('00:00:01 1 of 1\\nDone')"
+        experiment = LocalExperiment(command_line='"%s" -c "%s"' % (sys.executable, script))
+
+        self.assertFalse(self.supervisor.full())
+        self.supervisor.run(simulation, experiment)
+        self.supervisor.run(simulation, experiment)
+        self.assertTrue(self.supervisor.full())
+        self.assertTrue(self.supervisor.supervises(simulation.id))
+        self.assertEqual(simulation.status, SimulationState.Running)
+        self.assertEqual(simulation.pid, str(self.supervisor.children[simulation.id].pid))
+
+        self.supervisor.children[simulation.id].process.wait()
+        self.assertListEqual(self.supervisor.monitor(), [simulation.id])
+        self.assertFalse(self.supervisor.full())
+        self.assertDictEqual(self.supervisor.updates, {})
+        self.assertEqual(self.saved_states(simulation)[simulation.id][0], SimulationState.Succeeded)
+
+    def test_run_failure(self):
+        simulation = self.create_simulation()
+        self.supervisor.run(simulation, LocalExperiment(command_line='missing_executable_for_the_test'))
+        self.assertFalse(self.supervisor.supervises(simulation.id))
+        self.assertEqual(simulation.status, SimulationState.Failed)
+        self.assertEqual(self.saved_states(simulation)[simulation.id][0], SimulationState.Failed)
+
+    def test_adopt(self):
+        # Started by a previous Overseer and not running anymore
+        simulation = self.create_simulation(SimulationState.Running, pid='0')
+        self.supervisor.adopt(simulation, LocalExperiment())
+        self.supervisor.adopt(simulation, LocalExperiment())
+        self.assertTrue(self.supervisor.full())
+        self.assertIsNone(self.supervisor.children[simulation.id].process)
+
+        self.assertListEqual(self.supervisor.monitor(), [simulation.id])
+        self.assertEqual(self.saved_states(simulation)[simulation.id][0], SimulationState.Failed)
+
+
+class TestLocalExperimentManager(unittest.TestCase):
+    def setUp(self):
+        states = [SimulationState.Created] * 3 + [SimulationState.Running, SimulationState.Succeeded]
+        self.simulations = [new_simulation('', status) for status in states]
+        self.manager = LocalExperimentManager(LocalExperiment(self.simulations), None)
+        self.manager.supervisor = RecordingSupervisor(max_local_sims=2)
+
+    def test_commission_simulations(self):
+        created, running, succeeded = self.simulations[:3], self.simulations[3], self.simulations[4]
+        self.assertNotIn(succeeded.id, self.manager.unfinished_simulations)
+
+        self.assertEqual(self.manager.commission_simulations(), 2)
+        self.assertListEqual(self.manager.supervisor.started, [sim.id for sim in created[:2]])
+        self.assertListEqual(self.manager.supervisor.adopted, [running.id])
+
+        # Nothing more until a slot is free
+        self.assertEqual(self.manager.commission_simulations(), 0)
+        self.manager.supervisor.max_local_sims = 3
+        self.assertEqual(self.manager.commission_simulations(), 1)
+        self.assertListEqual(self.manager.supervisor.started, [sim.id for sim in created])
+
+    def test_refresh_simulations(self):
+        unfinished = self.simulations[:4]
+        for simulation in unfinished:
+            DataStore.save_simulation(DataStore.create_simulation(id=simulation.id, status=simulation.status))
+            self.addCleanup(DataStore.delete_simulation, simulation)
+        DataStore.batch_simulations_update([{'sid': unfinished[0].id, 'status': SimulationState.Running, 'pid': '12'},
+                                            {'sid': unfinished[3].id, 'status': SimulationState.Succeeded, 'pid': None}])
+
+        # The simulations are updated in place and the finished ones are not tracked anymore
+        self.manager.refresh_simulations()
+        self.assertEqual((unfinished[0].status, unfinished[0].pid), (SimulationState.Running, '12'))
+        self.assertEqual(unfinished[1].status, SimulationState.Created)
+        self.assertEqual(unfinished[3].status, SimulationState.Succeeded)
+        self.manager.needs_commissioning()
+        self.assertSetEqual(set(self.manager.unfinished_simulations), set(sim.id for sim in unfinished[:3]))
+
+        # Simulations gone from the database -> reload the whole experiment
+        DataStore.delete_simulation(unfinished[2])
+        reloaded = LocalExperiment(unfinished[:2])
+        with mock.patch.object(DataStore, 'get_experiment', return_value=reloaded) as get_experiment:
+            self.manager.refresh_simulations()
+        get_experiment.assert_called_once_with(LocalExperiment.exp_id)
+        self.assertIs(self.manager.experiment, reloaded)
+        self.assertSetEqual(set(self.manager.unfinished_simulations), set(sim.id for sim in unfinished[:2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
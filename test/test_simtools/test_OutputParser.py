@@ -0,0 +1,101 @@
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from simtools.Analysis.OutputParser import SimulationOutputParser
+from simtools.Analysis.Sidecar import sidecar_path
+
+
+class TestOutputParser(unittest.TestCase):
+    def setUp(self):
+        self.report = {
+            "Header": {"DateTime": "Mon Jan 1 2018", "Timesteps": 3, "Channels": 3},
+            "Channels": {
+                "Infected": {"Units": "", "Data": [0.1, 0.2, 0.3]},
+                "Daily EIR": {"Units": "", "Data": [1, 2, 3]},
+                "Strange \"name\" [x]": {"Units": "{", "Data": [[1, 2], [3, 4]]}
+            }
+        }
+        self.content = json.dumps(self.report, indent=4).encode('utf-8')
+
+    def test_selected_channels(self):
+        data = SimulationOutputParser.parse('InsetChart.json', self.content, channels=['Infected', 'Missing'])
+
+        self.assertDictEqual(data['Header'], self.report['Header'])
+        self.assertListEqual(list(data['Channels'].keys()), ['Infected'])
+        self.assertListEqual(data['Channels']['Infected']['Data'].tolist(), [0.1, 0.2, 0.3])
+
+    def test_nested_channel(self):
+        channel = 'Strange "name" [x]'
+        data = SimulationOutputParser.parse('InsetChart.json', self.content, channels=[channel])
+        self.assertEqual(data['Channels'][channel]['Units'], "{")
+        self.assertListEqual(data['Channels'][channel]['Data'].tolist(), [[1, 2], [3, 4]])
+
+    def test_mapped_file(self):
+        handle, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(handle, 'wb') as output_file:
+            output_file.write(self.content)
+
+        with open(path, 'rb') as output_file:
+            mapped = mmap.mmap(output_file.fileno(), 0, access=mmap.ACCESS_READ)
+            data = SimulationOutputParser.parse('InsetChart.json', mapped, channels=['Daily EIR'])
+            self.assertListEqual(data['Channels']['Daily EIR']['Data'].tolist(), [1, 2, 3])
+            self.assertDictEqual(SimulationOutputParser.parse('InsetChart.json', mapped), self.report)
+            mapped.close()
+        os.remove(path)
+
+
+class TestSidecar(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def write(self, filename, content):
+        path = os.path.join(self.output_dir, filename)
+        with open(path, 'wb') as output_file:
+            output_file.write(content)
+        return path
+
+    def test_json_sidecar(self):
+        report = {"Header": {"Timesteps": 20},
+                  "Channels": {"Infected": {"Units": "", "Data": list(np.linspace(0, 1, 20))},
+                               "Births": {"Units": "", "Data": list(range(20))}}}
+        content = json.dumps(report).encode('utf-8')
+        path = self.write('InsetChart.json', content)
+
+        self.assertDictEqual(SimulationOutputParser.parse('InsetChart.json', content, path=path), report)
+        self.assertTrue(os.path.exists(sidecar_path(path)))
+
+        # Second time the sidecar is used
+        self.assertDictEqual(SimulationOutputParser.parse('InsetChart.json', b'', path=path), report)
+        data = SimulationOutputParser.parse('InsetChart.json', b'', channels=['Births'], path=path)
+        self.assertListEqual(list(data['Channels'].keys()), ['Births'])
+        self.assertListEqual(data['Channels']['Births']['Data'].tolist(), list(range(20)))
+
+    def test_csv_sidecar(self):
+        content = b"Time, Name, Value\n" + b"".join(b"%d, node%d, %f\n" % (i, i, i / 3) for i in range(30))
+        path = self.write('ReportVectorStats.csv', content)
+
+        expected = SimulationOutputParser.parse('ReportVectorStats.csv', content)
+        SimulationOutputParser.parse('ReportVectorStats.csv', content, path=path)
+        data = SimulationOutputParser.parse('ReportVectorStats.csv', b'', path=path)
+        self.assertTrue(data.equals(expected))
+
+    def test_outdated_sidecar(self):
+        path = self.write('InsetChart.json', json.dumps({"Data": list(range(20))}).encode('utf-8'))
+        SimulationOutputParser.parse('InsetChart.json', open(path, 'rb').read(), path=path)
+
+        content = json.dumps({"Data": list(range(30))}).encode('utf-8')
+        self.write('InsetChart.json', content)
+        self.assertEqual(len(SimulationOutputParser.parse('InsetChart.json', content, path=path)["Data"]), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import time
+import unittest
+import uuid
+from multiprocessing.connection import Client
+
+from COMPS.Data.Simulation import SimulationState
+
+from simtools.DataAccess import session_scope
+from simtools.DataAccess.DataStore import DataStore
+from simtools.DataAccess.Schema import Simulation
+from simtools.ExperimentManager.BaseExperimentManager import BaseExperimentManager
+from simtools.Overseer import Overseer, SUBMITTED, EXITED, REFRESH, RESCAN
+
+
+class FakeManager:
+    def __init__(self, location):
+        self.location = location
+
+
+class FakeRunner:
+    def __init__(self):
+        self.pid = 1234
+        self.joined = False
+
+    def join(self):
+        self.joined = True
+
+
+class FakeSupervisor:
+    def __init__(self, exited=()):
+        self.exited = list(exited)
+
+    def monitor(self):
+        return self.exited
+
+
+class RecordingOverseer(Overseer):
+    """
+    Overseer recording the tasks it runs instead of refreshing the experiments.
+    """
+    def __init__(self, exited=()):
+        super(RecordingOverseer, self).__init__(max_local_sims=2)
+        self.supervisor = FakeSupervisor(exited)
+        self.ran = []
+
+    def rescan(self):
+        self.ran.append((None, RESCAN))
+
+    def process(self, exp_id, priority):
+        self.ran.append((exp_id, priority))
+
+
+class TestOverseer(unittest.TestCase):
+    def setUp(self):
+        self.overseer = RecordingOverseer()
+
+    def test_schedule_earliest_wins(self):
+        self.overseer.schedule('exp1', REFRESH, 60)
+        self.overseer.schedule('exp1', REFRESH, 120)
+        self.assertEqual(len(self.overseer.tasks), 1)
+
+        # An immediate task supersedes the delayed one
+        self.overseer.schedule('exp1', EXITED)
+        self.assertEqual(self.overseer.scheduled['exp1'], (0, EXITED))
+        self.overseer.schedule('exp1', REFRESH)
+        self.assertEqual(self.overseer.scheduled['exp1'], (0, EXITED))
+        self.assertEqual(len(self.overseer.tasks), 2)
+
+    def test_run_due_tasks(self):
+        self.overseer.schedule('exp1', REFRESH, 60)
+        self.overseer.schedule('exp2', REFRESH)
+        self.overseer.schedule('exp1', EXITED)
+        self.overseer.schedule(None, RESCAN)
+        self.overseer.schedule('exp3', REFRESH, 60)
+
+        # By priority, the superseded delayed task of exp1 is skipped and the task of exp3 is not due yet
+        self.overseer.run_due_tasks()
+        self.assertListEqual(self.overseer.ran, [('exp1', EXITED), ('exp2', REFRESH), (None, RESCAN)])
+        self.assertListEqual(list(self.overseer.scheduled), ['exp3'])
+
+        # Once due, the delayed task runs
+        self.overseer.scheduled['exp3'] = (time.time(), REFRESH)
+        self.overseer.tasks = [self.overseer.scheduled['exp3'] + (0, 'exp3')]
+        self.overseer.run_due_tasks()
+        self.assertTupleEqual(self.overseer.ran[-1], ('exp3', REFRESH))
+        self.assertListEqual(self.overseer.tasks, [])
+        self.assertDictEqual(self.overseer.scheduled, {})
+
+    def test_handle_notifications(self):
+        for exp_id in ('exp1', 'exp2'):
+            self.overseer.notifications.put(exp_id)
+        self.overseer.wake_sender.send_bytes(b'1')
+
+        self.overseer.handle_events([self.overseer.wake_receiver])
+        self.assertDictEqual(self.overseer.scheduled, {'exp1': (0, SUBMITTED), 'exp2': (0, SUBMITTED)})
+        self.assertFalse(self.overseer.wake_receiver.poll())
+
+    def test_handle_runner_exit(self):
+        runner, orphan = FakeRunner(), FakeRunner()
+        self.overseer.managers['exp1'] = FakeManager('HPC')
+        self.overseer.processes = {1: ('exp1', runner), 2: ('gone', orphan)}
+
+        # Unknown events (local simulations) are ignored, the runners of finished experiments are only joined
+        self.overseer.handle_events([1, 2, 3])
+        self.assertTrue(runner.joined and orphan.joined)
+        self.assertDictEqual(self.overseer.processes, {})
+        self.assertDictEqual(self.overseer.scheduled, {'exp1': (0, EXITED)})
+
+    def test_handle_local_simulations_exit(self):
+        for exp_id, location in (('local1', 'LOCAL'), ('hpc', 'HPC'), ('local2', 'LOCAL')):
+            self.overseer.managers[exp_id] = FakeManager(location)
+
+        self.overseer.handle_events([])
+        self.assertDictEqual(self.overseer.scheduled, {})
+
+        self.overseer.supervisor = FakeSupervisor(exited=['sim1'])
+        self.overseer.handle_events([])
+        self.assertDictEqual(self.overseer.scheduled, {'local1': (0, EXITED), 'local2': (0, EXITED)})
+
+    def test_listener(self):
+        self.overseer.start_listener()
+        address, thread = self.overseer.listener.address, self.overseer.listener_thread
+
+        BaseExperimentManager.notify_overseer('exp1')
+        self.assertEqual(self.overseer.notifications.get(timeout=5), 'exp1')
+
+        # The socket is released and the thread ended
+        self.overseer.stop_listener()
+        self.assertFalse(thread.is_alive())
+        self.assertIsNone(self.overseer.listener)
+        self.assertTrue(self.overseer.notifications.empty())
+        self.assertEqual(DataStore.get_setting('overseer_address').value, '')
+        with self.assertRaises(ConnectionRefusedError):
+            Client(address)
+
+
+
+class TestBatchSimulationsUpdate(unittest.TestCase):
+    def setUp(self):
+        self.states = {str(uuid.uuid4()): state
+                       for state in (SimulationState.Running, SimulationState.Succeeded,
+                                     SimulationState.Failed, SimulationState.Canceled)}
+        for sim_id, state in self.states.items():
+            DataStore.save_simulation(DataStore.create_simulation(id=sim_id, status=state, message='before', pid='1'))
+
+    def tearDown(self):
+        for sim_id in self.states:
+            DataStore.delete_simulation(DataStore.create_simulation(id=sim_id))
+
+    def test_final_states_not_updated(self):
+        DataStore.batch_simulations_update([{'sid': sim_id, 'status': SimulationState.Running, 'message': 'after',
+                                             'pid': None} for sim_id in self.states])
+        DataStore.batch_simulations_update([{'sid': sim_id, 'status': 'Canceled'} for sim_id in self.states])
+
+        with session_scope() as session:
+            saved = {sim_id: (status, message, pid) for sim_id, status, message, pid in
+                     session.query(Simulation.id, Simulation.status_s, Simulation.message, Simulation.pid)
+                     .filter(Simulation.id.in_(list(self.states)))}
+
+        for sim_id, state in self.states.items():
+            if state == SimulationState.Running:
+                self.assertTupleEqual(saved[sim_id], ('Canceled', 'after', None))
+            else:
+                self.assertTupleEqual(saved[sim_id], (state.name, 'before', '1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from simtools.Analysis.BaseAnalyzers import BaseAnalyzer
+from simtools.Analysis.ResultCache import AnalysisResultCache, MISS
+
+from .local_objects import LocalSimulation
+
+
+class ChannelAnalyzer(BaseAnalyzer):
+    def __init__(self, channel='Infected'):
+        super().__init__(filenames=['output/InsetChart.json'])
+        self.channel = channel
+
+    def select_simulation_data(self, data, simulation):
+        return data[self.filenames[0]][self.channel]
+
+
+class ScaledChannelAnalyzer(ChannelAnalyzer):
+    def select_simulation_data(self, data, simulation):
+        return [2 * v for v in data[self.filenames[0]][self.channel]]
+
+
+class TestAnalysisResultCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.sim_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.sim_dir, 'output'))
+        self.output = os.path.join(self.sim_dir, 'output', 'InsetChart.json')
+        with open(self.output, 'w') as f:
+            f.write('{"Infected": [1, 2]}')
+
+        self.simulation = LocalSimulation('sim1', self.sim_dir)
+        self.result_cache = AnalysisResultCache(directory=self.cache_dir, size_limit=10)
+
+    def tearDown(self):
+        self.result_cache.close()
+        shutil.rmtree(self.cache_dir)
+        shutil.rmtree(self.sim_dir)
+
+    def store(self, analyzer, data='selected'):
+        self.result_cache.register([analyzer])
+        self.result_cache.set(self.simulation, analyzer, data)
+
+    def test_hit(self):
+        analyzer = ChannelAnalyzer()
+        self.store(analyzer, [1, 2])
+        self.assertListEqual(self.result_cache.get(self.simulation, ChannelAnalyzer()), [1, 2])
+        self.assertIs(self.result_cache.get(LocalSimulation('sim2', self.sim_dir), analyzer), MISS)
+
+        # Checking the presence does not load the data
+        with mock.patch.object(self.result_cache.cache, 'get', side_effect=AssertionError):
+            self.assertTrue(self.result_cache.contains(self.simulation, ChannelAnalyzer()))
+            self.assertFalse(self.result_cache.contains(LocalSimulation('sim2', self.sim_dir), analyzer))
+
+    def test_attributes_change(self):
+        self.store(ChannelAnalyzer())
+        changed = ChannelAnalyzer(channel='Births')
+        self.result_cache.register([changed])
+        self.assertIs(self.result_cache.get(self.simulation, changed), MISS)
+
+        # The volatile attributes do not invalidate the results
+        same = ChannelAnalyzer()
+        same.working_dir = 'elsewhere'
+        same.results = [3]
+        self.result_cache.register([same])
+        self.assertEqual(self.result_cache.get(self.simulation, same), 'selected')
+
+    def test_code_change(self):
+        analyzer = ChannelAnalyzer()
+        self.store(analyzer)
+        changed = ScaledChannelAnalyzer()
+        changed.uid = analyzer.uid
+        self.assertNotEqual(AnalysisResultCache.fingerprint(analyzer), AnalysisResultCache.fingerprint(changed))
+        self.result_cache.register([changed])
+        self.assertIs(self.result_cache.get(self.simulation, changed), MISS)
+
+    def test_files_signature_miss(self):
+        analyzer = ChannelAnalyzer()
+        self.store(analyzer)
+
+        # Simulation output re-written (different size and modification time)
+        time.sleep(0.01)
+        with open(self.output, 'w') as f:
+            f.write('{"Infected": [1, 2, 3]}')
+        self.assertIs(self.result_cache.get(self.simulation, analyzer), MISS)
+
+        # Missing output: no key at all
+        os.remove(self.output)
+        self.assertIs(self.result_cache.get(self.simulation, analyzer), MISS)
+        self.result_cache.set(self.simulation, analyzer, 'other')
+        self.assertEqual(len(self.result_cache), 1)
+
+    def test_not_cached_analyzer(self):
+        analyzer = ChannelAnalyzer()
+        analyzer.cache_results = False
+        self.store(analyzer)
+        self.assertEqual(len(self.result_cache), 0)
+        self.assertIs(self.result_cache.get(self.simulation, analyzer), MISS)
+
+
+if __name__ == '__main__':
+    unittest.main()
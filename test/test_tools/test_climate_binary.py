@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from dtk.tools.climate.BinaryFilesHelpers import ClimateBinary, extract_data_from_climate_bin_for_node
+from dtk.tools.climate.ClimateFileCreator import ClimateFileCreator
+from dtk.tools.climate.WeatherNode import WeatherNode
+
+
+class ClimateBinaryTests(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.nodes = []
+        for node_id, base in ((340461479, 1), (12353654, 2), (0x1fffffff, 1), (7, 3)):
+            node = WeatherNode(forced_id=node_id)
+            node.rainfall = [base * day for day in range(10)]
+            self.nodes.append(node)
+
+        creator = ClimateFileCreator(self.nodes, 'test', 'daily', '2015')
+        creator.generate_climate_files(self.output_dir)
+        self.rainfall_file = os.path.join(self.output_dir, 'test_rainfall_daily.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_get(self):
+        climate = ClimateBinary(self.rainfall_file)
+        self.assertEqual(climate.tsteps, 10)
+        self.assertListEqual(climate.node_ids.tolist(), [node.id for node in self.nodes])
+
+        data = climate.get([7, 340461479, 0x1fffffff])
+        np.testing.assert_array_equal(data, [self.nodes[3].rainfall, self.nodes[0].rainfall, self.nodes[2].rainfall])
+        self.assertEqual(climate.get().shape, (4, 10))
+        self.assertRaises(KeyError, climate.get, [8])
+
+    def test_weather_nodes(self):
+        loaded = [WeatherNode(forced_id=node.id) for node in self.nodes]
+        WeatherNode.nodes_data_from_files(loaded, rainfall=self.rainfall_file)
+        self.assertListEqual([node.rainfall for node in loaded], [node.rainfall for node in self.nodes])
+        self.assertListEqual(extract_data_from_climate_bin_for_node(self.nodes[1], self.rainfall_file),
+                             self.nodes[1].rainfall)
+
+    def test_prepare_data(self):
+        rainfall = [1, -2, 3, 4000, 5]
+        np.testing.assert_array_equal(ClimateFileCreator.prepare_data(rainfall, ClimateFileCreator.invalid_rainfall_handler,
+                                                                      ClimateFileCreator.valid_rainfall), [1, 0, 3, 0, 5])
+
+        # Handler only working on single values
+        previous_day = lambda value, index, data: data[index - 1] if index else 0
+        np.testing.assert_array_equal(ClimateFileCreator.prepare_data(rainfall, previous_day,
+                                                                      ClimateFileCreator.valid_rainfall), [1, 1, 3, 3, 5])
+
+        # Test function only working on single values
+        np.testing.assert_array_equal(ClimateFileCreator.prepare_data(rainfall, ClimateFileCreator.invalid_rainfall_handler,
+                                                                      lambda value: 0 <= value < 10), [1, 0, 3, 0, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
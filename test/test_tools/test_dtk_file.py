@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import dtk.tools.serialization.dtkFileTools as dtk
+
+
+def remove_humans(node):
+    if node.externalId % 2:
+        return None
+    node.individualHumans = []
+    return node
+
+
+class DtkFileTests(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.output_dir, 'state-00010.dtk')
+
+        header = dtk.DtkHeader({'author': 'test', 'bytecount': 0, 'chunkcount': 0, 'chunksizes': [],
+                                'compressed': True, 'date': '', 'engine': dtk.LZ4, 'tool': 'test', 'version': 4})
+        source = dtk.DtkFileV4(header)
+        source.objects.append({'simulation': 'sim'})
+        for node_id in range(1, 6):
+            source.objects.append({'externalId': node_id, 'individualHumans': [{'age': age} for age in range(50)]})
+        dtk.write(source, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_lazy_read(self):
+        source = dtk.read(self.path, cache_size=2)
+        self.assertTrue(source.mapped)
+        self.assertEqual(len(source.nodes), 5)
+        self.assertListEqual([node.externalId for node in source.nodes], [1, 2, 3, 4, 5])
+        self.assertDictEqual(source.simulation, {'simulation': 'sim'})
+        source.close()
+
+    def test_write_modified_nodes(self):
+        source = dtk.read(self.path, cache_size=2)
+        original_chunks = [bytes(chunk) for chunk in source.chunks]
+
+        for index, node in enumerate(source.nodes):
+            if node.externalId in (2, 5):
+                node.individualHumans = []
+                source.nodes[index] = node
+
+        # Writing over the mapped file
+        dtk.write(source, self.path)
+        source.close()
+
+        reloaded = dtk.read(self.path, lazy=False)
+        self.assertListEqual([len(node.individualHumans) for node in reloaded.nodes], [50, 0, 50, 50, 0])
+        # Untouched chunks are copied as they were
+        for index in (0, 1, 3, 4):
+            self.assertEqual(reloaded.chunks[index], original_chunks[index])
+        self.assertNotEqual(reloaded.chunks[2], original_chunks[2])
+
+    def test_write_over_mapped_file(self):
+        source = dtk.read(self.path, cache_size=2)
+        original_map = source.chunks.map
+        node = source.nodes[0]
+        node.individualHumans = []
+        source.nodes[0] = node
+
+        # The file is not mapped anymore when replaced
+        original_replace = os.replace
+
+        def replace(src, dst):
+            self.assertTrue(original_map.closed)
+            original_replace(src, dst)
+
+        with mock.patch('os.replace', side_effect=replace) as patched:
+            dtk.write(source, self.path)
+        patched.assert_called_once_with(self.path + '.tmp', self.path)
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+        # The written file is mapped in its place
+        self.assertTrue(source.mapped)
+        self.assertListEqual(source.chunk_sizes, source.header.chunksizes)
+        self.assertListEqual([len(node.individualHumans) for node in source.nodes], [0, 50, 50, 50, 50])
+        reloaded = dtk.read(self.path, lazy=False)
+        self.assertListEqual([bytes(chunk) for chunk in source.chunks], reloaded.chunks)
+        source.close()
+
+    def test_map_nodes(self):
+        for workers in (1, 2):
+            source = dtk.read(self.path)
+            original_chunks = [bytes(chunk) for chunk in source.chunks]
+            self.assertEqual(source.map_nodes(remove_humans, workers=workers), 2)
+            self.assertListEqual([len(node.individualHumans) for node in source.nodes], [50, 0, 50, 0, 50])
+            self.assertListEqual([bytes(source.chunks[index]) == original_chunks[index] for index in range(6)],
+                                 [True, True, False, True, False, True])
+            source.close()
+
+        with self.assertRaises(UserWarning):
+            dtk.read(self.path, lazy=False).map_nodes(remove_humans, workers=0)
+
+    def test_map_nodes_bounded(self):
+        class Pool:
+            def apply_async(self, fn, args):
+                return mock.Mock(get=lambda: fn(*args))
+
+        read = []
+
+        def tasks():
+            for index in range(10):
+                read.append(index)
+                yield index
+
+        # The tasks are only taken from the iterator a few at a time
+        for index, result in enumerate(dtk._imap_bounded(Pool(), lambda task: 2 * task, tasks(), window=3)):
+            self.assertEqual(result, 2 * index)
+            self.assertLessEqual(len(read), index + 4)
+        self.assertEqual(len(read), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import itertools
+import math
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from dtk.tools.migration.GeoGraphGenerator import GeoGraphGenerator, EARTH_RADIUS
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(math.radians, (lon1, lat1, lon2, lat2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS * 2 * math.asin(math.sqrt(a))
+
+
+def brute_force_graph(adjacency_list, node_properties, migration_radius):
+    """
+    Former graph generation: test every pair of nodes then add the edges of the adjacency list.
+    """
+    G = nx.Graph()
+    G.add_nodes_from(node_properties)
+    for node_id, other_id in itertools.combinations(node_properties, 2):
+        distance = haversine(*(node_properties[node_id][:2] + node_properties[other_id][:2]))
+        if not migration_radius or distance < migration_radius:
+            G.add_edge(node_id, other_id, weight=distance)
+    for node_id, node_links in adjacency_list.items():
+        for node_link_id, w in node_links.items():
+            distance = haversine(*(node_properties[node_id][:2] + node_properties[node_link_id][:2]))
+            G.add_edge(node_id, node_link_id, weight=distance * w)
+    return G
+
+
+class GeoGraphGeneratorTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        # Nodes within ~100 km, a few of them on each side of the antimeridian
+        positions = [(30 + rng.rand(), -rng.rand()) for _ in range(60)]
+        positions += [(179.9 + 0.09 * rng.rand(), 0.1 * rng.rand()) for _ in range(5)]
+        positions += [(-179.9 - 0.09 * rng.rand(), 0.1 * rng.rand()) for _ in range(5)]
+        self.node_properties = {node_id: [lon, lat, 1000, 'node%d' % node_id]
+                                for node_id, (lon, lat) in enumerate(positions, start=1)}
+
+        node_ids = list(self.node_properties)
+        self.adjacency_list = {}
+        for node_id in node_ids[::3]:
+            links = rng.choice(node_ids, 3, replace=False)
+            self.adjacency_list[node_id] = {int(link_id): float(rng.rand()) for link_id in links}
+
+    def assertSameGraph(self, graph, expected):
+        self.assertSetEqual(set(graph.nodes()), set(expected.nodes()))
+        edges = {frozenset((u, v)): w for u, v, w in graph.edges(data='weight')}
+        expected_edges = {frozenset((u, v)): w for u, v, w in expected.edges(data='weight')}
+        self.assertSetEqual(set(edges), set(expected_edges))
+        for edge, weight in expected_edges.items():
+            self.assertAlmostEqual(edges[edge], weight, places=9)
+
+    def assertSamePaths(self, generator, expected, cutoff):
+        paths = dict(generator.get_shortest_paths(cutoff=cutoff, batch_size=16))
+        self.assertSetEqual(set(paths), set(expected.nodes()))
+        for source, lengths in paths.items():
+            expected_lengths = nx.single_source_dijkstra_path_length(expected, source, cutoff=cutoff)
+            self.assertSetEqual(set(lengths), set(expected_lengths))
+            for destination, length in expected_lengths.items():
+                self.assertAlmostEqual(lengths[destination], length, places=6)
+
+    def test_same_as_brute_force(self):
+        for migration_radius in (None, 10, 30, 200):
+            expected = brute_force_graph(self.adjacency_list, self.node_properties, migration_radius)
+            generator = GeoGraphGenerator(self.adjacency_list, self.node_properties, migration_radius)
+            self.assertSameGraph(generator.generate_graph(), expected)
+
+            for cutoff in (None, 5, 50):
+                self.assertSamePaths(generator, expected, cutoff)
+
+    def test_radius_across_antimeridian(self):
+        generator = GeoGraphGenerator({}, self.node_properties, migration_radius=30)
+        graph = generator.generate_graph()
+        east, west = range(61, 66), range(66, 71)
+        self.assertTrue(all(graph.has_edge(u, v) for u in east for v in west))
+
+
+if __name__ == '__main__':
+    unittest.main()
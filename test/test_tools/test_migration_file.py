@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from collections import namedtuple
+
+import numpy as np
+
+from dtk.tools.migration.MigrationFile import MigrationFile
+
+Node = namedtuple('Node', ['id'])
+
+
+def loop_filler_nodes(source, dests, n, available_nodes):
+    """
+    Former filler loop: add the first available nodes which are not the source or a destination until n destinations.
+    """
+    for node in available_nodes:
+        if len(dests) >= n:
+            break
+        if node not in dests and node != source:
+            dests[node] = 0
+
+
+class MigrationFileTests(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.output_dir, 'Local_Migration.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_generate_file(self):
+        nodes = {i: Node(i) for i in (5, 2, 9, 7)}
+        matrix = {
+            nodes[5]: {nodes[2]: 0.1, nodes[9]: 0.2, nodes[7]: 0.3},
+            nodes[2]: {nodes[7]: 0.4},
+            nodes[9]: {nodes[5]: 0.5, nodes[2]: 0.6},
+            nodes[7]: {}
+        }
+        MigrationFile('Test', matrix).generate_file(self.path)
+
+        with open('%s.json' % self.path) as header_file:
+            headers = json.load(header_file)
+        self.assertEqual(headers['Metadata']['NodeCount'], 4)
+        self.assertEqual(headers['Metadata']['DatavalueCount'], 3)
+        self.assertEqual(headers['Metadata']['IdReference'], 'Test')
+
+        # Fixed size records: 3 destination ids then 3 rates per node
+        record_size = 3 * (4 + 8)
+        offsets = headers['NodeOffsets']
+        self.assertEqual(len(offsets), 16 * 4)
+        offsets = [(int(offsets[i:i + 8], 16), int(offsets[i + 8:i + 16], 16)) for i in range(0, len(offsets), 16)]
+        self.assertListEqual(offsets, [(5, 0), (2, record_size), (9, 2 * record_size), (7, 3 * record_size)])
+
+        with open(self.path, 'rb') as migration_file:
+            content = migration_file.read()
+        self.assertEqual(len(content), 4 * record_size)
+
+        records = {}
+        for node_id, offset in offsets:
+            destinations = struct.unpack('3I', content[offset:offset + 12])
+            rates = struct.unpack('3d', content[offset + 12:offset + record_size])
+            records[node_id] = list(zip(destinations, rates))
+
+        # The actual destinations come first, then the fillers (rate 0) taken in the node order
+        self.assertListEqual(records[5], [(2, 0.1), (9, 0.2), (7, 0.3)])
+        self.assertListEqual(records[2], [(7, 0.4), (5, 0), (9, 0)])
+        self.assertListEqual(records[9], [(5, 0.5), (2, 0.6), (7, 0)])
+        self.assertListEqual(records[7], [(5, 0), (2, 0), (9, 0)])
+
+    def test_filler_nodes_same_as_loop(self):
+        rng = np.random.RandomState(0)
+        node_ids = rng.permutation(np.arange(1, 200, dtype=np.uint32) * 3)
+        n = 8
+        matrix = {}
+        for source in node_ids.tolist():
+            others = [node for node in node_ids.tolist() if node != source]
+            # Favor the first nodes, which are also the first filler candidates
+            candidates = others[:2 * n] if rng.rand() < 0.5 else others
+            matrix[source] = {int(dest): rng.rand() for dest in rng.choice(candidates, rng.randint(0, n + 1), replace=False)}
+
+        counts = np.array([len(dests) for dests in matrix.values()])
+        destinations = np.zeros((len(matrix), n), dtype=np.uint32)
+        for row, dests in enumerate(matrix.values()):
+            destinations[row, :len(dests)] = list(dests)
+        MigrationFile.get_filler_nodes(node_ids, destinations, counts, node_ids, batch_size=16)
+
+        for row, (source, dests) in enumerate(matrix.items()):
+            loop_filler_nodes(source, dests, n, node_ids.tolist())
+            self.assertListEqual(destinations[row].tolist(), list(dests))
+
+
+if __name__ == '__main__':
+    unittest.main()
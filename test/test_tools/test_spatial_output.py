@@ -0,0 +1,54 @@
+import os
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from dtk.tools.output.SpatialOutput import SpatialOutput
+
+
+class SpatialOutputTests(unittest.TestCase):
+    def setUp(self):
+        self.nodeids = np.array([1001, 17, 450, 3], dtype=np.uint32)
+        self.data = np.arange(5 * 4, dtype=np.float32).reshape(5, 4)
+        content = struct.pack('ii', 4, 5) + struct.pack('ff', 10, 2) + self.nodeids.tobytes() + self.data.tobytes()
+
+        handle, self.path = tempfile.mkstemp(prefix='SpatialReportMalariaFiltered_', suffix='.bin')
+        with os.fdopen(handle, 'wb') as spatial_file:
+            spatial_file.write(content)
+        self.content = content
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_from_file_matches_from_bytes(self):
+        so = SpatialOutput.from_file(self.path)
+        reference = SpatialOutput.from_bytes(self.content, filtered=True)
+
+        self.assertEqual((so.n_nodes, so.n_tstep, so.start, so.interval), (4, 5, 10, 2))
+        self.assertListEqual(so.nodeids.tolist(), reference.nodeids.tolist())
+        np.testing.assert_array_equal(so.data, reference.data)
+        del so
+
+    def test_from_bytes_copies(self):
+        so = SpatialOutput.from_bytes(memoryview(self.content), filtered=True)
+        np.testing.assert_array_equal(so.data, self.data)
+        self.assertEqual(so.data.dtype, np.float64)
+
+        # Writable and independent from the buffer
+        so.data[0, 0] = -1
+        self.assertEqual(SpatialOutput.from_bytes(self.content, filtered=True).data[0, 0], 0)
+
+    def test_slicing(self):
+        so = SpatialOutput.from_file(self.path)
+
+        np.testing.assert_array_equal(so.get_data(node_ids=[3, 1001], tsteps=slice(1, 3)), self.data[1:3][:, [3, 0]])
+        np.testing.assert_array_equal(so.get_data(node_ids=[450], tsteps=4), self.data[4, [2]])
+        np.testing.assert_array_equal(so.get_data(tsteps=[0, 2]), self.data[[0, 2]])
+        self.assertRaises(KeyError, so.get_data, node_ids=[2])
+        del so
+
+
+if __name__ == '__main__':
+    unittest.main()